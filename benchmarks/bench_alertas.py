@@ -0,0 +1,40 @@
+"""Benchmarks del armado y envío de alertas, con la API de Telegram reemplazada por un stub."""
+
+from benchmarks.comun import ejecutar_grupos
+from benchmarks.datos import generar_alerta, generar_suscripciones
+from src.services import http_client
+from src.services.suscripciones import registro_suscriptores
+from src.services.telegram_notifier import enviar_alerta_telegram, formatear_alerta
+
+SUSCRIPTORES = 200
+
+class _RespuestaFalsa:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+def _sin_red():
+    """Reemplaza el POST a Telegram. La cola de salida no se inicia, así que los envíos son sincrónicos."""
+    http_client.post = lambda *a, **k: _RespuestaFalsa()
+
+def formatear(tamanio):
+    alerta = generar_alerta(tamanio)
+    return (lambda: alerta), formatear_alerta
+
+def enviar_con_suscriptores(tamanio):
+    """Alerta completa al chat principal más la difusión por combinación de líneas."""
+    _sin_red()
+    registro_suscriptores.reiniciar()
+    for chat_id, lineas in generar_suscripciones(SUSCRIPTORES):
+        registro_suscriptores.suscribir(chat_id, lineas)
+    alerta = generar_alerta(tamanio)
+    return (lambda: alerta), enviar_alerta_telegram
+
+CASOS = [
+    ("formatear_alerta", formatear),
+    (f"enviar_alerta_telegram_{SUSCRIPTORES}_suscriptores", enviar_con_suscriptores),
+]
+
+if __name__ == "__main__":
+    ejecutar_grupos([("alertas", CASOS)], __doc__)
@@ -0,0 +1,53 @@
+"""Benchmarks del analyzer: tokenizador de oraciones y ciclo completo de análisis."""
+import copy
+
+from benchmarks.comun import ejecutar_grupos
+from benchmarks.datos import generar_estados, generar_textos
+from src.services.analyzer import analizar_cambios_con_historial, procesar_estado_por_oraciones, reiniciar_huellas
+
+def procesar_oraciones(tamanio):
+    textos = generar_textos(tamanio)
+
+    def ejecutar():
+        for texto in textos:
+            procesar_estado_por_oraciones(texto)
+    return (lambda: ()), ejecutar
+
+def analizar_primer_ciclo(tamanio):
+    """Historial vacío y sin huellas por línea: todo se clasifica de cero."""
+    estados = generar_estados(tamanio)
+
+    def preparar():
+        reiniciar_huellas()
+        return estados, {}
+    return preparar, analizar_cambios_con_historial
+
+def analizar_ciclo_estable(tamanio):
+    """Mismo texto que el ciclo anterior: se reutiliza la clasificación por línea."""
+    estados = generar_estados(tamanio)
+    reiniciar_huellas()
+    *_, historial = analizar_cambios_con_historial(estados, {})
+    return (lambda: (estados, copy.deepcopy(historial))), analizar_cambios_con_historial
+
+def analizar_ciclo_con_cambios(tamanio):
+    """Un 10% de las líneas cambia de texto respecto del ciclo anterior."""
+    estados = generar_estados(tamanio)
+    siguientes = {**estados, **generar_estados(max(1, tamanio // 10), semilla=1)}
+    reiniciar_huellas()
+    *_, historial = analizar_cambios_con_historial(estados, {})
+
+    def preparar():
+        reiniciar_huellas()
+        analizar_cambios_con_historial(estados, {})
+        return siguientes, copy.deepcopy(historial)
+    return preparar, analizar_cambios_con_historial
+
+CASOS = [
+    ("procesar_estado_por_oraciones", procesar_oraciones),
+    ("analizar_primer_ciclo", analizar_primer_ciclo),
+    ("analizar_ciclo_estable", analizar_ciclo_estable),
+    ("analizar_ciclo_con_cambios", analizar_ciclo_con_cambios),
+]
+
+if __name__ == "__main__":
+    ejecutar_grupos([("analyzer", CASOS)], __doc__)
@@ -0,0 +1,45 @@
+"""Benchmarks de confiabilidad: carga de las muestras desde disco y resumen de una línea."""
+
+from benchmarks.comun import Config, ejecutar_grupos
+from benchmarks.datos import generar_muestras
+from src.services.confiabilidad import _REGISTRO, RegistroConfiabilidad, hueco_maximo
+from src.services.suscripciones import LINEAS_VALIDAS
+
+def _escribir_muestras(tamanio):
+    """Archivo con 'tamanio' muestras repartidas entre las siete líneas."""
+    por_linea = max(1, tamanio // len(LINEAS_VALIDAS))
+    registros = sorted(
+        (momento, indice, codigo)
+        for indice in range(len(LINEAS_VALIDAS))
+        for momento, codigo in generar_muestras(por_linea, semilla=indice)
+    )
+    Config.ARCHIVO_CONFIABILIDAD.write_bytes(b''.join(_REGISTRO.pack(*registro) for registro in registros))
+
+def cargar_muestras(tamanio):
+    _escribir_muestras(tamanio)
+
+    def ejecutar():
+        RegistroConfiabilidad().resumen("A", 1)
+    return (lambda: ()), ejecutar
+
+def resumen_linea(tamanio):
+    """Todas las muestras en una línea y una ventana que las abarca (un año son ~105.000 cada 5 min)."""
+    registro = RegistroConfiabilidad()
+    momento = None
+    for momento, codigo in generar_muestras(tamanio):
+        registro._series["B"].agregar(momento, codigo, hueco_maximo())
+    registro._cargado = True
+    registro._reloj = lambda: momento + 300
+    dias = tamanio * 300 // 86400 + 1
+
+    def ejecutar():
+        registro.resumen("B", dias)
+    return (lambda: ()), ejecutar
+
+CASOS = [
+    ("cargar_muestras", cargar_muestras),
+    ("resumen_linea", resumen_linea),
+]
+
+if __name__ == "__main__":
+    ejecutar_grupos([("confiabilidad", CASOS)], __doc__)
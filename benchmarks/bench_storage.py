@@ -0,0 +1,73 @@
+"""Benchmarks de persistencia: guardar y cargar el historial con los backends JSON y SQLite."""
+
+from benchmarks.comun import Config, ejecutar_grupos
+from benchmarks.datos import generar_estados, generar_historial
+from src.services import storage, storage_sqlite
+from src.services.historial import Historial
+from src.services.storage import cargar_estados_anteriores, guardar_estados
+
+FECHA = "2024-05-10T12:00:00-03:00"
+
+def _con_backend(backend, fabrica):
+    def caso(tamanio):
+        Config.STORAGE_BACKEND = backend
+        preparar, ejecutar = fabrica(tamanio)
+
+        def preparar_con_backend():
+            Config.STORAGE_BACKEND = backend
+            return preparar()
+        return preparar_con_backend, ejecutar
+    return caso
+
+def _reiniciar_persistencia():
+    storage._base = None
+    storage_sqlite.cerrar()
+    for ruta in (Config.ARCHIVO_ESTADO, storage._archivo_journal(), Config.ARCHIVO_SQLITE):
+        ruta.unlink(missing_ok=True)
+
+def guardar_completo(tamanio):
+    """Primer guardado: snapshot completo (JSON) o inserción de todo el historial (SQLite)."""
+    estados, historial = generar_estados(7), generar_historial(tamanio)
+
+    def preparar():
+        _reiniciar_persistencia()
+        cargar_estados_anteriores()
+        return estados, historial, FECHA
+    return preparar, guardar_estados
+
+def guardar_incremental(tamanio):
+    """Guardado de un ciclo donde cambió el 1% de las entradas del historial residente en memoria."""
+    estados, datos = generar_estados(7), generar_historial(tamanio)
+    modificadas = list(datos)[::100]
+
+    def preparar():
+        _reiniciar_persistencia()
+        cargar_estados_anteriores()
+        historial = Historial({clave: dict(entrada) for clave, entrada in datos.items()})
+        guardar_estados(estados, historial, FECHA)
+        for clave in modificadas:
+            historial[clave]["contador"] += 1
+        return estados, historial, FECHA
+    return preparar, guardar_estados
+
+def cargar(tamanio):
+    estados, historial = generar_estados(7), generar_historial(tamanio)
+    _reiniciar_persistencia()
+    cargar_estados_anteriores()
+    guardar_estados(estados, historial, FECHA)
+
+    def preparar():
+        # Cada carga arranca en frío, como al iniciar el servicio
+        storage._base = None
+        storage_sqlite.cerrar()
+        return ()
+    return preparar, cargar_estados_anteriores
+
+CASOS = [
+    (f"{nombre}_{backend}", _con_backend(backend, fabrica))
+    for backend in ("json", "sqlite")
+    for nombre, fabrica in (("guardar_completo", guardar_completo), ("guardar_incremental", guardar_incremental), ("cargar", cargar))
+]
+
+if __name__ == "__main__":
+    ejecutar_grupos([("storage", CASOS)], __doc__)
@@ -0,0 +1,146 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Credenciales falsas por si algún servicio arma una URL de Telegram; los benchmarks nunca tocan la red
+os.environ.setdefault("TELEGRAM_TOKEN", "benchmark-token")
+os.environ.setdefault("TELEGRAM_CHAT_ID", "123456789")
+
+from src.config import Config
+
+DIR_BASELINES = Path(__file__).resolve().parent / "baselines"
+TAMANIOS = [10, 100, 1_000, 10_000, 100_000]
+TIEMPO_OBJETIVO = 0.5
+MIN_REPETICIONES = 3
+MAX_REPETICIONES = 20
+
+@contextlib.contextmanager
+def silenciado():
+    """Descarta los logs de los servicios (y cualquier salida por stdout) mientras se mide."""
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+@contextlib.contextmanager
+def directorio_temporal():
+    """Redirige los archivos de persistencia de Config a un directorio descartable."""
+    atributos = ("DATA_DIR", "ARCHIVO_ESTADO", "ARCHIVO_SQLITE", "ARCHIVO_COLA_MENSAJES", "ARCHIVO_SUSCRIPTORES",
+                 "ARCHIVO_CONFIABILIDAD")
+    originales = {nombre: getattr(Config, nombre) for nombre in atributos}
+    with tempfile.TemporaryDirectory(prefix="bench-subte-") as tmp:
+        data_dir = Path(tmp)
+        Config.DATA_DIR = data_dir
+        Config.ARCHIVO_ESTADO = data_dir / "estados_persistentes.json"
+        Config.ARCHIVO_SQLITE = data_dir / "estados.db"
+        Config.ARCHIVO_COLA_MENSAJES = data_dir / "cola_mensajes.json"
+        Config.ARCHIVO_SUSCRIPTORES = data_dir / "suscriptores.json"
+        Config.ARCHIVO_CONFIABILIDAD = data_dir / "muestras_lineas.bin"
+        try:
+            yield data_dir
+        finally:
+            for nombre, valor in originales.items():
+                setattr(Config, nombre, valor)
+
+def medir(preparar, ejecutar):
+    """Corre 'ejecutar(*preparar())' al menos MIN_REPETICIONES veces y hasta juntar TIEMPO_OBJETIVO
+    segundos o MAX_REPETICIONES.
+    La preparación no se mide. Devuelve el mejor tiempo, la mediana y las repeticiones."""
+    tiempos = []
+    while len(tiempos) < MIN_REPETICIONES or (len(tiempos) < MAX_REPETICIONES and sum(tiempos) < TIEMPO_OBJETIVO):
+        argumentos = preparar()
+        with silenciado():
+            inicio = time.perf_counter()
+            ejecutar(*argumentos)
+            tiempos.append(time.perf_counter() - inicio)
+    return {"mejor": min(tiempos), "mediana": statistics.median(tiempos), "repeticiones": len(tiempos)}
+
+def correr(grupo, casos, tamanios):
+    """Mide cada caso del grupo para cada tamaño. 'casos' es una lista de (nombre, fabrica) donde
+    fabrica(tamanio) devuelve el par (preparar, ejecutar)."""
+    resultados = {}
+    for nombre, fabrica in casos:
+        for tamanio in tamanios:
+            with directorio_temporal():
+                with silenciado():
+                    preparar, ejecutar = fabrica(tamanio)
+                medicion = medir(preparar, ejecutar)
+            clave = f"{nombre}[{tamanio}]"
+            resultados[clave] = medicion
+            print(f"{grupo:<10} {clave:<50} mejor {medicion['mejor'] * 1000:10.3f} ms   "
+                  f"mediana {medicion['mediana'] * 1000:10.3f} ms   ({medicion['repeticiones']} rep.)")
+    return resultados
+
+def archivo_baseline(grupo):
+    return DIR_BASELINES / f"{grupo}.json"
+
+def _leer_baseline(grupo):
+    ruta = archivo_baseline(grupo)
+    if not ruta.exists():
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)["resultados"]
+
+def guardar_baseline(grupo, resultados):
+    """Actualiza la baseline del grupo; los casos no medidos en esta corrida se conservan."""
+    DIR_BASELINES.mkdir(parents=True, exist_ok=True)
+    data = {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": {**(_leer_baseline(grupo) or {}), **resultados},
+    }
+    with open(archivo_baseline(grupo), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+def comparar_con_baseline(grupo, resultados, tolerancia):
+    """Imprime los casos más lentos que la baseline por encima de la tolerancia y los devuelve."""
+    baseline = _leer_baseline(grupo)
+    if baseline is None:
+        print(f"{grupo}: sin baseline en {archivo_baseline(grupo)}; usar --guardar para crearla.")
+        return []
+
+    regresiones = []
+    for clave, medicion in resultados.items():
+        previo = baseline.get(clave)
+        if not previo:
+            continue
+        relacion = medicion["mejor"] / previo["mejor"] if previo["mejor"] else 1.0
+        if relacion > 1 + tolerancia:
+            regresiones.append((clave, relacion))
+            print(f"REGRESIÓN {grupo} {clave}: {relacion:.2f}x la baseline "
+                  f"({previo['mejor'] * 1000:.3f} ms -> {medicion['mejor'] * 1000:.3f} ms)")
+    return regresiones
+
+def argumentos_cli(descripcion):
+    parser = argparse.ArgumentParser(description=descripcion)
+    parser.add_argument("--tamanios", type=int, nargs="+", default=TAMANIOS,
+                        help="Cantidad de entradas sintéticas por caso (por defecto: %(default)s)")
+    parser.add_argument("--guardar", action="store_true", help="Actualiza la baseline con los casos de esta corrida")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="Lentitud relativa tolerada antes de reportar una regresión (por defecto: %(default)s)")
+    return parser.parse_args()
+
+def ejecutar_grupos(grupos, descripcion):
+    """Punto de entrada común: 'grupos' es una lista de (nombre, casos). Sale con código 1 si hay regresiones."""
+    args = argumentos_cli(descripcion)
+    regresiones = []
+    for grupo, casos in grupos:
+        resultados = correr(grupo, casos, args.tamanios)
+        if args.guardar:
+            guardar_baseline(grupo, resultados)
+            print(f"Baseline guardada en {archivo_baseline(grupo)}")
+        else:
+            regresiones += comparar_con_baseline(grupo, resultados, args.tolerancia)
+    sys.exit(1 if regresiones else 0)
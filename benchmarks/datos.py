@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.comun import Config
+from src.services.confiabilidad import INCIDENTE, NORMAL, OBRA
+from src.services.historial import normalizar_obra
+
+LINEAS_REALES = ['A', 'B', 'C', 'D', 'E', 'H', 'Premetro']
+ESTACIONES = ['Plaza de Mayo', 'Perú', 'Piedras', 'Lima', 'Sáenz Peña', 'Congreso', 'Pasco', 'Alberti',
+              'Plaza Miserere', 'Loria', 'Castro Barros', 'Río de Janeiro', 'Acoyte', 'Primera Junta',
+              'C. de Tucumán', 'Av. de Mayo', 'Pza. Italia', 'Gral. Belgrano', 'Independencia']
+
+PROBLEMAS = [
+    "Demora de {n} minutos por incidente técnico",
+    "Servicio interrumpido entre {e1} y {e2}",
+    "Servicio limitado entre {e1} y {e2} por tareas de mantenimiento",
+    "Frecuencia reducida por falta de personal",
+    "Estación {e1} cerrada por manifestación",
+]
+OBRAS = [
+    "Por obras de renovación integral, la estación {e1} permanece cerrada",
+    "Cerrada por obras de remodelación hasta el {n} de diciembre",
+    "Por obras en la estación {e1} los trenes no se detienen",
+]
+
+def _frase(rnd, plantillas):
+    e1, e2 = rnd.sample(ESTACIONES, 2)
+    return rnd.choice(plantillas).format(n=rnd.randint(2, 40), e1=e1, e2=e2)
+
+def generar_texto_estado(rnd):
+    """Texto de una línea con entre una y tres oraciones, mezclando problemas y obras."""
+    oraciones = [_frase(rnd, PROBLEMAS if rnd.random() < 0.6 else OBRAS) for _ in range(rnd.randint(1, 3))]
+    return ". ".join(oraciones) + "."
+
+def generar_textos(tamanio, semilla=0):
+    rnd = random.Random(semilla)
+    return [generar_texto_estado(rnd) for _ in range(tamanio)]
+
+def nombre_linea(i):
+    return f"Línea {LINEAS_REALES[i]}" if i < len(LINEAS_REALES) else f"Línea {i:06d}"
+
+def generar_estados(tamanio, semilla=0, proporcion_normal=0.5):
+    """estados_actuales con 'tamanio' líneas; las siete primeras son las reales."""
+    rnd = random.Random(semilla)
+    return {
+        nombre_linea(i): Config.ESTADO_NORMAL if rnd.random() < proporcion_normal else generar_texto_estado(rnd)
+        for i in range(tamanio)
+    }
+
+def generar_historial(tamanio, semilla=0):
+    """Historial con 'tamanio' entradas con la forma que deja el analyzer (problemas, obras, inactivas)."""
+    rnd = random.Random(semilla)
+    ahora = datetime.now(Config.TIMEZONE_LOCAL)
+    historial = {}
+    for i in range(tamanio):
+        linea = nombre_linea(i // 2)
+        fecha = (ahora - timedelta(days=rnd.randint(0, 30), minutes=rnd.randint(0, 1440))).isoformat()
+        if i % 2:
+            estado = _frase(rnd, OBRAS)
+            datos = {
+                "estado": estado, "linea_original": linea, "tipo": "obra",
+                "contador": rnd.randint(1, 50), "primera_deteccion": fecha,
+                "ultima_notificacion": fecha, "es_obra_programada": True,
+                "detectada_por_texto": True, "activa": rnd.random() < 0.8, "ya_notificada": True,
+                "estado_normalizado": normalizar_obra(estado),
+            }
+            clave = f"{linea}_obra"
+        else:
+            datos = {
+                "estado": _frase(rnd, PROBLEMAS), "linea_original": linea, "tipo": "problema",
+                "contador": rnd.randint(1, 10), "primera_deteccion": fecha,
+                "ultima_notificacion": fecha, "es_obra_programada": False,
+                "detectada_por_texto": False, "activa": rnd.random() < 0.8, "ya_notificada": True,
+            }
+            clave = f"{linea}_problema"
+        if not datos["activa"]:
+            datos["fecha_desaparicion"] = fecha
+        historial[clave] = datos
+    return historial
+
+def generar_alerta(tamanio, semilla=0):
+    """(cambios_nuevos, obras_programadas, obras_renotificar) con 'tamanio' mensajes en las líneas reales."""
+    rnd = random.Random(semilla)
+    colecciones = ({}, {}, {})
+    for _ in range(tamanio):
+        coleccion = rnd.choice(colecciones)
+        linea = f"Línea {rnd.choice(LINEAS_REALES)}"
+        plantillas = PROBLEMAS if coleccion is colecciones[0] else OBRAS
+        coleccion.setdefault(linea, []).append(_frase(rnd, plantillas))
+    return colecciones
+
+def generar_suscripciones(cantidad, semilla=0):
+    """Pares (chat_id, lineas) con subconjuntos aleatorios de las líneas reales."""
+    rnd = random.Random(semilla)
+    return [(1000 + i, rnd.sample(LINEAS_REALES, rnd.randint(1, 3))) for i in range(cantidad)]
+
+def generar_muestras(tamanio, semilla=0, paso=300):
+    """'tamanio' muestras (momento, código) de una línea, cada 'paso' segundos hasta ahora.
+    Alterna rachas normales largas con incidentes y obras cortas."""
+    rnd = random.Random(semilla)
+    fin = int(datetime.now(Config.TIMEZONE_LOCAL).timestamp())
+    muestras = []
+    codigo, restantes = NORMAL, 0
+    for i in range(tamanio):
+        if restantes == 0:
+            codigo = NORMAL if codigo != NORMAL else rnd.choice((INCIDENTE, INCIDENTE, OBRA))
+            restantes = rnd.randint(50, 300) if codigo == NORMAL else rnd.randint(1, 24)
+        muestras.append((fin - (tamanio - i) * paso, codigo))
+        restantes -= 1
+    return muestras
@@ -0,0 +1,14 @@
+"""Corre todos los benchmarks y los compara contra las baselines en benchmarks/baselines/."""
+
+from benchmarks import bench_alertas, bench_analyzer, bench_confiabilidad, bench_storage
+from benchmarks.comun import ejecutar_grupos
+
+GRUPOS = [
+    ("analyzer", bench_analyzer.CASOS),
+    ("storage", bench_storage.CASOS),
+    ("alertas", bench_alertas.CASOS),
+    ("confiabilidad", bench_confiabilidad.CASOS),
+]
+
+if __name__ == "__main__":
+    ejecutar_grupos(GRUPOS, __doc__)
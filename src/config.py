@@ -1,31 +1,14 @@
+import logging
 import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
 
 # Se define el directorio raíz del proyecto (un nivel arriba de src/config.py)
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Se carga el archivo .env desde la raíz
-load_dotenv(BASE_DIR / '.env')
-
 class Config:
-    TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-
-    INTERVALO_EJECUCION = int(os.getenv('INTERVALO_EJECUCION', 5400))
-    UMBRAL_OBRA_PROGRAMADA = int(os.getenv('UMBRAL_OBRA_PROGRAMADA', 5))
-    DIAS_RENOTIFICAR_OBRA = int(os.getenv('DIAS_RENOTIFICAR_OBRA', 15))
-    DIAS_LIMPIAR_HISTORIAL = int(os.getenv('DIAS_LIMPIAR_HISTORIAL', 5))
-
-    HORARIO_ANALISIS_INICIO = int(os.getenv('HORARIO_ANALISIS_INICIO', 6))
-    HORARIO_ANALISIS_FIN = int(os.getenv('HORARIO_ANALISIS_FIN', 23))
-
-    COMANDO_ESTADO = os.getenv('COMANDO_ESTADO', '/estado')
-    POLLING_TIMEOUT = int(os.getenv('POLLING_TIMEOUT', 25))
-    POLLING_INTERVALO = int(os.getenv('POLLING_INTERVALO', 1))
-
+    SCRAPER_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     URL_ESTADO_SUBTE = "https://aplicacioneswp.metrovias.com.ar/estadolineasEMOVA/desktopEmova.html"
     ESTADO_NORMAL = "Normal"
     ESTADO_REDUNDANTE = "Servicio finalizado"
@@ -33,15 +16,97 @@ class Config:
 
     DATA_DIR = BASE_DIR / 'src' / 'data'
     ARCHIVO_ESTADO = DATA_DIR / 'estados_persistentes.json'
+    ARCHIVO_SQLITE = DATA_DIR / 'estados.db'
+    ARCHIVO_COLA_MENSAJES = DATA_DIR / 'cola_mensajes.json'
+    ARCHIVO_SUSCRIPTORES = DATA_DIR / 'suscriptores.json'
+    ARCHIVO_CONFIABILIDAD = DATA_DIR / 'muestras_lineas.bin'
+
+    @classmethod
+    def cargar_entorno(cls):
+        """Lee las variables de entorno. Solo lee os.environ: no toca disco ni termina el proceso."""
+        cls.TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+        cls.TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+
+        cls.INTERVALO_EJECUCION = int(os.getenv('INTERVALO_EJECUCION', 5400))
+        cls.INTERVALO_MINIMO = int(os.getenv('INTERVALO_MINIMO', 300))
+        cls.INTERVALO_MAXIMO = int(os.getenv('INTERVALO_MAXIMO', 14400))
+        cls.INTERVALO_INCIDENTE = int(os.getenv('INTERVALO_INCIDENTE', 900))
+        cls.CICLOS_NORMALES_BACKOFF = int(os.getenv('CICLOS_NORMALES_BACKOFF', 3))
+        cls.PLANIFICADOR_JITTER = float(os.getenv('PLANIFICADOR_JITTER', 0.1))
+        cls.UMBRAL_OBRA_PROGRAMADA = int(os.getenv('UMBRAL_OBRA_PROGRAMADA', 5))
+        cls.DIAS_RENOTIFICAR_OBRA = int(os.getenv('DIAS_RENOTIFICAR_OBRA', 15))
+        cls.DIAS_LIMPIAR_HISTORIAL = int(os.getenv('DIAS_LIMPIAR_HISTORIAL', 5))
+        cls.JOURNAL_MAX_ENTRADAS = int(os.getenv('JOURNAL_MAX_ENTRADAS', 50))
+        cls.STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+        cls.PERSISTENCIA_DEMORA = float(os.getenv('PERSISTENCIA_DEMORA', 5))
+        cls.CONFIABILIDAD_DIAS_RETENCION = int(os.getenv('CONFIABILIDAD_DIAS_RETENCION', 400))
+        cls.CONFIABILIDAD_DIAS_DEFECTO = int(os.getenv('CONFIABILIDAD_DIAS_DEFECTO', 30))
+
+        cls.LOG_NIVEL = os.getenv('LOG_NIVEL', 'INFO')
+        cls.LOG_NIVELES = os.getenv('LOG_NIVELES', '')
+        cls.LOG_FORMATO = os.getenv('LOG_FORMATO', 'json').lower()
+        cls.LOG_VENTANA_REPETIDOS = float(os.getenv('LOG_VENTANA_REPETIDOS', 60))
+
+        cls.METRICAS_HABILITADAS = os.getenv('METRICAS_HABILITADAS', 'true').lower() == 'true'
+        cls.METRICAS_HOST = os.getenv('METRICAS_HOST', '127.0.0.1')
+        cls.METRICAS_PUERTO = int(os.getenv('METRICAS_PUERTO', 9464))
+
+        cls.HORARIO_ANALISIS_INICIO = int(os.getenv('HORARIO_ANALISIS_INICIO', 6))
+        cls.HORARIO_ANALISIS_FIN = int(os.getenv('HORARIO_ANALISIS_FIN', 23))
+
+        cls.COMANDO_ESTADO = os.getenv('COMANDO_ESTADO', '/estado')
+        cls.COMANDO_SUSCRIBIR = os.getenv('COMANDO_SUSCRIBIR', '/suscribir')
+        cls.COMANDO_DESUSCRIBIR = os.getenv('COMANDO_DESUSCRIBIR', '/desuscribir')
+        cls.COMANDO_ACTUALIZAR = os.getenv('COMANDO_ACTUALIZAR', '/actualizar')
+        cls.COMANDO_HISTORIAL = os.getenv('COMANDO_HISTORIAL', '/historial')
+        cls.ACTUALIZAR_EDAD_MINIMA = int(os.getenv('ACTUALIZAR_EDAD_MINIMA', 60))
+        cls.POLLING_TIMEOUT = int(os.getenv('POLLING_TIMEOUT', 25))
+        cls.POLLING_INTERVALO = int(os.getenv('POLLING_INTERVALO', 1))
+        cls.BOT_MAX_CONCURRENCIA = int(os.getenv('BOT_MAX_CONCURRENCIA', 8))
+
+        cls.HTTP_TIMEOUT = int(os.getenv('HTTP_TIMEOUT', 10))
+        cls.HTTP_POOL_CONEXIONES = int(os.getenv('HTTP_POOL_CONEXIONES', 2))
+        cls.HTTP_POOL_MAXIMO = int(os.getenv('HTTP_POOL_MAXIMO', 16))
+
+        cls.TELEGRAM_MENSAJES_POR_SEGUNDO = int(os.getenv('TELEGRAM_MENSAJES_POR_SEGUNDO', 25))
+        cls.TELEGRAM_INTERVALO_POR_CHAT = float(os.getenv('TELEGRAM_INTERVALO_POR_CHAT', 1.0))
+        cls.TELEGRAM_MAX_REINTENTOS = int(os.getenv('TELEGRAM_MAX_REINTENTOS', 5))
+        cls.TELEGRAM_BACKOFF_BASE = float(os.getenv('TELEGRAM_BACKOFF_BASE', 2))
+        cls.TELEGRAM_BACKOFF_MAXIMO = float(os.getenv('TELEGRAM_BACKOFF_MAXIMO', 300))
+
+        cls.CACHE_ESTADO_MAX_EDAD = int(os.getenv('CACHE_ESTADO_MAX_EDAD', 300))
+        cls.CACHE_ESTADO_MAX_STALE = int(os.getenv('CACHE_ESTADO_MAX_STALE', 5400))
+
+        cls.SCRAPER_HTTP_HABILITADO = os.getenv('SCRAPER_HTTP_HABILITADO', 'true').lower() == 'true'
+        cls.SCRAPER_HTTP_TIMEOUT = int(os.getenv('SCRAPER_HTTP_TIMEOUT', 10))
+        cls.URLS_ESTADO_SUBTE_ALTERNATIVAS = os.getenv('URLS_ESTADO_SUBTE_ALTERNATIVAS', '')
+        cls.FUENTES_LATENCIA_DEGRADADA = float(os.getenv('FUENTES_LATENCIA_DEGRADADA', 3))
+        cls.FUENTES_FALLOS_DEGRADAR = int(os.getenv('FUENTES_FALLOS_DEGRADAR', 3))
+        cls.FUENTES_DEMORA_DEGRADADAS = float(os.getenv('FUENTES_DEMORA_DEGRADADAS', 2))
+        cls.FUENTES_SONDEO_DEGRADADAS = int(os.getenv('FUENTES_SONDEO_DEGRADADAS', 10))
+
+        cls.WEBDRIVER_POOL_TAMANIO = int(os.getenv('WEBDRIVER_POOL_TAMANIO', 1))
+        cls.WEBDRIVER_MAX_USOS = int(os.getenv('WEBDRIVER_MAX_USOS', 50))
+        cls.WEBDRIVER_MAX_RSS_MB = int(os.getenv('WEBDRIVER_MAX_RSS_MB', 600))
+
+    @classmethod
+    def inicializar(cls, archivo_env=None, sobrescribir=False):
+        """Carga el .env, relee las variables y valida. La llama el punto de entrada, no los imports.
+        Con sobrescribir=True los valores del .env pisan a los ya cargados (recarga en caliente)."""
+        from dotenv import load_dotenv
+
+        load_dotenv(archivo_env or BASE_DIR / '.env', override=sobrescribir)
+        cls.cargar_entorno()
+        cls.validate()
 
     @classmethod
     def validate(cls):
         """Verifica requerimientos críticos y prepara el entorno."""
         if not cls.TELEGRAM_TOKEN or not cls.TELEGRAM_CHAT_ID:
-            print("Error crítico: TELEGRAM_TOKEN o TELEGRAM_CHAT_ID no definidos en el .env")
+            logging.getLogger(__name__).critical("Error crítico: TELEGRAM_TOKEN o TELEGRAM_CHAT_ID no definidos en el .env")
             sys.exit(1)
         
         # Crea la carpeta src/data/ si no existe al iniciar la aplicación
         cls.DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-Config.validate()
\ No newline at end of file
+Config.cargar_entorno()
\ No newline at end of file
@@ -1,89 +1,181 @@
+import logging
 import time
+import signal
 import sys
 import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from pathlib import Path
-
-# Se asegura el path raíz
-BASE_DIR = Path(__file__).resolve().parent.parent
-if str(BASE_DIR) not in sys.path:
-    sys.path.append(str(BASE_DIR))
 
 from src.config import Config
 from src.services import (
     obtener_estado_subte,
-    cargar_estados_anteriores,
-    guardar_estados,
     analizar_cambios_con_historial,
     enviar_alerta_telegram,
-    escuchar_comandos
+    encolar_mensaje_telegram,
+    iniciar_escucha_async,
+    cola_salida
 )
+from src.services.agenda import Despertar, agenda
+from src.services.analyzer import analisis_omitible, ciclo_sin_cambios, estadisticas_ultimo_ciclo
+from src.services.cache_estado import cache_estado
+from src.services.confiabilidad import registro_confiabilidad
+from src.services.gestor_estado import gestor_estado
+from src.services import logs, metricas
+from src.services.planificador import PlanificadorAdaptativo, aplicar_jitter, proximo_inicio_de_ventana
+from src.services.scrapper import huella_estados
+from src.services.telegram_bot import obtener_respuesta_estado
+
+logger = logging.getLogger(__name__)
 
 def horarios_de_analisis():
     """Determina si la hora actual está dentro de la ventana de ejecución."""
     hora_actual = datetime.now(Config.TIMEZONE_LOCAL).hour
     return Config.HORARIO_ANALISIS_INICIO <= hora_actual <= Config.HORARIO_ANALISIS_FIN
 
+@contextmanager
+def _etapa(nombre):
+    """Mide una etapa del ciclo: alimenta el histograma y deja la duración en el log."""
+    inicio = time.perf_counter()
+    with logs.contexto(etapa=nombre):
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            metricas.duracion_etapa.observar(duracion, etapa=nombre)
+            logger.debug("Etapa %s terminada", nombre, extra={"duracion": round(duracion, 4)})
+
 def verificar_estados():
-    """Orquesta el flujo de extracción, análisis y notificación."""
+    """Orquesta el flujo de extracción, análisis y notificación. Devuelve los estados procesados o None."""
+    with logs.contexto(ciclo=logs.nuevo_id_ciclo()):
+        return _verificar_estados()
+
+def _verificar_estados():
     try:
-        print(f"\nIniciando verificación - {datetime.now(Config.TIMEZONE_LOCAL).strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info("Iniciando verificación")
         
         # 1. Extraer datos crudos
-        estados_actuales = obtener_estado_subte()  
+        with _etapa("scraping"):
+            estados_actuales = obtener_estado_subte()  
         if not estados_actuales:
             return
+        cache_estado.actualizar(estados_actuales)
+        huella = huella_estados(estados_actuales)
             
-        # 2. Cargar datos históricos
-        data_anterior = cargar_estados_anteriores()
-        historial_previo = data_anterior.get("historial", {})
-         
-        # 3. Analizar cambios en memoria
-        cambios_nuevos, obras_programadas, obras_renotificar, estados_procesar, historial_actualizado = analizar_cambios_con_historial(estados_actuales, historial_previo)
-        
-        # 4. Notificar si corresponde
+        # 2. Tomar el historial residente en memoria (se lee del disco solo la primera vez)
+        with _etapa("carga"):
+            gestor_estado.cargar()
+
+        # Si algo falla en el bloque, el historial vuelve a como estaba al entrar
+        with gestor_estado.transaccion() as historial_previo:
+            # Página idéntica a la del ciclo anterior: solo quedan los chequeos por fecha
+            if huella == gestor_estado.huella_pagina and analisis_omitible(historial_previo):
+                fecha_actualizacion = datetime.now(Config.TIMEZONE_LOCAL).isoformat()
+                if ciclo_sin_cambios(estados_actuales, historial_previo):
+                    gestor_estado.registrar_ciclo(gestor_estado.estados_actuales, historial_previo, fecha_actualizacion, huella)
+                else:
+                    gestor_estado.registrar_sin_cambios(fecha_actualizacion)
+                registro_confiabilidad.registrar(estados_actuales, historial_previo)
+                logger.info("La página no cambió desde el ciclo anterior: se omite el análisis.")
+                return gestor_estado.estados_actuales
+             
+            # 3. Analizar cambios en memoria
+            with _etapa("analisis"):
+                cambios_nuevos, obras_programadas, obras_renotificar, estados_procesar, historial_actualizado = analizar_cambios_con_historial(estados_actuales, historial_previo)
+            metricas.historial_entradas.set(len(historial_actualizado))
+            logger.info("Líneas sin cambios desde el ciclo anterior: %d de %d", estadisticas_ultimo_ciclo['lineas_sin_cambios'], len(estados_procesar))
+
+            # 4. Registrar el nuevo estado; se persiste en segundo plano
+            fecha_actualizacion = datetime.now(Config.TIMEZONE_LOCAL).isoformat()
+            gestor_estado.registrar_ciclo(estados_procesar, historial_actualizado, fecha_actualizacion, huella)
+            registro_confiabilidad.registrar(estados_actuales, historial_actualizado)
+
+        # 5. Notificar si corresponde
         if cambios_nuevos or obras_programadas or obras_renotificar:
-            enviar_alerta_telegram(cambios_nuevos, obras_programadas, obras_renotificar)
+            with _etapa("notificacion"):
+                enviar_alerta_telegram(cambios_nuevos, obras_programadas, obras_renotificar)
         else:
-            print("Todo funciona normalmente (sin cambios que notificar).")  
+            logger.info("Todo funciona normalmente (sin cambios que notificar).")
 
-        # 5. Persistir el nuevo estado en disco
-        fecha_actualizacion = datetime.now(Config.TIMEZONE_LOCAL).isoformat()
-        guardar_estados(estados_procesar, historial_actualizado, fecha_actualizacion)
+        return estados_procesar
 
     except Exception as e:
-        print(f"Error general en el ciclo de verificación: {e}")
+        logger.exception("Error general en el ciclo de verificación: %s", e)
+
+def _terminar(signum, frame):
+    """Despierta al loop principal para que salga y persista lo pendiente. Una segunda señal corta en el acto."""
+    if agenda.detenida:
+        logger.warning("Señal %s recibida de nuevo. Saliendo sin esperar al ciclo en curso...", signum)
+        sys.exit(0)
+    logger.info("Señal %s recibida. Cerrando servicio...", signum)
+    agenda.detener()
+
+def _recargar(signum, frame):
+    logger.info("Señal %s recibida. Se recarga la configuración.", signum)
+    agenda.solicitar_recarga()
+
+def _calcular_espera(planificador):
+    """Segundos hasta la próxima verificación programada, con su motivo."""
+    ahora = datetime.now(Config.TIMEZONE_LOCAL)
+    if horarios_de_analisis():
+        with gestor_estado.bloqueo():
+            segundos, motivo = planificador.proximo_intervalo(gestor_estado.obtener_historial())
+        return aplicar_jitter(segundos), motivo
+
+    # Fuera de la ventana se espera hasta la apertura; si la hora ya pasó, se reintenta en un minuto
+    segundos = (proximo_inicio_de_ventana(ahora) - ahora).total_seconds()
+    return (segundos if segundos > 0 else 60), "fuera del horario de análisis"
+
+def _responder_pedidos(chat_ids):
+    """Contesta a quienes pidieron la verificación con el estado recién obtenido."""
+    if not chat_ids:
+        return
+    respuesta = obtener_respuesta_estado()
+    for chat_id in chat_ids:
+        encolar_mensaje_telegram(respuesta, chat_id=chat_id)
 
 def main():
-    """Bucle principal de ejecución y control de tiempos."""
-    print("Iniciando servicio Bot-Subte...")
+    """Bucle principal: verifica y espera en la agenda hasta el próximo intervalo, un pedido o el apagado."""
+    Config.inicializar()
+    logs.configurar_logging()
+    logger.info("Iniciando servicio Bot-Subte...")
+    signal.signal(signal.SIGTERM, _terminar)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _recargar)
+    gestor_estado.cargar()
+
+    cola_salida.iniciar()
+    if Config.METRICAS_HABILITADAS:
+        metricas.iniciar_servidor_metricas()
 
-    hilo_bot = threading.Thread(target=escuchar_comandos, daemon=True)
+    hilo_bot = threading.Thread(target=iniciar_escucha_async, daemon=True)
     hilo_bot.start()
-    
-    while True:
-        ahora = datetime.now(Config.TIMEZONE_LOCAL)
-        
-        if horarios_de_analisis():
-            verificar_estados()
-            proxima_ejecucion = ahora + timedelta(seconds=Config.INTERVALO_EJECUCION)
-            print(f"Esperando hasta la próxima ejecución ({proxima_ejecucion.strftime('%Y-%m-%d %H:%M:%S')})...")
-            time.sleep(Config.INTERVALO_EJECUCION)
 
-        else:
-            # Calcular tiempo de sueño hasta la apertura del servicio
-            if ahora.hour < Config.HORARIO_ANALISIS_INICIO:
-                proxima_ejecucion = ahora.replace(hour=Config.HORARIO_ANALISIS_INICIO, minute=0, second=0, microsecond=0)
-            else: 
-                proxima_ejecucion = (ahora + timedelta(days=1)).replace(hour=Config.HORARIO_ANALISIS_INICIO, minute=0, second=0, microsecond=0)
-            
-            segundos_hasta_inicio = (proxima_ejecucion - ahora).total_seconds()
-            print(f"Fuera del horario de análisis. Durmiendo hasta {proxima_ejecucion.strftime('%Y-%m-%d %H:%M:%S')} ({segundos_hasta_inicio/3600:.2f} horas)")
-            
-            if segundos_hasta_inicio > 0:
-                time.sleep(segundos_hasta_inicio)
-            else:
-                time.sleep(60)
+    planificador = PlanificadorAdaptativo()
+    # Dentro de la ventana, el primer ciclo corre apenas arranca el servicio
+    despertar = Despertar("intervalo", [])
+    limite = agenda.vencimiento(0)
+
+    try:
+        while despertar is not None:
+            if despertar.motivo == "recarga":
+                Config.inicializar(sobrescribir=True)
+                # La recarga no es una verificación: se sigue esperando el vencimiento que ya estaba
+                despertar = agenda.esperar_hasta(limite)
+                continue
+            if despertar.motivo == "pedido" or horarios_de_analisis():
+                planificador.registrar_ciclo(verificar_estados())
+                _responder_pedidos(despertar.chat_ids)
+
+            segundos, motivo = _calcular_espera(planificador)
+            limite = agenda.vencimiento(segundos)
+            proxima_ejecucion = datetime.now(Config.TIMEZONE_LOCAL) + timedelta(seconds=segundos)
+            logger.info("Esperando %.1f min hasta la próxima ejecución (%s): %s", segundos / 60, proxima_ejecucion.strftime('%Y-%m-%d %H:%M:%S'), motivo)
+            despertar = agenda.esperar_hasta(limite)
+    finally:
+        # Lo pendiente (estado y mensajes sin enviar) queda en disco para el próximo arranque
+        gestor_estado.flush()
+        cola_salida.detener()
+        logs.detener_logging()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
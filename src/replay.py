@@ -0,0 +1,169 @@
+"""Reproduce snapshots de estados_actuales guardados en JSONL a través del analyzer, con el reloj
+de cada snapshot, y cuenta las notificaciones que habría enviado cada combinación de umbrales.
+
+Cada línea del archivo es un objeto con la fecha del snapshot ('fecha' o 'ultima_actualizacion',
+en ISO 8601) y 'estados_actuales'. Si un registro no trae 'estados_actuales' se repiten los del
+anterior, así también se puede reproducir el journal del backend JSON.
+
+    python -m src.replay snapshots.jsonl
+    python -m src.replay snapshots.jsonl --umbral-obra 3 5 8 --dias-renotificar 7 15 --procesos 4
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from src.config import Config
+from src.services.analyzer import (
+    analisis_omitible,
+    analizar_cambios_con_historial,
+    ciclo_sin_cambios,
+    reiniciar_huellas,
+    usar_reloj,
+)
+from src.services.historial import Historial
+from src.services.scrapper import huella_estados
+
+# Parámetro de Config -> opción de la línea de comandos
+PARAMETROS = {
+    "UMBRAL_OBRA_PROGRAMADA": "umbral_obra",
+    "DIAS_RENOTIFICAR_OBRA": "dias_renotificar",
+    "DIAS_LIMPIAR_HISTORIAL": "dias_limpiar",
+}
+
+class RelojSimulado:
+    """Devuelve la fecha del snapshot que se está reproduciendo."""
+
+    def __init__(self):
+        self.ahora = None
+
+    def __call__(self):
+        return self.ahora
+
+def leer_snapshots(ruta):
+    """Genera (fecha, estados) de a un registro por vez, sin cargar el archivo entero."""
+    estados = None
+    with open(ruta, "r", encoding="utf-8") as f:
+        for numero, linea in enumerate(f, 1):
+            if not linea.strip():
+                continue
+            try:
+                registro = json.loads(linea)
+                fecha = datetime.fromisoformat(registro.get("fecha") or registro["ultima_actualizacion"])
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{ruta}:{numero}: registro inválido ({e})") from None
+            if fecha.tzinfo is None:
+                fecha = fecha.replace(tzinfo=Config.TIMEZONE_LOCAL)
+            estados = registro.get("estados_actuales", estados)
+            if estados:
+                yield fecha, estados
+
+def simular(ruta, parametros=None):
+    """Corre el archivo completo con los parámetros dados (nombre de Config -> valor) y devuelve
+    los contadores. Reproduce el ciclo de main: si la página no cambió y no hay nada que
+    notificar, solo se aplica ciclo_sin_cambios()."""
+    originales = {nombre: getattr(Config, nombre) for nombre in PARAMETROS}
+    parametros = {**originales, **(parametros or {})}
+    resultado = {
+        "parametros": parametros, "snapshots": 0, "omitidos": 0, "alertas": 0,
+        "cambios": 0, "obras_programadas": 0, "renotificaciones": 0, "historial_maximo": 0,
+    }
+    reloj = RelojSimulado()
+    historial = Historial()
+    huella_previa = None
+    inicio = time.perf_counter()
+
+    for nombre, valor in parametros.items():
+        setattr(Config, nombre, valor)
+    reiniciar_huellas()
+    try:
+        with usar_reloj(reloj):
+            for fecha, estados in leer_snapshots(ruta):
+                reloj.ahora = fecha
+                resultado["snapshots"] += 1
+                huella = huella_estados(estados)
+                if huella == huella_previa and analisis_omitible(historial):
+                    ciclo_sin_cambios(estados, historial)
+                    resultado["omitidos"] += 1
+                    continue
+                huella_previa = huella
+
+                cambios, obras, renotificar, _, historial = analizar_cambios_con_historial(estados, historial)
+                if cambios or obras or renotificar:
+                    resultado["alertas"] += 1
+                resultado["cambios"] += sum(len(mensajes) for mensajes in cambios.values())
+                resultado["obras_programadas"] += sum(len(mensajes) for mensajes in obras.values())
+                resultado["renotificaciones"] += sum(len(mensajes) for mensajes in renotificar.values())
+                resultado["historial_maximo"] = max(resultado["historial_maximo"], len(historial))
+    finally:
+        for nombre, valor in originales.items():
+            setattr(Config, nombre, valor)
+        reiniciar_huellas()
+
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+def combinaciones(valores):
+    """Producto cartesiano de {parametro: [valores]} como lista de dicts."""
+    nombres = list(valores)
+    return [dict(zip(nombres, combinacion)) for combinacion in itertools.product(*valores.values())]
+
+def _simular_en_proceso(argumentos):
+    return simular(*argumentos)
+
+def barrer(ruta, valores, procesos=None):
+    """Simula cada combinación; con más de una, las reparte en un pool de procesos.
+    Devuelve los resultados en el orden de las combinaciones."""
+    tareas = [(ruta, parametros) for parametros in combinaciones(valores)]
+    if len(tareas) == 1 or procesos == 1:
+        return [simular(*tarea) for tarea in tareas]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return list(pool.map(_simular_en_proceso, tareas))
+
+def formatear_tabla(resultados):
+    encabezado = (f"{'umbral':>6} {'renotif':>7} {'limpiar':>7} | {'alertas':>7} {'cambios':>7} "
+                  f"{'obras':>6} {'renotif':>7} | {'snapshots':>9} {'omitidos':>8} {'seg':>6}")
+    filas = [encabezado, "-" * len(encabezado)]
+    for r in resultados:
+        p = r["parametros"]
+        filas.append(
+            f"{p['UMBRAL_OBRA_PROGRAMADA']:>6} {p['DIAS_RENOTIFICAR_OBRA']:>7} {p['DIAS_LIMPIAR_HISTORIAL']:>7} | "
+            f"{r['alertas']:>7} {r['cambios']:>7} {r['obras_programadas']:>6} {r['renotificaciones']:>7} | "
+            f"{r['snapshots']:>9} {r['omitidos']:>8} {r['segundos']:>6.2f}"
+        )
+    return "\n".join(filas)
+
+def argumentos_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivo", help="JSONL con un snapshot por línea")
+    parser.add_argument("--umbral-obra", type=int, nargs="+", default=[Config.UMBRAL_OBRA_PROGRAMADA],
+                        help="Valores de UMBRAL_OBRA_PROGRAMADA a probar (por defecto: %(default)s)")
+    parser.add_argument("--dias-renotificar", type=int, nargs="+", default=[Config.DIAS_RENOTIFICAR_OBRA],
+                        help="Valores de DIAS_RENOTIFICAR_OBRA a probar (por defecto: %(default)s)")
+    parser.add_argument("--dias-limpiar", type=int, nargs="+", default=[Config.DIAS_LIMPIAR_HISTORIAL],
+                        help="Valores de DIAS_LIMPIAR_HISTORIAL a probar (por defecto: %(default)s)")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="Procesos del barrido (por defecto: uno por CPU)")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = argumentos_cli(argv)
+    valores = {nombre: getattr(args, opcion) for nombre, opcion in PARAMETROS.items()}
+    try:
+        resultados = barrer(args.archivo, valores, args.procesos)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    else:
+        print(formatear_tabla(resultados))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,30 @@
-from .scrapper import obtener_estado_subte
-from .telegram_notifier import enviar_alerta_telegram, enviar_mensaje_telegram
-from .telegram_bot import escuchar_comandos
-from .analyzer import analizar_cambios_con_historial
-from .storage import cargar_estados_anteriores, guardar_estados
\ No newline at end of file
+import importlib
+
+# Interfaz pública de los servicios. Cada nombre se importa recién cuando se usa (PEP 562),
+# así importar el paquete no arrastra requests, selenium ni el resto de los módulos.
+_EXPORTADOS = {
+    "obtener_estado_subte": "scrapper",
+    "enviar_alerta_telegram": "telegram_notifier",
+    "enviar_mensaje_telegram": "telegram_notifier",
+    "encolar_mensaje_telegram": "telegram_notifier",
+    "cola_salida": "telegram_notifier",
+    "escuchar_comandos": "telegram_bot",
+    "escuchar_comandos_async": "telegram_bot",
+    "iniciar_escucha_async": "telegram_bot",
+    "analizar_cambios_con_historial": "analyzer",
+    "cargar_estados_anteriores": "storage",
+    "guardar_estados": "storage",
+}
+
+__all__ = list(_EXPORTADOS)
+
+def __getattr__(nombre):
+    modulo = _EXPORTADOS.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f"{__name__}.{modulo}"), nombre)
+    globals()[nombre] = valor
+    return valor
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTADOS))
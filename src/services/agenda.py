@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import namedtuple
+
+# motivo: "intervalo", "pedido" o "recarga"; chat_ids: quienes pidieron la verificación
+Despertar = namedtuple("Despertar", ["motivo", "chat_ids"])
+
+class Agenda:
+    """Espera cancelable del loop principal.
+
+    Se despierta al vencer el intervalo, cuando el bot pide una verificación, cuando hay que
+    recargar la configuración o cuando el servicio se apaga. Usa un RLock para que un handler
+    de señal que corre en el mismo hilo que está esperando pueda tomarlo sin trabarse.
+    """
+
+    def __init__(self, reloj=time.monotonic):
+        self._reloj = reloj
+        self._condicion = threading.Condition(threading.RLock())
+        self._pedido = False
+        self._chat_ids = []
+        self._recarga = False
+        self._detenida = False
+
+    @property
+    def detenida(self):
+        return self._detenida
+
+    def solicitar_verificacion(self, chat_id=None):
+        """Adelanta la próxima verificación. Los chat_id se devuelven para responderles al terminar."""
+        with self._condicion:
+            self._pedido = True
+            if chat_id is not None and chat_id not in self._chat_ids:
+                self._chat_ids.append(chat_id)
+            self._condicion.notify_all()
+
+    def solicitar_recarga(self):
+        with self._condicion:
+            self._recarga = True
+            self._condicion.notify_all()
+
+    def detener(self):
+        with self._condicion:
+            self._detenida = True
+            self._condicion.notify_all()
+
+    def reiniciar(self):
+        with self._condicion:
+            self._pedido = False
+            self._chat_ids.clear()
+            self._recarga = False
+            self._detenida = False
+
+    def vencimiento(self, segundos):
+        """Instante, en el reloj de la agenda, en que vence una espera de 'segundos' que empieza ahora."""
+        return self._reloj() + max(segundos, 0)
+
+    def esperar(self, segundos):
+        """Bloquea hasta 'segundos' o hasta un aviso. Devuelve un Despertar, o None si se detuvo."""
+        return self.esperar_hasta(self.vencimiento(segundos))
+
+    def esperar_hasta(self, limite):
+        """Como esperar(), pero hasta un vencimiento ya calculado: tras un aviso que no cambia el plan
+        (una recarga) se puede seguir esperando el mismo sin volver a contar el intervalo entero."""
+        with self._condicion:
+            while not (self._detenida or self._recarga or self._pedido):
+                restante = limite - self._reloj()
+                if restante <= 0:
+                    return Despertar("intervalo", [])
+                self._condicion.wait(restante)
+
+            if self._detenida:
+                return None
+            if self._recarga:
+                self._recarga = False
+                return Despertar("recarga", [])
+            chat_ids, self._chat_ids = self._chat_ids, []
+            self._pedido = False
+            return Despertar("pedido", chat_ids)
+
+agenda = Agenda()
@@ -1,127 +1,163 @@
+import hashlib
 import re
-import sys
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from pathlib import Path
-
-# Resolución del path raíz para importar config
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-if str(BASE_DIR) not in sys.path:
-    sys.path.append(str(BASE_DIR))
 
 from src.config import Config
+from src.services.historial import Historial, claves_de_linea, normalizar_obra
+
+# Abreviaturas cuyo punto no debe cortar la oración, agrupadas por la forma canónica que comparten
+ABREVIACIONES = {
+    'Int.Saguier': 'INTSAGUIER', 'Int. Saguier': 'INTSAGUIER',
+    'Gral. Savio': 'GRALSAVIO', 'Gral.Savio': 'GRALSAVIO',
+    'Av. de Mayo': 'AVDEMAYO', 'Av.de Mayo': 'AVDEMAYO',
+    'Av. La Plata': 'AVLAPLATA', 'Av.La Plata': 'AVLAPLATA',
+    'Gral. Paz': 'GRALPAZ', 'Gral.Paz': 'GRALPAZ',
+    'Gral. Urquiza': 'GRALURQUIZA', 'Gral.Urquiza': 'GRALURQUIZA',
+    'Gral. Belgrano': 'GRALBELGRANO', 'Gral.Belgrano': 'GRALBELGRANO',
+    'J.M. Rosas': 'JMROSAS', 'J. M. Rosas': 'JMROSAS',
+    'J.M.Rosas': 'JMROSAS', 'Leandro N. Alem': 'LEANDRONALEM',
+    'Leandro N.Alem': 'LEANDRONALEM', 'C.DE TUCUMÁN': 'CTUCUMAN',
+    'C. DE TUCUMÁN': 'CTUCUMAN', 'C. de Tucumán': 'CTUCUMAN',
+    'C. De Tucumán': 'CTUCUMAN', 'C. DE TUCUMAN': 'CTUCUMAN',
+    'C. de Tucuman': 'CTUCUMAN'
+}
+
+PALABRAS_OBRA = [
+    "obras de renovación integral", "renovación integral",
+    "obras de renovacion integral", "renovacion integral",
+    "cerrada por obras", "cerrado por obras",
+    "obra programada", "mantenimiento programado",
+    "obras", "obra"
+]
+
+# Una sola pasada: en cada posición se consume primero una abreviatura completa (y su punto queda
+# protegido); si no hay abreviatura, se busca un corte de oración.
+_PATRON_ORACIONES = re.compile(
+    '(' + '|'.join(re.escape(a) for a in ABREVIACIONES) + r')|\.\s+|\.$|\n+'
+)
+_PATRON_OBRA = re.compile('|'.join(re.escape(p) for p in PALABRAS_OBRA))
+_ORDEN_ABREVIACIONES = {abreviacion: i for i, abreviacion in enumerate(ABREVIACIONES)}
+
+def _hora_local():
+    return datetime.now(Config.TIMEZONE_LOCAL)
+
+# Fuente de la hora actual del análisis; el replay la reemplaza por la fecha de cada snapshot
+_reloj = _hora_local
+
+def ahora():
+    return _reloj()
+
+@contextmanager
+def usar_reloj(reloj):
+    """Dentro del bloque, el análisis toma la hora actual de 'reloj()' en lugar del sistema."""
+    global _reloj
+    anterior, _reloj = _reloj, reloj
+    try:
+        yield
+    finally:
+        _reloj = anterior
+
+def _unificar_variantes(oraciones, variantes):
+    """Replica el reemplazo histórico: si el texto traía varias grafías de la misma abreviatura,
+    todas se restauraban con la última del diccionario presente en el texto."""
+    for grafias in variantes.values():
+        if len(grafias) < 2:
+            continue
+        canonica = max(grafias, key=_ORDEN_ABREVIACIONES.get)
+        otras = [g for g in grafias if g != canonica]
+        for i, oracion in enumerate(oraciones):
+            for grafia in otras:
+                oracion = oracion.replace(grafia, canonica)
+            oraciones[i] = oracion
+    return oraciones
 
 def procesar_estado_por_oraciones(estado_completo):
-    abreviaciones = {
-        'Int.Saguier': 'INTSAGUIER_TEMP', 'Int. Saguier': 'INTSAGUIER_TEMP',
-        'Gral. Savio': 'GRALSAVIO_TEMP', 'Gral.Savio': 'GRALSAVIO_TEMP',
-        'Av. de Mayo': 'AVDEMAYO_TEMP', 'Av.de Mayo': 'AVDEMAYO_TEMP',
-        'Av. La Plata': 'AVLAPLATA_TEMP', 'Av.La Plata': 'AVLAPLATA_TEMP',
-        'Gral. Paz': 'GRALPAZ_TEMP', 'Gral.Paz': 'GRALPAZ_TEMP',
-        'Gral. Urquiza': 'GRALURQUIZA_TEMP', 'Gral.Urquiza': 'GRALURQUIZA_TEMP',
-        'Gral. Belgrano': 'GRALBELGRANO_TEMP', 'Gral.Belgrano': 'GRALBELGRANO_TEMP',
-        'J.M. Rosas': 'JMROSAS_TEMP', 'J. M. Rosas': 'JMROSAS_TEMP',
-        'J.M.Rosas': 'JMROSAS_TEMP', 'Leandro N. Alem': 'LEANDRONALEM_TEMP',
-        'Leandro N.Alem': 'LEANDRONALEM_TEMP', 'C.DE TUCUMÁN': 'CTUCUMAN_TEMP',
-        'C. DE TUCUMÁN': 'CTUCUMAN_TEMP', 'C. de Tucumán': 'CTUCUMAN_TEMP',
-        'C. De Tucumán': 'CTUCUMAN_TEMP', 'C. DE TUCUMAN': 'CTUCUMAN_TEMP',
-        'C. de Tucuman': 'CTUCUMAN_TEMP'
-    }
-    
     texto = estado_completo.strip()
-    reverso = {}  
-
-    for original, temporal in abreviaciones.items():
-        if original in texto:
-            texto = texto.replace(original, temporal)
-            reverso[temporal] = original
-       
-    oraciones = re.split(r'\.\s+|\.$|\n+', texto)
-    oraciones_finales = []
-    
-    for oracion in oraciones:
-        oracion = oracion.strip()
-        if not oracion:
+    partes = []
+    variantes = {}
+    inicio = 0
+
+    for coincidencia in _PATRON_ORACIONES.finditer(texto):
+        abreviacion = coincidencia.group(1)
+        if abreviacion is not None:
+            variantes.setdefault(ABREVIACIONES[abreviacion], set()).add(abreviacion)
             continue
-        for temporal, original in reverso.items():
-            oracion = oracion.replace(temporal, original)
-        oraciones_finales.append(oracion)
-    
-    palabras_obra = [
-        "obras de renovación integral", "renovación integral", 
-        "obras de renovacion integral", "renovacion integral",
-        "cerrada por obras", "cerrado por obras",
-        "obra programada", "mantenimiento programado",
-        "obras", "obra"
-    ]
-    
+        partes.append(texto[inicio:coincidencia.start()])
+        inicio = coincidencia.end()
+    partes.append(texto[inicio:])
+
+    oraciones_finales = [oracion.strip() for oracion in partes if oracion.strip()]
+    if variantes:
+        oraciones_finales = _unificar_variantes(oraciones_finales, variantes)
+
     componentes = {'obras': [], 'problemas': [], 'otros': []}
+    estado_normal = Config.ESTADO_NORMAL.lower()
     
     for oracion in oraciones_finales:
         oracion_lower = oracion.lower()
-        if any(palabra in oracion_lower for palabra in palabras_obra):
+        if _PATRON_OBRA.search(oracion_lower):
             componentes['obras'].append(oracion)
-        elif oracion_lower != Config.ESTADO_NORMAL.lower():
+        elif oracion_lower != estado_normal:
             componentes['problemas'].append(oracion)
         else:
             componentes['otros'].append(oracion)
     
     return componentes
 
-def normalizar_obra(texto_obra):
-    normalizado = texto_obra.lower().strip()
-    palabras_a_remover = [
-        'las estaciones ', 'la estación ', 'la estacion ',
-        'estaciones ', 'estación ', 'estacion '
-    ]
-    for palabra in palabras_a_remover:
-        normalizado = normalizado.replace(palabra, '')
-    return ' '.join(normalizado.split())
+def _obra_normalizada_de(datos):
+    return datos.get("estado_normalizado") or normalizar_obra(datos.get("estado", ""))
 
 def buscar_obra_similar(linea, obra, historial):
     obra_normalizada = normalizar_obra(obra)
+    if isinstance(historial, Historial):
+        return historial.buscar_obra(linea, obra_normalizada)
     for clave, datos in historial.items():
         if (datos.get("linea_original") == linea and 
             datos.get("tipo") == "obra" and
             datos.get("activa", True)):
-            if normalizar_obra(datos.get("estado", "")) == obra_normalizada:
+            if _obra_normalizada_de(datos) == obra_normalizada:
                 return clave
     return None
 
 def procesar_obra_individual(linea, obra, indice, historial):
+    obra_normalizada = normalizar_obra(obra)
     clave_similar = buscar_obra_similar(linea, obra, historial)
     clave_obra = clave_similar if clave_similar else (f"{linea}_obra_{indice}" if indice > 0 else f"{linea}_obra")
     
     if clave_obra not in historial:
         historial[clave_obra] = {
             "estado": obra, "linea_original": linea, "tipo": "obra",
-            "contador": 1, "primera_deteccion": datetime.now(Config.TIMEZONE_LOCAL).isoformat(),
+            "contador": 1, "primera_deteccion": ahora().isoformat(),
             "ultima_notificacion": None, "es_obra_programada": True,
-            "detectada_por_texto": True, "activa": True, "ya_notificada": True
+            "detectada_por_texto": True, "activa": True, "ya_notificada": True,
+            "estado_normalizado": obra_normalizada
         }
         return "nueva_obra", obra
     else:
-        if normalizar_obra(obra) == normalizar_obra(historial[clave_obra]["estado"]):
+        if obra_normalizada == _obra_normalizada_de(historial[clave_obra]):
             historial[clave_obra]["contador"] += 1
             historial[clave_obra]["estado"] = obra
             
             if not historial[clave_obra].get("activa", True):
                 historial[clave_obra]["activa"] = True
-                historial[clave_obra]["fecha_reactivacion"] = datetime.now(Config.TIMEZONE_LOCAL).isoformat()
+                historial[clave_obra]["fecha_reactivacion"] = ahora().isoformat()
                 return "reactivada_silenciosa", obra
                 
             elif historial[clave_obra]["es_obra_programada"] and historial[clave_obra].get("ya_notificada", False):
                 ultima_notif = historial[clave_obra]["ultima_notificacion"]
                 if ultima_notif:
                     ultima_fecha = datetime.fromisoformat(ultima_notif)
-                    if datetime.now(Config.TIMEZONE_LOCAL) - ultima_fecha >= timedelta(days=Config.DIAS_RENOTIFICAR_OBRA):
+                    if ahora() - ultima_fecha >= timedelta(days=Config.DIAS_RENOTIFICAR_OBRA):
                         return "renotificar", obra
             return "continua", obra
         else:
             historial[clave_obra] = {
                 "estado": obra, "linea_original": linea, "tipo": "obra",
-                "contador": 1, "primera_deteccion": datetime.now(Config.TIMEZONE_LOCAL).isoformat(),
+                "contador": 1, "primera_deteccion": ahora().isoformat(),
                 "ultima_notificacion": None, "es_obra_programada": True,
-                "detectada_por_texto": True, "activa": True, "ya_notificada": True
+                "detectada_por_texto": True, "activa": True, "ya_notificada": True,
+                "estado_normalizado": obra_normalizada
             }
             return "obra_cambiada", obra
 
@@ -131,7 +167,7 @@ def procesar_problema_individual(linea, problema, indice, historial):
     if clave_problema not in historial:
         historial[clave_problema] = {
             "estado": problema, "linea_original": linea, "tipo": "problema",
-            "contador": 1, "primera_deteccion": datetime.now(Config.TIMEZONE_LOCAL).isoformat(),
+            "contador": 1, "primera_deteccion": ahora().isoformat(),
             "ultima_notificacion": None, "es_obra_programada": False,
             "detectada_por_texto": False, "activa": True, "ya_notificada": True
         }
@@ -141,7 +177,7 @@ def procesar_problema_individual(linea, problema, indice, historial):
         
         if not historial[clave_problema].get("activa", True):
             historial[clave_problema]["activa"] = True
-            historial[clave_problema]["fecha_reactivacion"] = datetime.now(Config.TIMEZONE_LOCAL).isoformat()
+            historial[clave_problema]["fecha_reactivacion"] = ahora().isoformat()
             return "problema_reactivado", problema
             
         if historial[clave_problema]["contador"] >= Config.UMBRAL_OBRA_PROGRAMADA and not historial[clave_problema]["es_obra_programada"]:
@@ -154,7 +190,7 @@ def procesar_problema_individual(linea, problema, indice, historial):
     else:
         historial[clave_problema] = {
             "estado": problema, "linea_original": linea, "tipo": "problema",
-            "contador": 1, "primera_deteccion": datetime.now(Config.TIMEZONE_LOCAL).isoformat(),
+            "contador": 1, "primera_deteccion": ahora().isoformat(),
             "ultima_notificacion": None, "es_obra_programada": False,
             "detectada_por_texto": False, "activa": True, "ya_notificada": True
         }
@@ -162,9 +198,9 @@ def procesar_problema_individual(linea, problema, indice, historial):
 
 def detectar_componentes_desaparecidos(linea, componentes, historial):
     cambios_resueltos = []
-    claves_linea = [k for k in historial.keys() if historial[k].get("linea_original") == linea]
+    claves_linea = claves_de_linea(historial, linea)
     
-    for clave in claves_linea[:]: 
+    for clave in claves_linea: 
         tipo = historial[clave]["tipo"]
         estado = historial[clave]["estado"]
         es_obra = historial[clave].get("es_obra_programada", False)
@@ -180,11 +216,36 @@ def detectar_componentes_desaparecidos(linea, componentes, historial):
                 del historial[clave]
             else:
                 historial[clave]["activa"] = False
-                historial[clave]["fecha_desaparicion"] = datetime.now(Config.TIMEZONE_LOCAL).isoformat()
+                historial[clave]["fecha_desaparicion"] = ahora().isoformat()
     return cambios_resueltos
 
-def procesar_linea_con_problemas(linea, estado_actual, historial):
+# Huella del último texto visto por línea y sus componentes ya clasificados
+_huellas_lineas = {}
+
+# Líneas analizadas de cero y líneas que reutilizaron el análisis del ciclo anterior
+estadisticas_ultimo_ciclo = {"lineas_analizadas": 0, "lineas_sin_cambios": 0}
+
+def _huella(texto):
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=16).digest()
+
+def _componentes_de_linea(linea, estado_actual):
+    """Devuelve (componentes, sin_cambios). Si el texto de la línea es el mismo que en el ciclo
+    anterior se reutiliza la clasificación y solo quedan los contadores y los chequeos de fechas."""
+    huella = _huella(estado_actual)
+    previo = _huellas_lineas.get(linea)
+    if previo is not None and previo[0] == huella:
+        return previo[1], True
     componentes = procesar_estado_por_oraciones(estado_actual)
+    _huellas_lineas[linea] = (huella, componentes)
+    return componentes, False
+
+def reiniciar_huellas():
+    """Olvida las huellas por línea; el próximo ciclo analiza todo de cero."""
+    _huellas_lineas.clear()
+
+def procesar_linea_con_problemas(linea, estado_actual, historial):
+    componentes, sin_cambios = _componentes_de_linea(linea, estado_actual)
+    estadisticas_ultimo_ciclo["lineas_sin_cambios" if sin_cambios else "lineas_analizadas"] += 1
     resultados = {'cambios_nuevos': [], 'obras_programadas': [], 'obras_renotificar': []}
     
     for i, obra in enumerate(componentes['obras']):
@@ -208,13 +269,13 @@ def procesar_linea_con_problemas(linea, estado_actual, historial):
 
 def limpiar_historial_antiguo(historial):
     claves_a_eliminar = []
-    ahora = datetime.now(Config.TIMEZONE_LOCAL)
+    momento = ahora()
     
     for clave, datos in historial.items():
         if not datos.get("activa", True):
             fecha_desap_str = datos.get("fecha_desaparicion")
             if fecha_desap_str:
-                dias = (ahora - datetime.fromisoformat(fecha_desap_str)).days
+                dias = (momento - datetime.fromisoformat(fecha_desap_str)).days
                 es_obra_persist = datos.get("es_obra_programada", False) and not datos.get("detectada_por_texto", True)
                 if dias >= Config.DIAS_LIMPIAR_HISTORIAL:
                     if es_obra_persist or not datos.get("es_obra_programada", False):
@@ -222,8 +283,46 @@ def limpiar_historial_antiguo(historial):
     
     for clave in claves_a_eliminar:
         del historial[clave]
+    return len(claves_a_eliminar)
+
+def analisis_omitible(historial):
+    """Indica si, con la página idéntica a la del ciclo anterior, el análisis no tendría nada que
+    notificar: sin problemas activos aún no convertidos a obra y sin renotificaciones vencidas."""
+    momento = ahora()
+    plazo = timedelta(days=Config.DIAS_RENOTIFICAR_OBRA)
+    for datos in historial.values():
+        if not datos.get("activa", True):
+            continue
+        if datos["tipo"] == "problema" and not datos.get("es_obra_programada", False):
+            return False
+        if datos["tipo"] == "obra" and datos.get("es_obra_programada") and datos.get("ya_notificada", False):
+            ultima = datos.get("ultima_notificacion")
+            if ultima and momento - datetime.fromisoformat(ultima) >= plazo:
+                return False
+    return True
+
+def ciclo_sin_cambios(estados_actuales, historial):
+    """Aplica al historial lo que el análisis completo haría con la misma página que el ciclo anterior,
+    cuando analisis_omitible() lo permite: la limpieza por antigüedad y, como en
+    detectar_componentes_desaparecidos, renovar la fecha de desaparición de las obras que siguen
+    ausentes en líneas con novedades (si no, la limpieza las borraría antes que el análisis completo).
+    Devuelve True si modificó el historial."""
+    modificado = limpiar_historial_antiguo(historial) > 0
+    sin_novedades = (Config.ESTADO_NORMAL.lower(), Config.ESTADO_REDUNDANTE.lower())
+    momento = ahora().isoformat()
+    for linea, estado in estados_actuales.items():
+        if estado.lower() in sin_novedades:
+            continue
+        for clave in claves_de_linea(historial, linea):
+            datos = dict.__getitem__(historial, clave)
+            if not datos.get("activa", True) and datos.get("es_obra_programada", False):
+                historial[clave]["fecha_desaparicion"] = momento
+                modificado = True
+    return modificado
 
 def analizar_cambios_con_historial(estados_actuales, historial_previo):
+    if not isinstance(historial_previo, Historial):
+        historial_previo = Historial(historial_previo)
     limpiar_historial_antiguo(historial_previo)
 
     estados_procesar = {l: e for l, e in estados_actuales.items() if e.lower() != Config.ESTADO_REDUNDANTE.lower()}
@@ -231,6 +330,7 @@ def analizar_cambios_con_historial(estados_actuales, historial_previo):
     cambios_nuevos = {}
     obras_programadas = {}
     obras_renotificar = {}
+    estadisticas_ultimo_ciclo.update(lineas_analizadas=0, lineas_sin_cambios=0)
 
     for linea, estado in estados_procesar.items():
         if estado.lower() != Config.ESTADO_NORMAL.lower():
@@ -239,15 +339,18 @@ def analizar_cambios_con_historial(estados_actuales, historial_previo):
             if res['obras_programadas']: obras_programadas[linea] = res['obras_programadas']
             if res['obras_renotificar']: obras_renotificar[linea] = res['obras_renotificar']
         else:
-            claves_elim = [k for k in historial_previo.keys() if historial_previo[k].get("linea_original") == linea]
+            # Las líneas normales también registran su huella para las estadísticas del ciclo
+            _, sin_cambios = _componentes_de_linea(linea, estado)
+            estadisticas_ultimo_ciclo["lineas_sin_cambios" if sin_cambios else "lineas_analizadas"] += 1
+            claves_elim = historial_previo.claves_linea(linea)
             if claves_elim:
                 for c in claves_elim: del historial_previo[c]
                 cambios_nuevos[linea] = ["Volvió a funcionar normalmente"]
 
-    ahora = datetime.now(Config.TIMEZONE_LOCAL).isoformat()
+    momento = ahora().isoformat()
     for coleccion in [cambios_nuevos, obras_programadas, obras_renotificar]:
         for linea in coleccion.keys():
-            for clave in [k for k in historial_previo.keys() if historial_previo[k].get("linea_original") == linea]:
-                historial_previo[clave]["ultima_notificacion"] = ahora
+            for clave in historial_previo.claves_linea(linea):
+                historial_previo[clave]["ultima_notificacion"] = momento
 
     return cambios_nuevos, obras_programadas, obras_renotificar, estados_procesar, historial_previo
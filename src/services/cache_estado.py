@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+Snapshot = namedtuple("Snapshot", ["estados", "edad"])
+
+class CacheEstado:
+    """Último estado scrapeado en memoria, compartido por el scheduler y los comandos del bot."""
+
+    def __init__(self, max_edad=None, max_stale=None, reloj=time.monotonic):
+        self._max_edad = max_edad
+        self._max_stale = max_stale
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._estados = None
+        self._momento = None
+        self._revalidando = False
+
+    @property
+    def max_edad(self):
+        return Config.CACHE_ESTADO_MAX_EDAD if self._max_edad is None else self._max_edad
+
+    @property
+    def max_stale(self):
+        return Config.CACHE_ESTADO_MAX_STALE if self._max_stale is None else self._max_stale
+
+    def actualizar(self, estados):
+        """Guarda un scrapeo exitoso como snapshot vigente."""
+        if not estados:
+            return
+        with self._lock:
+            self._estados = dict(estados)
+            self._momento = self._reloj()
+
+    def limpiar(self):
+        with self._lock:
+            self._estados = None
+            self._momento = None
+
+    def actual(self):
+        """Devuelve el snapshot guardado (sin importar su edad) o None."""
+        with self._lock:
+            if self._estados is None:
+                return None
+            return Snapshot(dict(self._estados), self._reloj() - self._momento)
+
+    def _refrescar(self, scrapear):
+        try:
+            self.actualizar(scrapear())
+        except Exception as e:
+            logger.error("Error al revalidar el estado en segundo plano: %s", e)
+        finally:
+            with self._lock:
+                self._revalidando = False
+
+    def _revalidar_en_segundo_plano(self, scrapear):
+        with self._lock:
+            if self._revalidando:
+                return
+            self._revalidando = True
+        threading.Thread(target=self._refrescar, args=(scrapear,), daemon=True).start()
+
+    def obtener(self, scrapear):
+        """Responde desde memoria si el dato es fresco; si está vencido pero dentro de la
+        ventana stale lo devuelve igual y revalida en segundo plano; si no, scrapea en el momento."""
+        snapshot = self.actual()
+        if snapshot is not None:
+            if snapshot.edad <= self.max_edad:
+                return snapshot
+            if snapshot.edad <= self.max_edad + self.max_stale:
+                self._revalidar_en_segundo_plano(scrapear)
+                return snapshot
+
+        estados = scrapear()
+        if not estados:
+            return None
+        self.actualizar(estados)
+        return Snapshot(dict(estados), 0.0)
+
+cache_estado = CacheEstado()
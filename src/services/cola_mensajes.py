@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+from src.config import Config
+from src.services import metricas
+
+logger = logging.getLogger(__name__)
+
+def _leer_retry_after(response):
+    try:
+        return float(response.json().get("parameters", {}).get("retry_after"))
+    except Exception:
+        return None
+
+class ColaMensajes:
+    """Cola de salida hacia Telegram drenada por un hilo en segundo plano.
+
+    Respeta un mínimo entre mensajes al mismo chat y un máximo global por segundo,
+    reintenta con backoff exponencial (o el retry_after que indique Telegram) y
+    persiste en disco los mensajes pendientes para sobrevivir a un reinicio.
+
+    Si Telegram responde 403 (el usuario bloqueó al bot) se descartan todos los pendientes de ese
+    chat y se avisa a 'al_bloquear(chat_id)'.
+    """
+
+    def __init__(self, enviar, archivo=None, reloj=time.monotonic, al_bloquear=None):
+        self._enviar = enviar
+        self._al_bloquear = al_bloquear
+        self._archivo = archivo
+        self._reloj = reloj
+        self._condicion = threading.Condition()
+        self._pendientes = deque()
+        self._ultimo_por_chat = {}
+        self._envios_recientes = deque()
+        self._pausa_hasta = 0.0
+        self._hilo = None
+        self._detener = False
+        self._sucio = False
+        self._ultima_persistencia = 0.0
+        self.estadisticas = {"enviados": 0, "reintentos": 0, "descartados": 0, "limitados_429": 0}
+
+    @property
+    def archivo(self):
+        return self._archivo or Config.ARCHIVO_COLA_MENSAJES
+
+    @property
+    def activa(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def __len__(self):
+        with self._condicion:
+            return len(self._pendientes)
+
+    def encolar(self, mensaje, chat_id):
+        with self._condicion:
+            self._pendientes.append({"chat_id": chat_id, "texto": mensaje, "intentos": 0, "proximo_intento": 0.0})
+            self._sucio = True
+            self._condicion.notify()
+
+    def encolar_lote(self, mensaje, chat_ids):
+        """Encola el mismo mensaje para muchos chats con una sola toma del lock."""
+        with self._condicion:
+            for chat_id in chat_ids:
+                self._pendientes.append({"chat_id": chat_id, "texto": mensaje, "intentos": 0, "proximo_intento": 0.0})
+            self._sucio = True
+            self._condicion.notify()
+
+    def iniciar(self):
+        """Recupera los pendientes de una ejecución anterior y arranca el hilo de envío."""
+        if self.activa:
+            return
+        self._cargar_pendientes()
+        self._detener = False
+        self._hilo = threading.Thread(target=self._drenar, name="cola-telegram", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=5):
+        """Frena el hilo de envío y deja en disco lo que no se llegó a entregar."""
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify_all()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+        self._persistir()
+
+    def _cargar_pendientes(self):
+        try:
+            if self.archivo.exists():
+                with open(self.archivo, 'r', encoding='utf-8') as f:
+                    guardados = json.load(f)
+                with self._condicion:
+                    for item in guardados:
+                        self._pendientes.append({**item, "proximo_intento": 0.0})
+                if guardados:
+                    logger.info("Recuperados %d mensajes pendientes de envío.", len(guardados))
+        except Exception as e:
+            logger.error("Error de I/O al cargar la cola de mensajes: %s", e)
+
+    def _persistir(self):
+        with self._condicion:
+            datos = [{"chat_id": i["chat_id"], "texto": i["texto"], "intentos": i["intentos"]} for i in self._pendientes]
+            self._sucio = False
+            self._ultima_persistencia = self._reloj()
+        try:
+            temporal = self.archivo.with_suffix('.tmp')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False)
+            os.replace(temporal, self.archivo)
+        except Exception as e:
+            logger.error("Error de I/O al guardar la cola de mensajes: %s", e)
+
+    def _siguiente(self, ahora):
+        """Devuelve (item, None) si hay algo para enviar ya, o (None, segundos_a_esperar)."""
+        while self._envios_recientes and ahora - self._envios_recientes[0] >= 1.0:
+            self._envios_recientes.popleft()
+
+        espera_global = self._pausa_hasta - ahora
+        if len(self._envios_recientes) >= Config.TELEGRAM_MENSAJES_POR_SEGUNDO:
+            espera_global = max(espera_global, self._envios_recientes[0] + 1.0 - ahora)
+        if espera_global > 0:
+            return None, espera_global
+
+        espera = None
+        chats_bloqueados = set()
+        for item in self._pendientes:
+            chat_id = item["chat_id"]
+            if chat_id in chats_bloqueados:
+                continue
+            listo_en = max(
+                item["proximo_intento"],
+                self._ultimo_por_chat.get(chat_id, float('-inf')) + Config.TELEGRAM_INTERVALO_POR_CHAT,
+            )
+            if listo_en <= ahora:
+                return item, None
+            # Se respeta el orden de los mensajes de cada chat
+            chats_bloqueados.add(chat_id)
+            espera = listo_en - ahora if espera is None else min(espera, listo_en - ahora)
+        return None, espera
+
+    def _drenar(self):
+        while True:
+            with self._condicion:
+                if self._detener:
+                    return
+                item, espera = self._siguiente(self._reloj())
+                if item is None:
+                    # Con cambios sin persistir no se duerme más de medio segundo
+                    if self._sucio:
+                        espera = 0.5 if espera is None else min(espera, 0.5)
+                    self._condicion.wait(timeout=espera)
+
+            if item is not None:
+                self._intentar(item)
+            if self._sucio and self._reloj() - self._ultima_persistencia >= 0.5:
+                self._persistir()
+
+    def _intentar(self, item):
+        ahora = self._reloj()
+        with self._condicion:
+            self._ultimo_por_chat[item["chat_id"]] = ahora
+            self._envios_recientes.append(ahora)
+
+        try:
+            self._enviar(item["texto"], item["chat_id"])
+            self._resolver(item, entregado=True)
+            return
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status == 429:
+                retry_after = _leer_retry_after(e.response) or 1.0
+                self.estadisticas["limitados_429"] += 1
+                metricas.errores_telegram.inc(tipo="limite_429")
+                logger.warning("Telegram limitó los envíos (429). Reintentando en %.0f s.", retry_after)
+                with self._condicion:
+                    self._pausa_hasta = self._reloj() + retry_after
+                    item["proximo_intento"] = self._pausa_hasta
+                return
+            if status == 403:
+                self._bloqueado(item)
+                return
+            if status is not None and 400 <= status < 500:
+                metricas.errores_telegram.inc(tipo="rechazado")
+                logger.error("Telegram rechazó el mensaje para %s (%s). Se descarta.", item['chat_id'], status)
+                self._resolver(item, entregado=False)
+                return
+            error = e
+        except requests.exceptions.RequestException as e:
+            error = e
+        except Exception as e:
+            metricas.errores_telegram.inc(tipo="inesperado")
+            logger.exception("Error inesperado en la cola de mensajes: %s", e)
+            self._resolver(item, entregado=False)
+            return
+
+        self._reintentar(item, error)
+
+    def _bloqueado(self, item):
+        chat_id = item["chat_id"]
+        metricas.errores_telegram.inc(tipo="rechazado")
+        with self._condicion:
+            descartados = [i for i in self._pendientes if i["chat_id"] == chat_id and i is not item]
+            for pendiente in descartados:
+                self._pendientes.remove(pendiente)
+        self.estadisticas["descartados"] += len(descartados)
+        logger.warning("El chat %s bloqueó al bot (403). Se descartan sus %d mensajes pendientes.",
+                       chat_id, len(descartados) + 1)
+        self._resolver(item, entregado=False)
+        if self._al_bloquear is not None:
+            try:
+                self._al_bloquear(chat_id)
+            except Exception as e:
+                logger.error("Error al dar de baja el chat %s: %s", chat_id, e)
+
+    def _reintentar(self, item, error):
+        metricas.errores_telegram.inc(tipo="red")
+        item["intentos"] += 1
+        if item["intentos"] > Config.TELEGRAM_MAX_REINTENTOS:
+            logger.error("Se agotaron los reintentos para %s: %s", item['chat_id'], error)
+            self._resolver(item, entregado=False)
+            return
+        espera = min(Config.TELEGRAM_BACKOFF_BASE * 2 ** (item["intentos"] - 1), Config.TELEGRAM_BACKOFF_MAXIMO)
+        logger.warning("Error de red al notificar por Telegram: %s. Reintento %d en %.0f s.", error, item['intentos'], espera)
+        self.estadisticas["reintentos"] += 1
+        with self._condicion:
+            item["proximo_intento"] = self._reloj() + espera
+            self._sucio = True
+
+    def _resolver(self, item, entregado):
+        with self._condicion:
+            try:
+                self._pendientes.remove(item)
+            except ValueError:
+                pass
+            self._sucio = True
+        self.estadisticas["enviados" if entregado else "descartados"] += 1
@@ -0,0 +1,257 @@
+import array
+import bisect
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+from itertools import compress
+
+from src.config import Config
+from src.services.suscripciones import LINEAS_VALIDAS, normalizar_linea
+
+logger = logging.getLogger(__name__)
+
+# Código de cada muestra: un byte por línea y ciclo
+NORMAL, OBRA, INCIDENTE, SIN_SERVICIO = 0, 1, 2, 3
+
+# Registro del archivo: momento (epoch, segundos), índice de la línea en LINEAS_VALIDAS, código
+_REGISTRO = struct.Struct('<qBB')
+_RACHAS = re.compile(rb'\x01+')
+_MASCARAS = {
+    codigo: bytes(int(valor == codigo) for valor in range(256))
+    for codigo in (NORMAL, OBRA, INCIDENTE, SIN_SERVICIO)
+}
+
+Incidente = namedtuple("Incidente", ["inicio", "fin"])
+Ventana = namedtuple("Ventana", ["momentos", "codigos", "duraciones", "siguiente"])
+Resumen = namedtuple("Resumen", [
+    "linea", "dias", "muestras", "segundos_observados", "disponibilidad", "normal", "obras",
+    "incidentes", "mttr", "horas_pico",
+])
+
+def hueco_maximo():
+    """Separación entre muestras por encima de la cual el intervalo se toma como 'sin datos'
+    (la noche fuera de la ventana, o el servicio caído) en vez de atribuirlo al último estado."""
+    return Config.INTERVALO_MAXIMO * (1 + Config.PLANIFICADOR_JITTER) + 300
+
+def _lineas_con_incidente(historial):
+    """Líneas canónicas con un problema activo. Se clasifica por origen: un problema que dura tanto
+    que el analyzer lo pasa a obra programada sigue siendo un incidente; solo las obras anunciadas
+    en el texto cuentan como OBRA."""
+    return {
+        normalizar_linea(datos.get("linea_original"))
+        for datos in historial.values()
+        if datos.get("tipo") == "problema" and datos.get("activa", True) and not datos.get("detectada_por_texto", False)
+    }
+
+def clasificar(estados, historial):
+    """{linea canónica: código} para los estados de un ciclo ya analizado."""
+    con_incidente = _lineas_con_incidente(historial)
+    normal = Config.ESTADO_NORMAL.lower()
+    sin_servicio = Config.ESTADO_REDUNDANTE.lower()
+
+    codigos = {}
+    for nombre, estado in estados.items():
+        linea = normalizar_linea(nombre)
+        if linea is None:
+            continue
+        texto = estado.lower()
+        if texto == sin_servicio:
+            codigos[linea] = SIN_SERVICIO
+        elif texto == normal:
+            codigos[linea] = NORMAL
+        elif linea in con_incidente:
+            codigos[linea] = INCIDENTE
+        else:
+            # Solo obras anunciadas
+            codigos[linea] = OBRA
+    return codigos
+
+class _Serie:
+    """Muestras de una línea en columnas compactas: momentos en un array de enteros, códigos en un
+    bytearray y, por cada muestra, los segundos que representa (hasta la siguiente, o 0 si el hueco
+    supera el máximo). La duración se fija al llegar la muestra siguiente, así las consultas solo suman."""
+    __slots__ = ("momentos", "codigos", "duraciones")
+
+    def __init__(self):
+        self.momentos = array.array('q')
+        self.codigos = bytearray()
+        self.duraciones = array.array('l')
+
+    def agregar(self, momento, codigo, hueco):
+        if self.momentos:
+            delta = momento - self.momentos[-1]
+            if delta < 0:
+                return False
+            self.duraciones[-1] = delta if delta <= hueco else 0
+        self.momentos.append(momento)
+        self.codigos.append(codigo)
+        self.duraciones.append(0)
+        return True
+
+    def ventana(self, desde, hasta):
+        inicio = bisect.bisect_left(self.momentos, desde)
+        fin = bisect.bisect_right(self.momentos, hasta)
+        duraciones = self.duraciones[inicio:fin]
+        siguiente = self.momentos[fin] if fin < len(self.momentos) else None
+        if duraciones and siguiente is None:
+            # La última muestra sigue vigente hasta el fin de la ventana
+            delta = hasta - self.momentos[fin - 1]
+            duraciones[-1] = delta if delta <= hueco_maximo() else 0
+        return Ventana(self.momentos[inicio:fin], self.codigos[inicio:fin], duraciones, siguiente)
+
+def _incidentes(ventana):
+    """Rachas de muestras en INCIDENTE. Cada una termina en la primera muestra con otro código;
+    si la racha llega al final de la ventana, en la muestra siguiente (None: sigue activo)."""
+    momentos = ventana.momentos
+    return [
+        Incidente(momentos[racha.start()], momentos[racha.end()] if racha.end() < len(momentos) else ventana.siguiente)
+        for racha in _RACHAS.finditer(ventana.codigos.translate(_MASCARAS[INCIDENTE]))
+    ]
+
+def calcular_resumen(linea, dias, ventana):
+    """Agrega las muestras de una ventana. Las pasadas por muestra (máscaras, rachas y sumas)
+    corren en C con translate/compress/re; el único bucle en Python recorre los incidentes."""
+    if not ventana.momentos:
+        return Resumen(linea, dias, 0, 0, None, None, None, 0, None, [])
+
+    tiempo = {
+        codigo: sum(compress(ventana.duraciones, ventana.codigos.translate(_MASCARAS[codigo])))
+        for codigo in (NORMAL, OBRA, INCIDENTE)
+    }
+    observado = sum(tiempo.values())
+
+    incidentes = _incidentes(ventana)
+    resueltos = [incidente.fin - incidente.inicio for incidente in incidentes if incidente.fin is not None]
+    horas = Counter(datetime.fromtimestamp(incidente.inicio, Config.TIMEZONE_LOCAL).hour for incidente in incidentes)
+
+    def porcentaje(segundos):
+        return 100 * segundos / observado if observado else None
+
+    return Resumen(
+        linea=linea,
+        dias=dias,
+        muestras=len(ventana.momentos),
+        segundos_observados=observado,
+        disponibilidad=porcentaje(observado - tiempo[INCIDENTE]),
+        normal=porcentaje(tiempo[NORMAL]),
+        obras=porcentaje(tiempo[OBRA]),
+        incidentes=len(incidentes),
+        mttr=sum(resueltos) / len(resueltos) if resueltos else None,
+        horas_pico=sorted(horas.items(), key=lambda par: (-par[1], par[0]))[:3],
+    )
+
+class RegistroConfiabilidad:
+    """Muestras por línea de cada ciclo, con su archivo binario de solo agregado.
+
+    Con ellas se calculan disponibilidad, incidentes, tiempo medio de resolución y horarios con
+    más incidentes en cualquier ventana. Los incidentes son rachas de muestras en INCIDENTE.
+    """
+
+    def __init__(self, archivo=None, reloj=time.time):
+        self._archivo = archivo
+        self._reloj = reloj
+        self._lock = threading.RLock()
+        self._series = {linea: _Serie() for linea in LINEAS_VALIDAS}
+        self._ultimo = {}
+        self._cargado = False
+
+    @property
+    def archivo(self):
+        return self._archivo or Config.ARCHIVO_CONFIABILIDAD
+
+    def _asegurar_cargado(self):
+        if self._cargado:
+            return
+        self._cargado = True
+        try:
+            if not self.archivo.exists():
+                return
+            datos = self.archivo.read_bytes()
+        except Exception as e:
+            logger.error("Error de I/O al cargar las muestras de confiabilidad: %s", e)
+            return
+
+        limite = self._reloj() - Config.CONFIABILIDAD_DIAS_RETENCION * 86400
+        hueco = hueco_maximo()
+        completos = len(datos) - len(datos) % _REGISTRO.size
+        descartados = 0
+        for momento, indice, codigo in _REGISTRO.iter_unpack(memoryview(datos)[:completos]):
+            if momento < limite or indice >= len(LINEAS_VALIDAS):
+                descartados += 1
+                continue
+            linea = LINEAS_VALIDAS[indice]
+            self._series[linea].agregar(momento, codigo, hueco)
+            self._ultimo[linea] = codigo
+        if descartados or completos != len(datos):
+            self._compactar()
+
+    def _compactar(self):
+        """Reescribe el archivo solo con las muestras vigentes."""
+        registros = sorted(
+            (momento, indice, codigo)
+            for indice, linea in enumerate(LINEAS_VALIDAS)
+            for momento, codigo in zip(self._series[linea].momentos, self._series[linea].codigos)
+        )
+        try:
+            temporal = self.archivo.with_suffix('.tmp')
+            with open(temporal, 'wb') as f:
+                f.write(b''.join(_REGISTRO.pack(*registro) for registro in registros))
+            os.replace(temporal, self.archivo)
+        except Exception as e:
+            logger.error("Error de I/O al compactar las muestras de confiabilidad: %s", e)
+
+    def registrar(self, estados, historial, momento=None):
+        """Agrega una muestra por línea del ciclo y deja en el log el inicio y fin de cada incidente."""
+        momento = int(self._reloj() if momento is None else momento)
+        codigos = clasificar(estados, historial)
+        hueco = hueco_maximo()
+        with self._lock:
+            self._asegurar_cargado()
+            nuevos = []
+            for linea, codigo in codigos.items():
+                if not self._series[linea].agregar(momento, codigo, hueco):
+                    continue
+                nuevos.append(_REGISTRO.pack(momento, LINEAS_VALIDAS.index(linea), codigo))
+                anterior = self._ultimo.get(linea)
+                if codigo == INCIDENTE and anterior != INCIDENTE:
+                    logger.info("Comienza un incidente en la línea %s", linea, extra={"linea": linea})
+                elif anterior == INCIDENTE and codigo != INCIDENTE:
+                    logger.info("Termina el incidente en la línea %s", linea, extra={"linea": linea})
+                self._ultimo[linea] = codigo
+            if not nuevos:
+                return
+            try:
+                with open(self.archivo, 'ab') as f:
+                    f.write(b''.join(nuevos))
+            except Exception as e:
+                logger.error("Error de I/O al guardar las muestras de confiabilidad: %s", e)
+
+    def incidentes(self, linea, desde, hasta=None):
+        """Incidentes (inicio, fin) de la línea en la ventana; fin es None si sigue activo."""
+        hasta = int(self._reloj() if hasta is None else hasta)
+        with self._lock:
+            self._asegurar_cargado()
+            ventana = self._series[linea].ventana(desde, hasta)
+        return _incidentes(ventana)
+
+    def resumen(self, linea, dias):
+        """Resumen de los últimos 'dias' días de la línea (ya normalizada)."""
+        hasta = int(self._reloj())
+        with self._lock:
+            self._asegurar_cargado()
+            ventana = self._series[linea].ventana(hasta - dias * 86400, hasta)
+        return calcular_resumen(linea, dias, ventana)
+
+    def reiniciar(self):
+        """Olvida las muestras en memoria; se vuelven a leer del disco en el próximo uso."""
+        with self._lock:
+            self._series = {linea: _Serie() for linea in LINEAS_VALIDAS}
+            self._ultimo = {}
+            self._cargado = False
+
+registro_confiabilidad = RegistroConfiabilidad()
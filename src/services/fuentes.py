@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from src.config import Config
+from src.services import metricas
+
+logger = logging.getLogger(__name__)
+
+# Peso de la última medición en el promedio exponencial de latencia
+ALFA_LATENCIA = 0.3
+# El timeout de una fuente es este múltiplo de su latencia promedio, dentro de [TIMEOUT_MINIMO, SCRAPER_HTTP_TIMEOUT]
+FACTOR_TIMEOUT = 4
+TIMEOUT_MINIMO = 2.0
+
+_executor = None
+_lock = threading.Lock()
+_fuentes = {}
+
+class Fuente:
+    """Una URL de la que se puede leer el estado, con su latencia promedio (EWMA), sus fallos
+    seguidos y los validadores HTTP de la última respuesta interpretada."""
+
+    def __init__(self, url):
+        self.url = url
+        partes = urlsplit(url)
+        self.nombre = partes.netloc + partes.path
+        self.latencia = None
+        self.fallos_seguidos = 0
+        # Rondas seguidas en que, estando degradada, no se la consultó
+        self.rondas_sin_consultar = 0
+        self.validadores = {"etag": None, "last_modified": None, "estados": None}
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        if self.latencia is None:
+            return Config.SCRAPER_HTTP_TIMEOUT
+        return min(max(self.latencia * FACTOR_TIMEOUT, TIMEOUT_MINIMO), Config.SCRAPER_HTTP_TIMEOUT)
+
+    @property
+    def degradada(self):
+        """Lenta o fallando: se consulta solo si las demás no respondieron a tiempo."""
+        lenta = self.latencia is not None and self.latencia > Config.FUENTES_LATENCIA_DEGRADADA
+        return lenta or self.fallos_seguidos >= Config.FUENTES_FALLOS_DEGRADAR
+
+    def registrar(self, duracion, exito):
+        with self._lock:
+            estaba_degradada = self.degradada
+            self.latencia = duracion if self.latencia is None else ALFA_LATENCIA * duracion + (1 - ALFA_LATENCIA) * self.latencia
+            self.fallos_seguidos = 0 if exito else self.fallos_seguidos + 1
+            self.rondas_sin_consultar = 0
+            degradada = self.degradada
+        metricas.latencia_fuentes.set(round(self.latencia, 4), fuente=self.nombre)
+        if degradada and not estaba_degradada:
+            logger.warning("Fuente %s degradada (latencia promedio %.2f s, %d fallos seguidos)",
+                           self.nombre, self.latencia, self.fallos_seguidos)
+        elif estaba_degradada and not degradada:
+            logger.info("Fuente %s recuperada (latencia promedio %.2f s)", self.nombre, self.latencia)
+
+    def toca_sondeo(self):
+        """Cuenta una ronda en que no se la consultó. Cada FUENTES_SONDEO_DEGRADADAS rondas devuelve
+        True: sin consultas su latencia y sus fallos no cambian y no podría dejar de estar degradada."""
+        with self._lock:
+            self.rondas_sin_consultar += 1
+            if self.rondas_sin_consultar < Config.FUENTES_SONDEO_DEGRADADAS:
+                return False
+            self.rondas_sin_consultar = 0
+            return True
+
+def urls_configuradas():
+    """La página principal y las alternativas de URLS_ESTADO_SUBTE_ALTERNATIVAS, sin repetir."""
+    alternativas = [url.strip() for url in Config.URLS_ESTADO_SUBTE_ALTERNATIVAS.split(',') if url.strip()]
+    return list(dict.fromkeys([Config.URL_ESTADO_SUBTE] + alternativas))
+
+def obtener_fuentes():
+    """Fuentes según la configuración actual. Las que ya existían conservan su historial de latencia."""
+    with _lock:
+        return [_fuentes.setdefault(url, Fuente(url)) for url in urls_configuradas()]
+
+def reiniciar_fuentes():
+    with _lock:
+        _fuentes.clear()
+
+def _obtener_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fuentes")
+        return _executor
+
+def _medir(fuente, consultar):
+    inicio = time.perf_counter()
+    try:
+        estados = consultar(fuente)
+    except Exception as e:
+        logger.warning("Error inesperado al consultar %s: %s", fuente.nombre, e)
+        estados = None
+    fuente.registrar(time.perf_counter() - inicio, bool(estados))
+    return estados
+
+def _por_latencia(fuentes):
+    return sorted(fuentes, key=lambda fuente: fuente.latencia or 0)
+
+def _sondear(degradadas, consultar, executor):
+    """Lanza en segundo plano las degradadas a las que les toca: su resultado se descarta y solo
+    actualiza su latencia y sus fallos."""
+    for fuente in degradadas:
+        if fuente.toca_sondeo():
+            logger.debug("Sondeando la fuente degradada %s", fuente.nombre)
+            executor.submit(_medir, fuente, consultar)
+
+def primera_valida(fuentes, consultar, reloj=time.monotonic):
+    """Consulta las fuentes en paralelo y devuelve (fuente, estados) de la primera que responde con
+    un resultado válido, o (None, None). 'consultar(fuente)' devuelve estados o None.
+
+    Las degradadas recién se lanzan si en FUENTES_DEMORA_DEGRADADAS segundos ninguna sana dio un
+    resultado válido, o antes si todas las sanas ya fallaron. Las consultas que pierden la carrera
+    terminan en segundo plano y solo actualizan la latencia de su fuente. Cuando no hacen falta, las
+    degradadas se sondean igual cada FUENTES_SONDEO_DEGRADADAS rondas.
+    """
+    if len(fuentes) == 1:
+        estados = _medir(fuentes[0], consultar)
+        return (fuentes[0], estados) if estados else (None, None)
+
+    sanas = _por_latencia(fuente for fuente in fuentes if not fuente.degradada)
+    degradadas = _por_latencia(fuente for fuente in fuentes if fuente.degradada)
+    if not sanas:
+        sanas, degradadas = degradadas, []
+
+    executor = _obtener_executor()
+    pendientes = {executor.submit(_medir, fuente, consultar): fuente for fuente in sanas}
+    limite = reloj() + Config.FUENTES_DEMORA_DEGRADADAS
+
+    while pendientes or degradadas:
+        espera = max(limite - reloj(), 0) if degradadas else None
+        listos, _ = wait(pendientes, timeout=espera, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            fuente = pendientes.pop(futuro)
+            estados = futuro.result()
+            if estados:
+                _sondear(degradadas, consultar, executor)
+                return fuente, estados
+        if degradadas and (not pendientes or reloj() >= limite):
+            logger.info("Sin respuesta válida de las fuentes principales. Consultando las degradadas: %s",
+                        ', '.join(fuente.nombre for fuente in degradadas))
+            pendientes.update({executor.submit(_medir, fuente, consultar): fuente for fuente in degradadas})
+            degradadas = []
+    return None, None
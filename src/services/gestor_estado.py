@@ -0,0 +1,143 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+from src.config import Config
+from src.services import metricas
+from src.services.historial import Historial
+from src.services.storage import cargar_estados_anteriores, guardar_estados, registrar_linea_de_tiempo
+from src.services.suscripciones import nombre_de_linea
+
+logger = logging.getLogger(__name__)
+
+def canonizar_lineas(data):
+    """Lleva los nombres de línea guardados por versiones anteriores, que usaban el alt de la página
+    tal cual (por ejemplo 'Linea A'), a los de los parsers actuales ('Línea A'): en estados_actuales,
+    en linea_original y en las claves del historial, que empiezan con la línea. Si no, las entradas
+    viejas no volverían a coincidir con la página y sus problemas activos no se resolverían nunca.
+    Modifica 'data' y lo devuelve; el próximo guardado persiste los nombres nuevos."""
+    if "estados_actuales" in data:
+        data["estados_actuales"] = {nombre_de_linea(linea) or linea: estado for linea, estado in data["estados_actuales"].items()}
+
+    historial = {}
+    renombradas = 0
+    for clave, datos in data.get("historial", {}).items():
+        anterior = datos.get("linea_original")
+        linea = nombre_de_linea(anterior) or anterior
+        if linea != anterior:
+            if clave.startswith(f"{anterior}_"):
+                clave = linea + clave[len(anterior):]
+            datos = {**datos, "linea_original": linea}
+            renombradas += 1
+        # Si la clave nueva ya estaba con el nombre actual, esa entrada es la más reciente
+        if clave not in historial or linea == anterior:
+            historial[clave] = datos
+    if renombradas:
+        data["historial"] = historial
+        logger.info("Se pasaron %d entradas del historial a los nombres de línea actuales.", renombradas)
+    return data
+
+class GestorEstado:
+    """Mantiene en memoria el historial autoritativo y lo persiste en segundo plano.
+
+    El disco se lee una sola vez, en el primer acceso. Cada ciclo deja su resultado en memoria
+    y programa una escritura diferida; varios ciclos dentro de la demora se escriben juntos.
+    """
+
+    def __init__(self, demora=None):
+        self._demora = demora
+        self._lock = threading.RLock()
+        self._cargado = False
+        self._sucio = False
+        self._timer = None
+        self.historial = Historial()
+        self.estados_actuales = {}
+        self.ultima_actualizacion = None
+        # Huella de la página analizada en el último ciclo; no se persiste
+        self.huella_pagina = None
+        self.escrituras = 0
+
+    @property
+    def demora(self):
+        return Config.PERSISTENCIA_DEMORA if self._demora is None else self._demora
+
+    def bloqueo(self):
+        """Lock a tomar mientras se analiza y modifica el historial, para no persistirlo a medias."""
+        return self._lock
+
+    @contextmanager
+    def transaccion(self):
+        """Toma el lock y entrega el historial residente. Si el bloque falla, las entradas que tocó
+        vuelven a como estaban antes de soltar el lock, así la escritura diferida nunca persiste
+        un análisis a medias."""
+        with self._lock:
+            historial = self.obtener_historial()
+            historial.iniciar_transaccion()
+            try:
+                yield historial
+            except BaseException:
+                historial.deshacer()
+                raise
+            else:
+                historial.confirmar()
+
+    def cargar(self):
+        with self._lock:
+            if self._cargado:
+                return
+            data = canonizar_lineas(cargar_estados_anteriores())
+            self.historial = Historial(data.get("historial", {}))
+            self.estados_actuales = data.get("estados_actuales", {})
+            self.ultima_actualizacion = data.get("ultima_actualizacion")
+            self._cargado = True
+            metricas.historial_entradas.set(len(self.historial))
+
+    def obtener_historial(self):
+        self.cargar()
+        return self.historial
+
+    def registrar_ciclo(self, estados_actuales, historial, fecha_actualizacion, huella_pagina=None):
+        """Actualiza el estado en memoria y agenda su persistencia."""
+        with self._lock:
+            self.huella_pagina = huella_pagina
+            self.estados_actuales = estados_actuales
+            self.historial = historial if isinstance(historial, Historial) else Historial(historial)
+            self.ultima_actualizacion = fecha_actualizacion
+            self._cargado = True
+            self._sucio = True
+            if self.demora <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.demora, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def registrar_sin_cambios(self, fecha_actualizacion):
+        """Ciclo cuya página y cuyo historial no cambiaron: no hay nada que persistir salvo, en el
+        backend SQLite, repetir los estados en la línea de tiempo."""
+        with self._lock:
+            estados_actuales = dict(self.estados_actuales)
+        registrar_linea_de_tiempo(estados_actuales, fecha_actualizacion)
+
+    def flush(self):
+        """Escribe a disco si hay cambios pendientes."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._sucio:
+                return
+            with metricas.duracion_etapa.medir(etapa="guardado"):
+                guardar_estados(self.estados_actuales, self.historial, self.ultima_actualizacion)
+            self._sucio = False
+            self.escrituras += 1
+
+    def reiniciar(self):
+        """Descarta lo que hay en memoria sin persistirlo; el próximo acceso vuelve a leer el disco."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.__init__(self._demora)
+
+gestor_estado = GestorEstado()
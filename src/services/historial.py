@@ -0,0 +1,222 @@
+from functools import lru_cache
+
+# Los textos de obra se repiten ciclo a ciclo, así que se memorizan sus formas normalizadas
+@lru_cache(maxsize=1024)
+def normalizar_obra(texto_obra):
+    normalizado = texto_obra.lower().strip()
+    palabras_a_remover = [
+        'las estaciones ', 'la estación ', 'la estacion ',
+        'estaciones ', 'estación ', 'estacion '
+    ]
+    for palabra in palabras_a_remover:
+        normalizado = normalizado.replace(palabra, '')
+    return ' '.join(normalizado.split())
+
+_AUSENTE = object()
+
+class Historial(dict):
+    """Historial de alertas con índices secundarios por línea, por (línea, tipo) y por texto
+    normalizado de obras. Es un dict común a efectos de serialización.
+
+    Las obras guardan su texto normalizado en "estado_normalizado"; las entradas de archivos
+    anteriores que no lo tienen se completan al cargarse.
+
+    Los índices se mantienen al asignar o borrar claves. Si se cambia en el lugar la línea,
+    el tipo o el texto de una obra de una entrada, hay que reasignarla o llamar a reindexar().
+
+    También registra qué claves cambiaron desde el último tomar_modificadas(), para persistir solo
+    esas. Como las entradas se modifican en el lugar a través de historial[clave], toda clave
+    leída con [] o get() cuenta como modificada; recorrer items() o values() no la marca.
+    """
+
+    def __init__(self, datos=None):
+        super().__init__()
+        self._por_linea = {}
+        self._por_linea_tipo = {}
+        self._obras = {}
+        self._indices_de = {}
+        # dict usado como conjunto ordenado: las claves nuevas quedan en su orden de inserción
+        self._modificadas = {}
+        self._borradas = set()
+        self._reordenado = False
+        # Copias de las entradas tocadas durante una transacción abierta, para poder deshacerla
+        self._respaldo = None
+        self._orden_respaldo = None
+        if datos:
+            self.update(datos)
+
+    @staticmethod
+    def _claves_indice(entrada):
+        linea = entrada.get("linea_original")
+        tipo = entrada.get("tipo")
+        obra = (linea, entrada["estado_normalizado"]) if tipo == "obra" else None
+        return linea, (linea, tipo), obra
+
+    def _indices(self):
+        return (self._por_linea, self._por_linea_tipo, self._obras)
+
+    def _indexar(self, clave, entrada):
+        nuevos = self._claves_indice(entrada)
+        anteriores = self._indices_de.get(clave, (None, None, None))
+        # Solo se mueve lo que cambió, así cada índice conserva el orden de inserción del dict
+        for indice, anterior, nuevo in zip(self._indices(), anteriores, nuevos):
+            if clave in self._indices_de and anterior == nuevo:
+                continue
+            self._quitar(indice, anterior, clave)
+            if nuevo is not None:
+                indice.setdefault(nuevo, {})[clave] = None
+        self._indices_de[clave] = nuevos
+
+    @staticmethod
+    def _quitar(indice, valor, clave):
+        if valor is None or valor not in indice:
+            return
+        indice[valor].pop(clave, None)
+        if not indice[valor]:
+            del indice[valor]
+
+    def _desindexar(self, clave):
+        anteriores = self._indices_de.pop(clave, None)
+        if anteriores is None:
+            return
+        for indice, valor in zip(self._indices(), anteriores):
+            self._quitar(indice, valor, clave)
+
+    def _marcar(self, clave, borrada=False):
+        if self._respaldo is not None and clave not in self._respaldo:
+            entrada = dict.get(self, clave, _AUSENTE)
+            self._respaldo[clave] = entrada if entrada is _AUSENTE else dict(entrada)
+            if borrada and self._orden_respaldo is None:
+                self._orden_respaldo = list(self.keys())
+        self._modificadas[clave] = None
+        if borrada:
+            self._borradas.add(clave)
+
+    def __getitem__(self, clave):
+        entrada = super().__getitem__(clave)
+        self._marcar(clave)
+        return entrada
+
+    def get(self, clave, default=None):
+        if clave in self:
+            return self[clave]
+        return default
+
+    def __setitem__(self, clave, entrada):
+        if entrada.get("tipo") == "obra" and "estado_normalizado" not in entrada:
+            entrada["estado_normalizado"] = normalizar_obra(entrada.get("estado", ""))
+        if clave in self._borradas and not super().__contains__(clave):
+            # Borrada y vuelta a agregar: quedó al final del orden
+            self._reordenado = True
+        self._marcar(clave)
+        super().__setitem__(clave, entrada)
+        self._indexar(clave, entrada)
+
+    def __delitem__(self, clave):
+        if clave in self:
+            self._marcar(clave, borrada=True)
+        super().__delitem__(clave)
+        self._desindexar(clave)
+
+    def pop(self, clave, *default):
+        if clave in self:
+            self._marcar(clave, borrada=True)
+            self._desindexar(clave)
+        return super().pop(clave, *default)
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        clave = next(reversed(self.keys()))
+        self._marcar(clave, borrada=True)
+        entrada = super().pop(clave)
+        self._desindexar(clave)
+        return clave, entrada
+
+    def setdefault(self, clave, default=None):
+        if clave not in self:
+            self[clave] = default
+        return self[clave]
+
+    def update(self, *args, **kwargs):
+        for clave, entrada in dict(*args, **kwargs).items():
+            self[clave] = entrada
+
+    def __ior__(self, otro):
+        self.update(otro)
+        return self
+
+    def clear(self):
+        for clave in list(self.keys()):
+            self._marcar(clave, borrada=True)
+        super().clear()
+        self._por_linea.clear()
+        self._por_linea_tipo.clear()
+        self._obras.clear()
+        self._indices_de.clear()
+
+    def reindexar(self, clave):
+        """Actualiza los índices de una entrada modificada en el lugar."""
+        self._indexar(clave, self[clave])
+
+    def tomar_modificadas(self):
+        """Devuelve (claves, reordenado) con lo cambiado desde la llamada anterior y empieza de cero.
+        Las claves vienen en el orden en que se tocaron por primera vez y las que ya no están fueron
+        borradas; 'reordenado' indica que alguna clave se borró y se volvió a agregar, así que el
+        orden ya no es el de antes más las nuevas al final."""
+        modificadas, reordenado = list(self._modificadas), self._reordenado
+        self._modificadas, self._borradas, self._reordenado = {}, set(), False
+        return modificadas, reordenado
+
+    def marcar_modificadas(self, claves, reordenado=False):
+        """Vuelve a marcar claves tomadas cuyo guardado falló."""
+        self._modificadas.update(dict.fromkeys(claves))
+        self._reordenado = self._reordenado or reordenado
+
+    def iniciar_transaccion(self):
+        """Empieza a guardar una copia de cada entrada antes de que se toque, para deshacer()."""
+        self._respaldo = {}
+        self._orden_respaldo = None
+
+    def confirmar(self):
+        self._respaldo = None
+        self._orden_respaldo = None
+
+    def deshacer(self):
+        """Devuelve las entradas tocadas desde iniciar_transaccion() a como estaban, en su orden."""
+        respaldo, orden = self._respaldo, self._orden_respaldo
+        self.confirmar()
+        if not respaldo:
+            return
+        if orden is None:
+            for clave, entrada in respaldo.items():
+                if entrada is _AUSENTE:
+                    self.pop(clave, None)
+                else:
+                    self[clave] = entrada
+            return
+        # Hubo borrados: se reconstruye el dict para recuperar el orden original
+        actuales = {clave: dict.__getitem__(self, clave) for clave in orden if dict.__contains__(self, clave)}
+        actuales.update({clave: entrada for clave, entrada in respaldo.items() if entrada is not _AUSENTE})
+        self.clear()
+        for clave in orden:
+            self[clave] = actuales[clave]
+
+    def claves_linea(self, linea):
+        return list(self._por_linea.get(linea, ()))
+
+    def claves_tipo(self, linea, tipo):
+        return list(self._por_linea_tipo.get((linea, tipo), ()))
+
+    def buscar_obra(self, linea, obra_normalizada):
+        """Primera obra activa de la línea cuyo texto normalizado coincide, o None."""
+        for clave in self._obras.get((linea, obra_normalizada), ()):
+            if self[clave].get("activa", True):
+                return clave
+        return None
+
+def claves_de_linea(historial, linea):
+    """Claves de una línea, usando el índice si el historial lo tiene."""
+    if isinstance(historial, Historial):
+        return historial.claves_linea(linea)
+    return [k for k in historial.keys() if historial[k].get("linea_original") == linea]
@@ -0,0 +1,74 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import Config
+
+_sesion = None
+_adapter = None
+_lock = threading.Lock()
+_peticiones = 0
+
+def obtener_sesion():
+    """Devuelve la sesión HTTP compartida (keep-alive), creándola en el primer uso."""
+    global _sesion, _adapter
+    with _lock:
+        if _sesion is None:
+            _adapter = HTTPAdapter(
+                pool_connections=Config.HTTP_POOL_CONEXIONES,
+                pool_maxsize=Config.HTTP_POOL_MAXIMO,
+            )
+            sesion = requests.Session()
+            sesion.mount("https://", _adapter)
+            sesion.mount("http://", _adapter)
+            _sesion = sesion
+        return _sesion
+
+def _registrar_peticion():
+    global _peticiones
+    with _lock:
+        _peticiones += 1
+
+def get(url, timeout=None, **kwargs):
+    """GET sobre la sesión compartida; timeout por llamada con HTTP_TIMEOUT como valor por defecto."""
+    sesion = obtener_sesion()
+    _registrar_peticion()
+    return sesion.get(url, timeout=timeout or Config.HTTP_TIMEOUT, **kwargs)
+
+def post(url, timeout=None, **kwargs):
+    """POST sobre la sesión compartida; timeout por llamada con HTTP_TIMEOUT como valor por defecto."""
+    sesion = obtener_sesion()
+    _registrar_peticion()
+    return sesion.post(url, timeout=timeout or Config.HTTP_TIMEOUT, **kwargs)
+
+def obtener_estadisticas():
+    """Peticiones realizadas frente a conexiones TCP abiertas, para medir la reutilización."""
+    with _lock:
+        peticiones = _peticiones
+        adapter = _adapter
+
+    conexiones = 0
+    if adapter is not None:
+        pools = adapter.poolmanager.pools
+        for clave in list(pools.keys()):
+            pool = pools.get(clave)
+            if pool is not None:
+                conexiones += pool.num_connections
+
+    reutilizadas = max(peticiones - conexiones, 0)
+    return {
+        "peticiones": peticiones,
+        "conexiones_abiertas": conexiones,
+        "reutilizadas": reutilizadas,
+        "tasa_reutilizacion": reutilizadas / peticiones if peticiones else 0.0,
+    }
+
+def cerrar():
+    """Cierra la sesión y sus conexiones; la próxima petición abre una nueva."""
+    global _sesion, _adapter, _peticiones
+    with _lock:
+        sesion, _sesion, _adapter = _sesion, None, None
+        _peticiones = 0
+    if sesion is not None:
+        sesion.close()
@@ -0,0 +1,161 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.config import Config
+
+# Campos de contexto que se agregan a cada registro emitido dentro de un ciclo o etapa
+CAMPOS_CONTEXTO = ("ciclo", "etapa", "linea", "duracion")
+
+_contexto = contextvars.ContextVar("contexto_logs", default={})
+_listener = None
+_lock = threading.Lock()
+
+def nuevo_id_ciclo():
+    return uuid.uuid4().hex[:8]
+
+@contextmanager
+def contexto(**campos):
+    """Agrega campos (ciclo, etapa, ...) a todo lo que se loguee dentro del bloque, en este hilo."""
+    token = _contexto.set({**_contexto.get(), **campos})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+class FiltroContexto(logging.Filter):
+    """Copia el contexto al registro en el hilo que loguea, antes de que pase a la cola."""
+
+    def filter(self, record):
+        for campo, valor in _contexto.get().items():
+            if not hasattr(record, campo):
+                setattr(record, campo, valor)
+        return True
+
+class FiltroRepeticiones(logging.Filter):
+    """Deja pasar un mismo warning o error (mismo logger y plantilla) una vez por ventana.
+    El siguiente que pasa informa cuántos se descartaron en el medio."""
+
+    def __init__(self, ventana=None, reloj=time.monotonic):
+        super().__init__()
+        self._ventana = ventana
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._vistos = {}
+
+    @property
+    def ventana(self):
+        return Config.LOG_VENTANA_REPETIDOS if self._ventana is None else self._ventana
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.ventana <= 0:
+            return True
+        clave = (record.name, record.levelno, str(record.msg))
+        ahora = self._reloj()
+        with self._lock:
+            ultimo, suprimidos = self._vistos.get(clave, (None, 0))
+            if ultimo is not None and ahora - ultimo < self.ventana:
+                self._vistos[clave] = (ultimo, suprimidos + 1)
+                return False
+            self._vistos[clave] = (ahora, 0)
+        if suprimidos:
+            record.suprimidos = suprimidos
+        return True
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que no aplana el registro: en el mismo proceso se conserva exc_info para el formateador."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class FormateadorJSON(logging.Formatter):
+    """Un objeto JSON por línea con fecha, nivel, módulo, mensaje y los campos de contexto presentes."""
+
+    def format(self, record):
+        data = {
+            "fecha": datetime.fromtimestamp(record.created, Config.TIMEZONE_LOCAL).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "modulo": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for campo in CAMPOS_CONTEXTO + ("suprimidos",):
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                data[campo] = valor
+        if record.exc_info:
+            data["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class FormateadorTexto(logging.Formatter):
+    """Formato legible para desarrollo local; el contexto va al final entre corchetes."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record):
+        texto = super().format(record)
+        extras = [f"{campo}={getattr(record, campo)}" for campo in CAMPOS_CONTEXTO + ("suprimidos",)
+                  if getattr(record, campo, None) is not None]
+        return f"{texto} [{' '.join(extras)}]" if extras else texto
+
+def _parsear_niveles(especificacion):
+    """'src.services.scrapper=DEBUG,src.services.telegram_bot=WARNING' -> {modulo: nivel}."""
+    niveles = {}
+    for parte in (especificacion or "").split(","):
+        if "=" not in parte:
+            continue
+        modulo, nivel = (texto.strip() for texto in parte.split("=", 1))
+        if modulo and nivel:
+            niveles[modulo] = nivel.upper()
+    return niveles
+
+def configurar_logging(destino=None):
+    """Envía los logs a una cola atendida por un hilo escritor, para que loguear nunca espere I/O.
+    Es idempotente; devuelve el QueueListener."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        salida = logging.StreamHandler(destino or sys.stdout)
+        salida.setFormatter(FormateadorTexto() if Config.LOG_FORMATO == "texto" else FormateadorJSON())
+
+        cola = queue.SimpleQueue()
+        handler = _ManejadorCola(cola)
+        handler.addFilter(FiltroContexto())
+        handler.addFilter(FiltroRepeticiones())
+
+        raiz = logging.getLogger()
+        for previo in list(raiz.handlers):
+            raiz.removeHandler(previo)
+        raiz.addHandler(handler)
+        raiz.setLevel(Config.LOG_NIVEL.upper())
+        for modulo, nivel in _parsear_niveles(Config.LOG_NIVELES).items():
+            logging.getLogger(modulo).setLevel(nivel)
+
+        _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+        _listener.start()
+        atexit.register(detener_logging)
+        return _listener
+
+def detener_logging():
+    """Vacía la cola y frena el hilo escritor."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
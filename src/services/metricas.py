@@ -0,0 +1,195 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Pensados para etapas que van de milisegundos (análisis) a decenas de segundos (Selenium)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _formatear_etiquetas(nombres, valores, extra=()):
+    pares = list(zip(nombres, valores)) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + "}"
+
+def _formatear_numero(valor):
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}, recibió {tuple(etiquetas)}")
+        return tuple(str(etiquetas[nombre]) for nombre in self.etiquetas)
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            for clave, valor in sorted(self._series.items()):
+                lineas.extend(self._muestras(clave, valor))
+        return lineas
+
+    def _muestras(self, clave, valor):
+        return [f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_formatear_numero(valor)}"]
+
+class Contador(_Metrica):
+    """Valor que solo crece (errores, reintentos, fallbacks)."""
+    tipo = "counter"
+
+    def inc(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + valor
+
+    def valor(self, **etiquetas):
+        with self._lock:
+            return self._series.get(self._clave(etiquetas), 0)
+
+class Medidor(_Metrica):
+    """Valor instantáneo que puede subir o bajar (tamaño del historial)."""
+    tipo = "gauge"
+
+    def set(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = valor
+
+    def valor(self, **etiquetas):
+        with self._lock:
+            return self._series.get(self._clave(etiquetas), 0)
+
+class Histograma(_Metrica):
+    """Distribución de duraciones en buckets acumulativos, con suma y cantidad."""
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = {"buckets": [0] * len(self.buckets), "suma": 0.0, "cantidad": 0}
+            indice = bisect.bisect_left(self.buckets, valor)
+            if indice < len(self.buckets):
+                serie["buckets"][indice] += 1
+            serie["suma"] += valor
+            serie["cantidad"] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa lo que tarda el bloque, aunque termine con una excepción."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def cantidad(self, **etiquetas):
+        with self._lock:
+            serie = self._series.get(self._clave(etiquetas))
+            return serie["cantidad"] if serie else 0
+
+    def _muestras(self, clave, serie):
+        lineas = []
+        acumulado = 0
+        for limite, cantidad in zip(self.buckets, serie["buckets"]):
+            acumulado += cantidad
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave, [("le", _formatear_numero(float(limite)))])
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+        etiquetas = _formatear_etiquetas(self.etiquetas, clave, [("le", "+Inf")])
+        lineas.append(f"{self.nombre}_bucket{etiquetas} {serie['cantidad']}")
+        etiquetas = _formatear_etiquetas(self.etiquetas, clave)
+        lineas.append(f"{self.nombre}_sum{etiquetas} {_formatear_numero(serie['suma'])}")
+        lineas.append(f"{self.nombre}_count{etiquetas} {serie['cantidad']}")
+        return lineas
+
+class RegistroMetricas:
+    """Conjunto de métricas del proceso, exportable en el formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def reiniciar(self):
+        for metrica in self._metricas:
+            metrica.reiniciar()
+
+    def exponer(self):
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+registro = RegistroMetricas()
+
+duracion_etapa = registro.registrar(Histograma(
+    "subte_verificacion_etapa_segundos", "Duración de cada etapa de verificar_estados.", etiquetas=("etapa",)))
+duracion_estado = registro.registrar(Histograma(
+    "subte_comando_estado_segundos", "Tiempo en armar la respuesta de /estado."))
+scrapeos_fallidos = registro.registrar(Contador(
+    "subte_scrapeos_fallidos_total", "Intentos de extracción sin resultado, por vía.", etiquetas=("via",)))
+pkill_ejecutados = registro.registrar(Contador(
+    "subte_pkill_total", "Veces que se mataron los procesos de Chrome tras un error de Selenium."))
+errores_telegram = registro.registrar(Contador(
+    "subte_errores_telegram_total", "Errores al hablar con la API de Telegram, por tipo.", etiquetas=("tipo",)))
+latencia_fuentes = registro.registrar(Medidor(
+    "subte_fuente_latencia_segundos", "Latencia promedio (EWMA) de cada fuente del estado.", etiquetas=("fuente",)))
+historial_entradas = registro.registrar(Medidor(
+    "subte_historial_entradas", "Entradas del historial tras el último análisis."))
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        cuerpo = registro.exponer().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        # Un scrape cada pocos segundos no tiene que llenar la salida del servicio
+        pass
+
+def iniciar_servidor_metricas(host=None, puerto=None):
+    """Levanta el endpoint /metrics en un hilo daemon. Devuelve el servidor, o None si no pudo abrirse."""
+    host = Config.METRICAS_HOST if host is None else host
+    puerto = Config.METRICAS_PUERTO if puerto is None else puerto
+    try:
+        servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    except OSError as e:
+        logger.error("No se pudo abrir el endpoint de métricas en %s:%s: %s", host, puerto, e)
+        return None
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas").start()
+    logger.info("Métricas disponibles en http://%s:%s/metrics", host, servidor.server_address[1])
+    return servidor
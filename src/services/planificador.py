@@ -0,0 +1,75 @@
+import random
+from datetime import datetime, timedelta
+
+from src.config import Config
+
+def dentro_de_ventana(ahora):
+    """Determina si la hora dada está dentro de la ventana de análisis."""
+    return Config.HORARIO_ANALISIS_INICIO <= ahora.hour <= Config.HORARIO_ANALISIS_FIN
+
+def proximo_inicio_de_ventana(ahora):
+    """Próxima apertura de la ventana de análisis estrictamente posterior a 'ahora'."""
+    inicio = ahora.replace(hour=Config.HORARIO_ANALISIS_INICIO, minute=0, second=0, microsecond=0)
+    return inicio if inicio > ahora else inicio + timedelta(days=1)
+
+def lineas_con_incidente(historial):
+    """Líneas con un problema activo que todavía no se considera obra programada."""
+    return sorted({
+        datos.get("linea_original")
+        for datos in historial.values()
+        if datos.get("tipo") == "problema" and datos.get("activa", True) and not datos.get("es_obra_programada", False)
+    } - {None})
+
+def aplicar_jitter(segundos, fraccion=None, azar=random.random):
+    """Desplaza la espera al azar en ±fraccion para no consultar la página siempre en el mismo segundo."""
+    fraccion = Config.PLANIFICADOR_JITTER if fraccion is None else fraccion
+    return max(segundos * (1 + fraccion * (2 * azar() - 1)), 0)
+
+def _todo_normal(estados):
+    normales = (Config.ESTADO_NORMAL.lower(), Config.ESTADO_REDUNDANTE.lower())
+    return all(estado.lower() in normales for estado in estados.values())
+
+class PlanificadorAdaptativo:
+    """Elige el intervalo hasta la próxima verificación según el estado del servicio.
+
+    Con incidentes activos usa INTERVALO_INCIDENTE; tras CICLOS_NORMALES_BACKOFF ciclos seguidos
+    sin novedades duplica el intervalo base por cada tramo igual; siempre dentro de
+    [INTERVALO_MINIMO, INTERVALO_MAXIMO] y sin saltearse la próxima apertura de la ventana.
+    """
+
+    def __init__(self):
+        self.ciclos_normales = 0
+
+    def registrar_ciclo(self, estados):
+        """Actualiza la racha de ciclos sin novedades. Un scrapeo fallido no la modifica."""
+        if not estados:
+            return
+        self.ciclos_normales = self.ciclos_normales + 1 if _todo_normal(estados) else 0
+
+    def proximo_intervalo(self, historial, ahora=None):
+        """Devuelve (segundos, motivo)."""
+        ahora = ahora or datetime.now(Config.TIMEZONE_LOCAL)
+        incidentes = lineas_con_incidente(historial)
+
+        if incidentes:
+            segundos = Config.INTERVALO_INCIDENTE
+            motivo = f"incidente activo en {', '.join(incidentes)}"
+        elif self.ciclos_normales >= Config.CICLOS_NORMALES_BACKOFF:
+            tramos = self.ciclos_normales // Config.CICLOS_NORMALES_BACKOFF
+            segundos = Config.INTERVALO_EJECUCION * 2 ** min(tramos, 16)
+            motivo = f"{self.ciclos_normales} ciclos seguidos sin novedades"
+        else:
+            segundos = Config.INTERVALO_EJECUCION
+            motivo = "intervalo base"
+
+        acotado = min(max(segundos, Config.INTERVALO_MINIMO), Config.INTERVALO_MAXIMO)
+        if acotado != segundos:
+            motivo += f", acotado a [{Config.INTERVALO_MINIMO}, {Config.INTERVALO_MAXIMO}] s"
+        segundos = acotado
+
+        hasta_apertura = (proximo_inicio_de_ventana(ahora) - ahora).total_seconds()
+        if dentro_de_ventana(ahora) and segundos > hasta_apertura:
+            segundos = hasta_apertura
+            motivo += ", recortado a la próxima apertura de la ventana"
+
+        return int(segundos), motivo
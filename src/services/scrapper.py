@@ -1,95 +1,310 @@
+import hashlib
+import json
+import logging
 import os
-import sys
-from pathlib import Path
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-if str(BASE_DIR) not in sys.path:
-    sys.path.append(str(BASE_DIR))
+from html.parser import HTMLParser
+
+import requests
 
 from src.config import Config
+from src.services import metricas
+from src.services.fuentes import obtener_fuentes, primera_valida
+from src.services.single_flight import SingleFlight
+from src.services.suscripciones import nombre_de_linea
+from src.services.webdriver_pool import obtener_pool
+
+logger = logging.getLogger(__name__)
+
+LINEAS_SUBTE = ['A', 'B', 'C', 'D', 'E', 'H', 'Premetro']
+
+# Cantidad de ciclos servidos por cada vía de extracción, para medir la tasa de fallback
+estadisticas_scraping = {"http": 0, "selenium": 0, "fallido": 0}
+
+# Evita que varios /estado simultáneos y el loop principal levanten cada uno su propio Chromium
+_vuelo_scraping = SingleFlight()
+
+# Claves con las que un endpoint JSON puede nombrar la línea y su estado
+_CLAVES_LINEA = ('linea', 'línea', 'nombre', 'name', 'line')
+_CLAVES_ESTADO = ('estado', 'status', 'mensaje', 'descripcion', 'descripción', 'texto')
+
+class _ParserEstadoLineas(HTMLParser):
+    """Extrae las columnas de la última fila de #estadoLineasContainer sin ejecutar JavaScript."""
+
+    ETIQUETAS_VACIAS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+    # Etiquetas que el navegador muestra en su propio renglón: cortan la línea en el .text de Selenium
+    ETIQUETAS_BLOQUE = {'br', 'div', 'p', 'li', 'ul', 'ol', 'table', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._pila = []
+        self.filas = []
+        self.sin_servicio_visible = False
+
+    def _dentro(self, rol):
+        return any(r == rol for _, r in self._pila)
+
+    def handle_starttag(self, tag, attrs):
+        atributos = dict(attrs)
+        clases = (atributos.get('class') or '').split()
+        rol = None
+
+        if atributos.get('id') == 'divSinservicio' and 'hidden' not in atributos:
+            self.sin_servicio_visible = True
+
+        if atributos.get('id') == 'estadoLineasContainer':
+            rol = 'contenedor'
+        elif self._dentro('contenedor'):
+            if 'row' in clases:
+                rol = 'fila'
+                self.filas.append([])
+            elif 'col' in clases and self._dentro('fila') and not self._dentro('columna'):
+                rol = 'columna'
+                self.filas[-1].append({"alt": None, "texto": None})
+            elif self._dentro('columna'):
+                columna = self.filas[-1][-1]
+                if tag == 'img' and columna["alt"] is None:
+                    columna["alt"] = atributos.get('alt') or ''
+                elif tag == 'p' and columna["texto"] is None:
+                    rol = 'p'
+                    columna["texto"] = []
+                elif tag in self.ETIQUETAS_BLOQUE and self._dentro('p'):
+                    columna["texto"].append('\n')
+
+        if tag not in self.ETIQUETAS_VACIAS:
+            self._pila.append((tag, rol))
+
+    def handle_endtag(self, tag):
+        if tag in self.ETIQUETAS_BLOQUE and tag != 'p' and self._dentro('p'):
+            self.filas[-1][-1]["texto"].append('\n')
+        for i in range(len(self._pila) - 1, -1, -1):
+            if self._pila[i][0] == tag:
+                del self._pila[i:]
+                break
+
+    def handle_data(self, data):
+        if self._pila and self._dentro('p'):
+            # Los saltos del código fuente son espacios al renderizar; solo los bloques cortan renglones
+            self.filas[-1][-1]["texto"].append(' '.join(data.split('\n')))
+
+def normalizar_texto(texto):
+    """Deja el texto como lo devuelve el .text de Selenium: espacios colapsados dentro de cada
+    renglón, sin espacios en los bordes de los renglones ni renglones vacíos al principio o al final."""
+    return '\n'.join(' '.join(renglon.split()) for renglon in texto.split('\n')).strip('\n')
+
+def _nombre_linea(nombre, indice=None):
+    """Clave de una línea en los estados, la misma para todos los parsers: 'Línea X' con X canónica.
+    Si el nombre no es una línea conocida se usa la posición de la columna, si la hay."""
+    nombre_linea = nombre_de_linea(nombre)
+    if nombre_linea is None and indice is not None and indice < len(LINEAS_SUBTE):
+        nombre_linea = nombre_de_linea(LINEAS_SUBTE[indice])
+    return nombre_linea
+
+def _armar_estados(columnas):
+    """Arma el diccionario {linea: estado} a partir de pares (alt, texto) de cada columna."""
+    estados = {}
+    for i, (alt_text, estado_texto) in enumerate(columnas):
+        nombre_linea = _nombre_linea(alt_text, i)
+        if estado_texto is None or nombre_linea is None:
+            continue
+        estados[nombre_linea] = estado_texto
+        logger.debug("Extraído - %s: %s", nombre_linea, estado_texto, extra={"linea": nombre_linea})
+    return estados
+
+def parsear_estado_html(html):
+    """Interpreta el HTML de la página de estado. Devuelve None si no tiene las 7 líneas renderizadas."""
+    parser = _ParserEstadoLineas()
+    parser.feed(html)
+    parser.close()
+
+    filas = [fila for fila in parser.filas if fila]
+    if parser.sin_servicio_visible or not filas:
+        return None
+
+    columnas = filas[-1]
+    if len(columnas) < len(LINEAS_SUBTE):
+        return None
+
+    pares = []
+    for columna in columnas:
+        texto = normalizar_texto(''.join(columna["texto"] or []))
+        if not texto:
+            return None
+        pares.append((columna["alt"], texto))
+
+    return _armar_estados(pares)
+
+def _primer_valor(item, claves):
+    for clave, valor in item.items():
+        if str(clave).lower() in claves:
+            return valor
+    return None
+
+def parsear_estado_json(data):
+    """Interpreta un endpoint JSON: un objeto {línea: estado} o una lista de objetos con el nombre de
+    la línea y su estado, directamente o bajo 'lineas', 'estados' o 'data'. Devuelve None si no
+    trae las 7 líneas con texto."""
+    if isinstance(data, dict):
+        for clave in ('lineas', 'líneas', 'estados', 'data'):
+            if clave in data:
+                data = data[clave]
+                break
+
+    if isinstance(data, dict):
+        pares = data.items()
+    elif isinstance(data, list):
+        pares = [(_primer_valor(item, _CLAVES_LINEA), _primer_valor(item, _CLAVES_ESTADO)) for item in data if isinstance(item, dict)]
+    else:
+        return None
+
+    por_linea = {}
+    for nombre, texto in pares:
+        nombre_linea = _nombre_linea(nombre)
+        if nombre_linea and isinstance(texto, str) and texto.strip():
+            por_linea[nombre_linea] = ' '.join(texto.split())
+    if len(por_linea) < len(LINEAS_SUBTE):
+        return None
+    return {nombre_linea: por_linea[nombre_linea] for nombre_linea in map(_nombre_linea, LINEAS_SUBTE)}
+
+def huella_estados(estados):
+    """Huella del fragmento relevante de la página: las líneas y textos de #estadoLineasContainer."""
+    contenido = json.dumps(list(estados.items()), ensure_ascii=False)
+    return hashlib.blake2b(contenido.encode('utf-8'), digest_size=16).hexdigest()
+
+def _interpretar(response):
+    if 'json' in (response.headers.get('Content-Type') or '').lower():
+        return parsear_estado_json(response.json())
+    response.encoding = response.encoding or 'utf-8'
+    return parsear_estado_html(response.text)
+
+def _consultar_fuente(fuente):
+    """Descarga una fuente con HTTP plano y la interpreta sin navegador. Si el servidor responde 304
+    a los encabezados condicionales se reutiliza lo ya interpretado de esa fuente."""
+    validadores = fuente.validadores
+    headers = {'User-Agent': Config.SCRAPER_USER_AGENT}
+    if validadores["estados"]:
+        if validadores["etag"]:
+            headers['If-None-Match'] = validadores["etag"]
+        if validadores["last_modified"]:
+            headers['If-Modified-Since'] = validadores["last_modified"]
+
+    try:
+        response = requests.get(fuente.url, headers=headers, timeout=fuente.timeout)
+        if response.status_code == 304 and validadores["estados"]:
+            logger.info("La fuente %s no cambió (304 Not Modified).", fuente.nombre)
+            return dict(validadores["estados"])
+        response.raise_for_status()
+        estados = _interpretar(response)
+        validadores.update(
+            etag=response.headers.get('ETag') if estados else None,
+            last_modified=response.headers.get('Last-Modified') if estados else None,
+            estados=dict(estados) if estados else None,
+        )
+        return estados
+    except requests.exceptions.RequestException as e:
+        logger.warning("Error de red al consultar %s: %s", fuente.nombre, e)
+    except Exception as e:
+        logger.warning("Error al interpretar %s: %s", fuente.nombre, e)
+    return None
+
+def _obtener_estado_por_http():
+    """Vía rápida: consulta en paralelo la página principal y las alternativas configuradas;
+    gana la primera respuesta con las siete líneas."""
+    fuente, estados = primera_valida(obtener_fuentes(), _consultar_fuente)
+    if estados:
+        logger.debug("Estado tomado de %s", fuente.nombre)
+    return estados
 
 def obtener_estado_subte():
-    """Obtiene el estado actual del subte usando Selenium en modo headless."""
+    """Obtiene el estado actual del subte. Las llamadas concurrentes comparten un único scrapeo."""
+    estados = _vuelo_scraping.ejecutar("estado_subte", _scrapear_estado)
+    return dict(estados) if estados else {}
+
+def _scrapear_estado():
+    """Usa Selenium solo si la vía HTTP no alcanza."""
+    if Config.SCRAPER_HTTP_HABILITADO:
+        estados = _obtener_estado_por_http()
+        if estados:
+            estadisticas_scraping["http"] += 1
+            logger.info("Estado obtenido vía HTTP (sin navegador).")
+            return estados
+        metricas.scrapeos_fallidos.inc(via="http")
+        logger.info("La vía HTTP no pudo interpretar la página. Usando Selenium como respaldo.")
+
+    estados = _obtener_estado_con_selenium()
+    estadisticas_scraping["selenium" if estados else "fallido"] += 1
+    if not estados:
+        metricas.scrapeos_fallidos.inc(via="selenium")
+    if estados:
+        logger.info("Estado obtenido vía Selenium.")
+    return estados
+
+def obtener_estadisticas_scraping():
+    """Devuelve los contadores por vía de extracción y la tasa de fallback a Selenium."""
+    exitosos = estadisticas_scraping["http"] + estadisticas_scraping["selenium"]
+    tasa = estadisticas_scraping["selenium"] / exitosos if exitosos else 0.0
+    return {
+        **estadisticas_scraping,
+        "tasa_fallback": tasa,
+        "scrapeos_reales": _vuelo_scraping.estadisticas["reales"],
+        "scrapeos_coalescidos": _vuelo_scraping.estadisticas["coalescidas"],
+    }
+
+def _obtener_estado_con_selenium():
+    """Obtiene el estado actual del subte usando una sesión de Chromium del pool."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+
     estados = {}
-    driver = None
+    pool = obtener_pool()
     
     try:
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        
-        is_docker = os.path.exists('/.dockerenv') or os.getenv('CHROME_BIN')
-        
-        if is_docker:
-            chrome_options.binary_location = '/usr/bin/chromium'
-            service = webdriver.ChromeService(executable_path='/usr/bin/chromedriver')
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        else:
-            driver = webdriver.Chrome(options=chrome_options)
-
-        print(f"Navegando a: {Config.URL_ESTADO_SUBTE}")
-        driver.get(Config.URL_ESTADO_SUBTE)
-
-        wait = WebDriverWait(driver, 15)
-        wait.until(lambda d: len(d.find_elements(By.CSS_SELECTOR, "#estadoLineasContainer .row:last-child .col")) >= 7)
-
-        sin_servicio = driver.find_elements(By.ID, "divSinservicio")
-        if sin_servicio and not sin_servicio[0].get_attribute("hidden"):
-            print("El sistema de información del subte no está disponible.")
-            driver.quit()
-            return {}
-        
-        columnas = driver.find_elements(By.CSS_SELECTOR, "#estadoLineasContainer .row:last-child .col")
-        lineas_subte = ['A', 'B', 'C', 'D', 'E', 'H', 'Premetro']
-        
-        for i, columna in enumerate(columnas):
-            try:
-                img = columna.find_element(By.CSS_SELECTOR, "img")
-                alt_text = img.get_attribute("alt")
-                p_elemento = columna.find_element(By.CSS_SELECTOR, "p")
-                estado_texto = p_elemento.text.strip()
-
-                if alt_text and alt_text.strip():
-                    nombre_linea = alt_text.strip()
-                else:
-                    if i < len(lineas_subte):
-                        nombre_linea = f"Línea {lineas_subte[i]}"
-                    else:
-                        continue
-                
-                estados[nombre_linea] = estado_texto
-                print(f"Extraído - {nombre_linea}: {estado_texto}")
-                
-            except Exception as e:
-                print(f"Error al extraer información de la columna {i}: {e}")
-                continue
+        with pool.driver() as driver:
+            # Si la sesión ya está en la página, recargar es más barato que navegar de cero
+            if driver.current_url == Config.URL_ESTADO_SUBTE:
+                logger.debug("Recargando: %s", Config.URL_ESTADO_SUBTE)
+                driver.refresh()
+            else:
+                logger.debug("Navegando a: %s", Config.URL_ESTADO_SUBTE)
+                driver.get(Config.URL_ESTADO_SUBTE)
+
+            wait = WebDriverWait(driver, 15)
+            wait.until(lambda d: len(d.find_elements(By.CSS_SELECTOR, "#estadoLineasContainer .row:last-child .col")) >= 7)
+
+            sin_servicio = driver.find_elements(By.ID, "divSinservicio")
+            if sin_servicio and not sin_servicio[0].get_attribute("hidden"):
+                logger.warning("El sistema de información del subte no está disponible.")
+                return {}
+            
+            columnas = driver.find_elements(By.CSS_SELECTOR, "#estadoLineasContainer .row:last-child .col")
+            pares = []
+            
+            for i, columna in enumerate(columnas):
+                try:
+                    img = columna.find_element(By.CSS_SELECTOR, "img")
+                    p_elemento = columna.find_element(By.CSS_SELECTOR, "p")
+                    pares.append((img.get_attribute("alt"), normalizar_texto(p_elemento.text)))
+                except Exception as e:
+                    logger.warning("Error al extraer información de la columna %d: %s", i, e)
+                    pares.append((None, None))
+
+            estados = _armar_estados(pares)
 
         if not estados:
-            print("No se pudo acceder al estado del subte. Reintentando mas tarde.")
+            logger.warning("No se pudo acceder al estado del subte. Reintentando mas tarde.")
         
-        driver.quit()
         return estados
         
     except Exception as e:
-        print(f"Error al obtener estados con Selenium: {e}")
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+        # El driver que falló ya fue descartado por el pool
+        logger.error("Error al obtener estados con Selenium: %s", e)
         try:
-            print("Ejecutando recolector de basura: limpiando procesos zombies de Chrome...")
+            logger.warning("Ejecutando recolector de basura: limpiando procesos zombies de Chrome...")
+            metricas.pkill_ejecutados.inc()
             os.system("pkill -f chrome")
             os.system("pkill -f chromedriver")
         except Exception as kill_e:
-            print(f"Error al ejecutar pkill: {kill_e}")
+            logger.error("Error al ejecutar pkill: %s", kill_e)
+        # pkill se lleva todas las sesiones del pool, también las prestadas a otros hilos: se descartan al volver
+        pool.reiniciar()
             
-        return {}
\ No newline at end of file
+        return {}
@@ -0,0 +1,45 @@
+import threading
+
+class _Vuelo:
+    def __init__(self):
+        self.terminado = threading.Event()
+        self.resultado = None
+        self.error = None
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una única ejecución real."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self.estadisticas = {"reales": 0, "coalescidas": 0}
+
+    def ejecutar(self, clave, funcion):
+        """Ejecuta funcion() o, si ya hay una ejecución en curso para la clave, espera su resultado."""
+        with self._lock:
+            vuelo = self._en_vuelo.get(clave)
+            if vuelo is not None:
+                self.estadisticas["coalescidas"] += 1
+                lider = False
+            else:
+                vuelo = _Vuelo()
+                self._en_vuelo[clave] = vuelo
+                self.estadisticas["reales"] += 1
+                lider = True
+
+        if not lider:
+            vuelo.terminado.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = funcion()
+            return vuelo.resultado
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            vuelo.terminado.set()
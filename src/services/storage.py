@@ -1,33 +1,267 @@
 import json
-import sys
-from pathlib import Path
-
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-if str(BASE_DIR) not in sys.path:
-    sys.path.append(str(BASE_DIR))
+import logging
+import os
+from datetime import datetime
 
 from src.config import Config
+from src.services import storage_sqlite
+from src.services.historial import Historial
+
+logger = logging.getLogger(__name__)
+
+# Estado de lo último persistido, para escribir en el journal solo las diferencias
+_base = None
+
+def _archivo_journal():
+    return Config.ARCHIVO_ESTADO.with_suffix('.journal.jsonl')
+
+def _serializar(datos):
+    return json.dumps(datos, ensure_ascii=False, sort_keys=True)
+
+def _serializar_entradas(historial):
+    return {clave: _serializar(datos) for clave, datos in historial.items()}
+
+def _recordar_base(data, entradas, secuencia, compactar=False):
+    global _base
+    _base = {
+        "ruta": Config.ARCHIVO_ESTADO,
+        "estados_actuales": dict(data.get("estados_actuales", {})),
+        "historial": _serializar_entradas(data.get("historial", {})),
+        # Historial del que se tomaron las claves modificadas en el último guardado
+        "objeto": None,
+        "entradas": entradas,
+        "secuencia": secuencia,
+        "compactar": compactar,
+    }
+
+def _aplicar_delta(data, delta):
+    data["ultima_actualizacion"] = delta["ultima_actualizacion"]
+    if "estados_actuales" in delta:
+        data["estados_actuales"] = delta["estados_actuales"]
+    historial = data.setdefault("historial", {})
+    for clave in delta.get("del", []):
+        historial.pop(clave, None)
+    historial.update(delta.get("set", {}))
+    if "orden" in delta:
+        data["historial"] = {clave: historial[clave] for clave in delta["orden"] if clave in historial}
+
+def _escribir_atomico(ruta, data):
+    """Escribe en un temporal, fuerza el contenido a disco y lo renombra sobre el destino."""
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    try:
+        fd = os.open(ruta.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def _usa_sqlite():
+    return Config.STORAGE_BACKEND == 'sqlite'
 
 def cargar_estados_anteriores():
-    """Lee el historial desde el archivo físico."""
+    """Lee el estado persistido desde el backend configurado (STORAGE_BACKEND)."""
+    if not _usa_sqlite():
+        return _cargar_json()
     try:
-        if Config.ARCHIVO_ESTADO.exists():
-            with open(Config.ARCHIVO_ESTADO, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        if storage_sqlite.esta_vacia() and Config.ARCHIVO_ESTADO.exists():
+            storage_sqlite.migrar_desde_json(_cargar_json())
+        return storage_sqlite.cargar_estados_anteriores()
     except Exception as e:
-        print(f"Error de I/O al cargar estados: {e}")
+        # Un historial vacío acá haría que el próximo guardado borre todas las filas
+        logger.error("Error de I/O al cargar estados: %s", e)
+        raise
+
+def _apartar(ruta):
+    """Renombra un archivo ilegible para que el próximo guardado no lo pise. Devuelve el destino."""
+    destino = ruta.with_name(f"{ruta.name}.corrupto-{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    os.replace(ruta, destino)
+    return destino
+
+def _leer_snapshot():
+    """Lee el snapshot. Si está dañado lo aparta junto con su journal (cuyos deltas dependen de él)
+    y devuelve {}; cualquier otro error de lectura se propaga."""
+    if not Config.ARCHIVO_ESTADO.exists():
         return {}
+    try:
+        with open(Config.ARCHIVO_ESTADO, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("el snapshot no es un objeto JSON")
+        return data
+    except ValueError as e:
+        destino = _apartar(Config.ARCHIVO_ESTADO)
+        if _archivo_journal().exists():
+            _apartar(_archivo_journal())
+        logger.error("El snapshot de estados está dañado (%s). Se movió a %s y se empieza con el historial vacío.", e, destino)
+        return {}
+
+def _cargar_json():
+    """Lee el último snapshot y le reaplica los deltas posteriores del journal.
+
+    El snapshot y cada delta llevan un número de secuencia creciente: los deltas con secuencia
+    menor o igual a la del snapshot ya están incluidos en él (quedan si el proceso se cortó entre
+    el renombrado del snapshot y el vaciado del journal) y se saltean. Un error de lectura se
+    propaga en lugar de devolver un historial vacío que el próximo guardado escribiría encima.
+    """
+    try:
+        existia = Config.ARCHIVO_ESTADO.exists()
+        data = _leer_snapshot()
+        secuencia = data.pop("secuencia", 0)
+
+        entradas = 0
+        cola_danada = False
+        journal = _archivo_journal()
+        if journal.exists():
+            with open(journal, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        delta = json.loads(linea)
+                    except json.JSONDecodeError:
+                        # Una escritura cortada solo puede ser la última línea
+                        cola_danada = True
+                        break
+                    # Deltas sin secuencia: journal anterior a las secuencias, válido solo sobre un snapshot sin ella
+                    secuencia_delta = delta.pop("secuencia", None)
+                    if secuencia_delta is None and secuencia:
+                        continue
+                    if secuencia_delta is not None and secuencia_delta <= secuencia:
+                        continue
+                    _aplicar_delta(data, delta)
+                    secuencia = secuencia_delta or secuencia
+                    entradas += 1
+
+        # Sin snapshot previo (o con uno apartado), el primer guardado lo crea en lugar de empezar un journal
+        _recordar_base(data, entradas, secuencia, compactar=cola_danada or not existia or not data)
+        return data
+    except Exception as e:
+        logger.error("Error de I/O al cargar estados: %s", e)
+        raise
+
+def compactar_estados(estados_actuales, historial, fecha_actualizacion):
+    """Vuelca el estado completo a un snapshot atómico y vacía el journal."""
+    secuencia = _siguiente_secuencia()
+    data = {
+        "ultima_actualizacion": fecha_actualizacion,
+        "estados_actuales": estados_actuales,
+        "historial": historial,
+    }
+    _escribir_atomico(Config.ARCHIVO_ESTADO, {**data, "secuencia": secuencia})
+    # Si se corta acá, el journal viejo solo tiene secuencias menores a la del snapshot y se ignora
+    with open(_archivo_journal(), 'w', encoding='utf-8'):
+        pass
+    _recordar_base(data, 0, secuencia)
+
+def _siguiente_secuencia():
+    """Reserva el próximo número de secuencia antes de escribir, aunque la escritura falle después."""
+    _base["secuencia"] += 1
+    return _base["secuencia"]
+
+def _claves_a_comparar(historial):
+    """Claves del historial que pueden haber cambiado desde el último guardado, en orden, y si
+    cambió el orden. Si es el mismo Historial guardado la vez anterior alcanza con sus claves
+    modificadas; si no, se comparan todas."""
+    if isinstance(historial, Historial):
+        modificadas, reordenado = historial.tomar_modificadas()
+        if _base["objeto"] is historial:
+            return modificadas, reordenado
+    previo = _base["historial"]
+    return list(previo) + [clave for clave in historial if clave not in previo], True
+
+def _calcular_delta(estados_actuales, historial, claves, reordenado, fecha_actualizacion):
+    """Arma el delta contra la base. Solo serializa las claves indicadas."""
+    delta = {"ultima_actualizacion": fecha_actualizacion}
+    if estados_actuales != _base["estados_actuales"]:
+        delta["estados_actuales"] = estados_actuales
+
+    previo = _base["historial"]
+    cambiadas = {}
+    borradas = []
+    for clave in claves:
+        if not dict.__contains__(historial, clave):
+            if clave in previo:
+                borradas.append(clave)
+            continue
+        valor = _serializar(dict.__getitem__(historial, clave))
+        if previo.get(clave) != valor:
+            cambiadas[clave] = valor
+    if cambiadas:
+        delta["set"] = {clave: dict.__getitem__(historial, clave) for clave in cambiadas}
+    if borradas:
+        delta["del"] = borradas
+
+    # Solo si el orden no es el que resultaría de borrar y agregar al final
+    if reordenado:
+        quitadas = set(borradas)
+        esperado = [clave for clave in previo if clave not in quitadas and clave in historial]
+        esperado += [clave for clave in cambiadas if clave not in previo]
+        if esperado != list(historial):
+            delta["orden"] = list(historial)
+    return delta, cambiadas, borradas
+
+def _actualizar_base(historial, cambiadas, borradas, orden):
+    previo = _base["historial"]
+    for clave in borradas:
+        del previo[clave]
+    previo.update(cambiadas)
+    if orden:
+        _base["historial"] = {clave: previo[clave] for clave in historial}
 
 def guardar_estados(estados_actuales, historial, fecha_actualizacion):
-    """Escribe los diccionarios procesados al sistema de archivos."""
+    """Escribe el ciclo en el backend configurado (STORAGE_BACKEND)."""
+    try:
+        if _usa_sqlite():
+            storage_sqlite.guardar_estados(estados_actuales, historial, fecha_actualizacion)
+        else:
+            _guardar_json(estados_actuales, historial, fecha_actualizacion)
+    except Exception as e:
+        logger.error("Error de I/O al guardar estados: %s", e)
+
+def registrar_linea_de_tiempo(estados_actuales, fecha_actualizacion):
+    """Registra los estados de un ciclo sin cambios en el historial. Solo el backend SQLite guarda
+    una línea de tiempo; en JSON no hay nada que escribir."""
+    if not _usa_sqlite():
+        return
     try:
-        data = {
-            "ultima_actualizacion": fecha_actualizacion,
-            "estados_actuales": estados_actuales,
-            "historial": historial
-        }
-        with open(Config.ARCHIVO_ESTADO, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        storage_sqlite.registrar_linea_de_tiempo(estados_actuales, fecha_actualizacion)
     except Exception as e:
-        print(f"Error de I/O al guardar estados: {e}")
\ No newline at end of file
+        logger.error("Error de I/O al guardar estados: %s", e)
+
+def _guardar_json(estados_actuales, historial, fecha_actualizacion):
+    """Agrega al journal solo lo que cambió desde el último guardado; compacta cada JOURNAL_MAX_ENTRADAS ciclos."""
+    if _base is None or _base["ruta"] != Config.ARCHIVO_ESTADO:
+        # Sin base del archivo actual: se lee para conocer su última secuencia antes de escribirle
+        _cargar_json()
+    if _base["compactar"] or _base["entradas"] >= Config.JOURNAL_MAX_ENTRADAS:
+        if isinstance(historial, Historial):
+            historial.tomar_modificadas()
+        try:
+            compactar_estados(estados_actuales, historial, fecha_actualizacion)
+        except Exception:
+            if _base is not None:
+                _base["compactar"] = True
+            raise
+        _base["objeto"] = historial
+        return
+
+    claves, reordenado = _claves_a_comparar(historial)
+    try:
+        delta, cambiadas, borradas = _calcular_delta(estados_actuales, historial, claves, reordenado, fecha_actualizacion)
+        delta["secuencia"] = _siguiente_secuencia()
+        with open(_archivo_journal(), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(delta, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        # Una línea a medio escribir haría ignorar las siguientes: el próximo guardado compacta
+        _base["compactar"] = True
+        raise
+
+    _actualizar_base(historial, cambiadas, borradas, "orden" in delta)
+    _base.update(estados_actuales=dict(estados_actuales), objeto=historial, entradas=_base["entradas"] + 1)
@@ -0,0 +1,199 @@
+import json
+import logging
+import sqlite3
+import threading
+
+from src.config import Config
+from src.services.historial import Historial
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS historial (
+    clave TEXT PRIMARY KEY,
+    orden INTEGER NOT NULL,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_historial_orden ON historial (orden);
+CREATE TABLE IF NOT EXISTS estados_linea (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    linea TEXT NOT NULL,
+    estado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_estados_linea_linea_fecha ON estados_linea (linea, fecha);
+"""
+
+# Migraciones de bases creadas por versiones anteriores: la posición i lleva de user_version i a i + 1.
+# Cada una corre en su propia transacción junto con el cambio de user_version.
+MIGRACIONES = [
+    # Las columnas linea, tipo y activa (y su índice) no las leía ninguna consulta
+    """
+    CREATE TABLE historial_nueva (clave TEXT PRIMARY KEY, orden INTEGER NOT NULL, datos TEXT NOT NULL);
+    INSERT INTO historial_nueva (clave, orden, datos) SELECT clave, orden, datos FROM historial;
+    DROP TABLE historial;
+    ALTER TABLE historial_nueva RENAME TO historial;
+    """,
+]
+
+_conexiones = {}
+_lock = threading.Lock()
+# Historial guardado la última vez en cada base: si vuelve el mismo objeto alcanza con sus claves modificadas
+_guardados = {}
+
+def _migrar(conexion):
+    """Lleva la base a la última versión del esquema. Una base nueva se crea directamente en ella."""
+    (version,) = conexion.execute("PRAGMA user_version").fetchone()
+    existente = conexion.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historial'").fetchone()
+    if existente:
+        for numero, script in enumerate(MIGRACIONES[version:], version + 1):
+            conexion.executescript(f"BEGIN; {script} PRAGMA user_version = {numero}; COMMIT;")
+            logger.info("Base SQLite migrada a la versión %d del esquema.", numero)
+    conexion.executescript(ESQUEMA)
+    conexion.execute(f"PRAGMA user_version = {len(MIGRACIONES)}")
+
+def conectar():
+    """Conexión compartida a la base configurada, en modo WAL."""
+    ruta = Config.ARCHIVO_SQLITE
+    with _lock:
+        conexion = _conexiones.get(ruta)
+        if conexion is None:
+            conexion = sqlite3.connect(ruta, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            _migrar(conexion)
+            _conexiones[ruta] = conexion
+        return conexion
+
+def cerrar():
+    with _lock:
+        for conexion in _conexiones.values():
+            conexion.close()
+        _conexiones.clear()
+        _guardados.clear()
+
+def esta_vacia():
+    conexion = conectar()
+    with _lock:
+        return conexion.execute("SELECT 1 FROM meta WHERE clave = 'ultima_actualizacion'").fetchone() is None
+
+def cargar_estados_anteriores():
+    """Arma el mismo diccionario que el backend JSON a partir de las tablas."""
+    conexion = conectar()
+    with _lock:
+        meta = dict(conexion.execute("SELECT clave, valor FROM meta").fetchall())
+        filas = conexion.execute("SELECT clave, datos FROM historial ORDER BY orden").fetchall()
+
+    if "ultima_actualizacion" not in meta:
+        return {}
+    return {
+        "ultima_actualizacion": meta["ultima_actualizacion"],
+        "estados_actuales": json.loads(meta.get("estados_actuales", "{}")),
+        "historial": {clave: json.loads(datos) for clave, datos in filas},
+    }
+
+def _fila(clave, orden, datos):
+    return (clave, orden, json.dumps(datos, ensure_ascii=False))
+
+def _guardar_todo(conexion, historial):
+    """Reescribe el orden de todas las filas y borra las que ya no están."""
+    filas = [_fila(clave, orden, datos) for orden, (clave, datos) in enumerate(historial.items())]
+    existentes = {clave for (clave,) in conexion.execute("SELECT clave FROM historial")}
+    borradas = existentes - set(historial.keys())
+    if borradas:
+        conexion.executemany("DELETE FROM historial WHERE clave = ?", [(clave,) for clave in borradas])
+    conexion.executemany(
+        "INSERT INTO historial (clave, orden, datos) VALUES (?, ?, ?) "
+        "ON CONFLICT(clave) DO UPDATE SET orden = excluded.orden, datos = excluded.datos",
+        filas,
+    )
+
+def _guardar_modificadas(conexion, historial, claves):
+    """Escribe solo las claves modificadas. Las filas existentes conservan su orden y las nuevas van al final."""
+    borradas = [(clave,) for clave in claves if not dict.__contains__(historial, clave)]
+    if borradas:
+        conexion.executemany("DELETE FROM historial WHERE clave = ?", borradas)
+    (siguiente,) = conexion.execute("SELECT COALESCE(MAX(orden), -1) + 1 FROM historial").fetchone()
+    filas = [
+        _fila(clave, siguiente + i, dict.__getitem__(historial, clave))
+        for i, clave in enumerate(clave for clave in claves if dict.__contains__(historial, clave))
+    ]
+    conexion.executemany(
+        "INSERT INTO historial (clave, orden, datos) VALUES (?, ?, ?) "
+        "ON CONFLICT(clave) DO UPDATE SET datos = excluded.datos",
+        filas,
+    )
+
+def _insertar_linea_de_tiempo(conexion, estados_actuales, fecha_actualizacion):
+    conexion.executemany(
+        "INSERT INTO estados_linea (fecha, linea, estado) VALUES (?, ?, ?)",
+        [(fecha_actualizacion, linea, estado) for linea, estado in estados_actuales.items()],
+    )
+
+def registrar_linea_de_tiempo(estados_actuales, fecha_actualizacion):
+    """Suma a la línea de tiempo los estados de un ciclo que no modificó el historial."""
+    conexion = conectar()
+    with _lock, conexion:
+        _insertar_linea_de_tiempo(conexion, estados_actuales, fecha_actualizacion)
+
+def guardar_estados(estados_actuales, historial, fecha_actualizacion, registrar_linea_de_tiempo=True):
+    """Persiste el ciclo en una sola transacción. Si es el mismo Historial guardado la vez anterior,
+    solo escribe las entradas que cambiaron; si no, todas."""
+    ruta = Config.ARCHIVO_SQLITE
+    claves, reordenado = historial.tomar_modificadas() if isinstance(historial, Historial) else (None, True)
+    incremental = not reordenado and _guardados.get(ruta) is historial
+
+    conexion = conectar()
+    try:
+        with _lock, conexion:
+            conexion.executemany(
+                "INSERT INTO meta (clave, valor) VALUES (?, ?) ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor",
+                [("ultima_actualizacion", fecha_actualizacion),
+                 ("estados_actuales", json.dumps(estados_actuales, ensure_ascii=False))],
+            )
+            if incremental:
+                _guardar_modificadas(conexion, historial, claves)
+            else:
+                _guardar_todo(conexion, historial)
+            if registrar_linea_de_tiempo:
+                _insertar_linea_de_tiempo(conexion, estados_actuales, fecha_actualizacion)
+    except Exception:
+        # La transacción se deshizo: el próximo guardado vuelve a escribir todo
+        _guardados.pop(ruta, None)
+        raise
+    _guardados[ruta] = historial
+
+def migrar_desde_json(data):
+    """Importa un estado cargado del backend JSON (sin sumarlo a la línea de tiempo)."""
+    if not data:
+        return
+    guardar_estados(
+        data.get("estados_actuales", {}),
+        data.get("historial", {}),
+        data.get("ultima_actualizacion", ""),
+        registrar_linea_de_tiempo=False,
+    )
+    logger.info("Migrados %d registros del historial JSON a SQLite.", len(data.get('historial', {})))
+
+def estado_en_fecha(linea, fecha):
+    """Último estado registrado para la línea en o antes de la fecha (ISO 8601), o None."""
+    conexion = conectar()
+    with _lock:
+        fila = conexion.execute(
+            "SELECT estado FROM estados_linea WHERE linea = ? AND fecha <= ? ORDER BY fecha DESC, id DESC LIMIT 1",
+            (linea, fecha),
+        ).fetchone()
+    return fila[0] if fila else None
+
+def linea_de_tiempo(linea, desde, hasta):
+    """Lista de (fecha, estado) registrados para la línea dentro del rango."""
+    conexion = conectar()
+    with _lock:
+        return conexion.execute(
+            "SELECT fecha, estado FROM estados_linea WHERE linea = ? AND fecha >= ? AND fecha <= ? ORDER BY fecha, id",
+            (linea, desde, hasta),
+        ).fetchall()
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+LINEAS_VALIDAS = ['A', 'B', 'C', 'D', 'E', 'H', 'Premetro']
+
+def normalizar_linea(nombre):
+    """Lleva 'Línea A', 'linea a' o 'A' a la forma canónica ('A', ..., 'Premetro'). None si no es una línea."""
+    texto = str(nombre).strip()
+    for prefijo in ('línea ', 'linea '):
+        if texto.lower().startswith(prefijo):
+            texto = texto[len(prefijo):].strip()
+            break
+    if texto.lower() == 'premetro':
+        return 'Premetro'
+    texto = texto.upper()
+    return texto if texto in LINEAS_VALIDAS else None
+
+def nombre_de_linea(nombre):
+    """Nombre con el que los estados y el historial identifican a una línea ('Línea A'), o None."""
+    linea = normalizar_linea(nombre) if nombre is not None else None
+    return f"Línea {linea}" if linea else None
+
+def _clave_chat(chat_id):
+    return str(chat_id)
+
+def _chat_desde_clave(clave):
+    return int(clave) if clave.lstrip('-').isdigit() else clave
+
+class RegistroSuscriptores:
+    """Suscripciones chat -> líneas, con índice inverso línea -> chats para el fan-out de alertas."""
+
+    def __init__(self, archivo=None):
+        self._archivo = archivo
+        self._lock = threading.RLock()
+        self._por_chat = {}
+        self._por_linea = {linea: set() for linea in LINEAS_VALIDAS}
+        self._cargado = False
+
+    @property
+    def archivo(self):
+        return self._archivo or Config.ARCHIVO_SUSCRIPTORES
+
+    def _asegurar_cargado(self):
+        if self._cargado:
+            return
+        self._cargado = True
+        try:
+            if self.archivo.exists():
+                with open(self.archivo, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                for clave, lineas in datos.items():
+                    self._agregar(_chat_desde_clave(clave), lineas)
+        except Exception as e:
+            logger.error("Error de I/O al cargar suscriptores: %s", e)
+
+    def _guardar(self):
+        datos = {_clave_chat(chat): sorted(lineas, key=LINEAS_VALIDAS.index) for chat, lineas in self._por_chat.items()}
+        try:
+            temporal = self.archivo.with_suffix('.tmp')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False)
+            os.replace(temporal, self.archivo)
+        except Exception as e:
+            logger.error("Error de I/O al guardar suscriptores: %s", e)
+
+    def _agregar(self, chat_id, lineas):
+        actuales = self._por_chat.setdefault(chat_id, set())
+        for linea in lineas:
+            actuales.add(linea)
+            self._por_linea[linea].add(chat_id)
+
+    def suscribir(self, chat_id, lineas):
+        """Agrega líneas (ya normalizadas) a la suscripción del chat y devuelve el conjunto resultante."""
+        with self._lock:
+            self._asegurar_cargado()
+            self._agregar(chat_id, lineas)
+            self._guardar()
+            return set(self._por_chat[chat_id])
+
+    def desuscribir(self, chat_id, lineas=None):
+        """Quita las líneas indicadas, o todas si no se indica ninguna. Devuelve las que quedan."""
+        with self._lock:
+            self._asegurar_cargado()
+            actuales = self._por_chat.get(chat_id, set())
+            for linea in list(actuales if lineas is None else lineas):
+                actuales.discard(linea)
+                self._por_linea[linea].discard(chat_id)
+            if not actuales:
+                self._por_chat.pop(chat_id, None)
+            self._guardar()
+            return set(actuales)
+
+    def lineas_de(self, chat_id):
+        with self._lock:
+            self._asegurar_cargado()
+            return set(self._por_chat.get(chat_id, set()))
+
+    def suscriptores_de(self, linea):
+        with self._lock:
+            self._asegurar_cargado()
+            return set(self._por_linea.get(linea, set()))
+
+    def agrupar_por_lineas(self, lineas_afectadas):
+        """Agrupa a los suscriptores según qué subconjunto de las líneas afectadas les interesa.
+
+        Devuelve {frozenset(lineas): [chat_id, ...]} para renderizar un mensaje por grupo
+        en lugar de uno por suscriptor.
+        """
+        with self._lock:
+            self._asegurar_cargado()
+            interes = {}
+            for linea in lineas_afectadas:
+                for chat_id in self._por_linea.get(linea, ()):
+                    interes.setdefault(chat_id, set()).add(linea)
+
+        grupos = {}
+        for chat_id, lineas in interes.items():
+            grupos.setdefault(frozenset(lineas), []).append(chat_id)
+        return grupos
+
+    def reiniciar(self):
+        """Olvida el estado en memoria; se vuelve a leer del disco en el próximo uso."""
+        with self._lock:
+            self._por_chat = {}
+            self._por_linea = {linea: set() for linea in LINEAS_VALIDAS}
+            self._cargado = False
+
+registro_suscriptores = RegistroSuscriptores()
@@ -1,16 +1,20 @@
-import sys
+import asyncio
+import logging
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-if str(BASE_DIR) not in sys.path:
-    sys.path.append(str(BASE_DIR))
-
 from src.config import Config
+from src.services import http_client, metricas
+from src.services.agenda import agenda
+from src.services.cache_estado import cache_estado
+from src.services.confiabilidad import registro_confiabilidad
 from src.services.scrapper import obtener_estado_subte
-from src.services.telegram_notifier import enviar_mensaje_telegram
+from src.services.suscripciones import LINEAS_VALIDAS, normalizar_linea, registro_suscriptores
+from src.services.telegram_notifier import encolar_mensaje_telegram
+
+logger = logging.getLogger(__name__)
 
 def _obtener_estado_linea(estados, linea):
     variantes = (
@@ -38,22 +42,149 @@ def formatear_estado_actual(estados):
 
     return mensaje
 
+def formatear_edad(segundos):
+    minutos = int(segundos // 60)
+    if minutos < 1:
+        return "hace menos de un minuto"
+    if minutos < 60:
+        return f"hace {minutos} min"
+    return f"hace {minutos // 60} h {minutos % 60} min"
+
+def _formatear_snapshot(snapshot):
+    return formatear_estado_actual(snapshot.estados) + f"\n<i>Actualizado {formatear_edad(snapshot.edad)}</i>"
+
 def obtener_respuesta_estado():
-    """Devuelve el estado actual obtenido al momento del comando."""
-    estados = obtener_estado_subte()
-    if estados:
-        return formatear_estado_actual(estados)
+    """Devuelve el estado desde la cache en memoria, scrapeando solo si no hay dato utilizable."""
+    snapshot = cache_estado.obtener(obtener_estado_subte)
+    if snapshot:
+        return _formatear_snapshot(snapshot)
 
     return "No se pudo obtener el estado del subte en este momento."
 
+def responder_actualizacion(chat_id):
+    """Pide al loop principal una verificación inmediata, salvo que el dato en memoria sea muy reciente."""
+    snapshot = cache_estado.actual()
+    if snapshot and snapshot.edad < Config.ACTUALIZAR_EDAD_MINIMA:
+        return _formatear_snapshot(snapshot)
+
+    agenda.solicitar_verificacion(chat_id)
+    return "Verificando el estado del subte. Te aviso apenas termine."
+
 def obtener_updates(offset):
     """Long-polling de la API de Telegram."""
     url = f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}/getUpdates"
     params = {"offset": offset, "timeout": Config.POLLING_TIMEOUT}
-    response = requests.get(url, params=params, timeout=Config.POLLING_TIMEOUT + 10)
+    response = http_client.get(url, params=params, timeout=Config.POLLING_TIMEOUT + 10)
     response.raise_for_status()
     return response.json()
 
+def _parsear_lineas(argumentos):
+    validas, invalidas = [], []
+    for token in argumentos.replace(',', ' ').split():
+        if token.lower() in ('línea', 'linea', 'líneas', 'lineas'):
+            continue
+        linea = normalizar_linea(token)
+        (validas if linea else invalidas).append(linea or token)
+    return validas, invalidas
+
+def _listar(lineas):
+    return ', '.join(sorted(lineas, key=LINEAS_VALIDAS.index)) if lineas else "ninguna"
+
+def responder_suscripcion(chat_id, argumentos):
+    """Suscribe el chat a las líneas indicadas (por ejemplo '/suscribir A C')."""
+    validas, invalidas = _parsear_lineas(argumentos)
+    if invalidas:
+        return f"Líneas no reconocidas: {', '.join(invalidas)}. Opciones: {', '.join(LINEAS_VALIDAS)}."
+    if not validas:
+        actuales = registro_suscriptores.lineas_de(chat_id)
+        return f"Uso: {Config.COMANDO_SUSCRIBIR} A C ...\nTus líneas: {_listar(actuales)}."
+
+    actuales = registro_suscriptores.suscribir(chat_id, validas)
+    return f"Suscripción actualizada. Vas a recibir alertas de: {_listar(actuales)}."
+
+def responder_desuscripcion(chat_id, argumentos):
+    """Quita líneas de la suscripción del chat; sin argumentos las quita todas."""
+    validas, invalidas = _parsear_lineas(argumentos)
+    if invalidas:
+        return f"Líneas no reconocidas: {', '.join(invalidas)}. Opciones: {', '.join(LINEAS_VALIDAS)}."
+
+    restantes = registro_suscriptores.desuscribir(chat_id, validas or None)
+    if not restantes:
+        return "Ya no vas a recibir alertas por línea."
+    return f"Suscripción actualizada. Vas a recibir alertas de: {_listar(restantes)}."
+
+def formatear_duracion(segundos):
+    minutos = int(segundos // 60)
+    if minutos < 60:
+        return f"{minutos} min"
+    horas, minutos = divmod(minutos, 60)
+    if horas < 24:
+        return f"{horas} h {minutos} min"
+    dias, horas = divmod(horas, 24)
+    return f"{dias} d {horas} h"
+
+def formatear_resumen(resumen):
+    """Arma el mensaje de /historial a partir de un Resumen de confiabilidad."""
+    periodo = "el último día" if resumen.dias == 1 else f"los últimos {resumen.dias} días"
+    if not resumen.segundos_observados:
+        return f"Todavía no hay datos de la línea {resumen.linea} en {periodo}."
+
+    mensaje = f"<b>Línea {resumen.linea}</b>, {periodo}\n\n"
+    mensaje += f"Disponibilidad (sin incidentes): {resumen.disponibilidad:.1f}%\n"
+    mensaje += f"Funcionamiento normal: {resumen.normal:.1f}% · Con obras: {resumen.obras:.1f}%\n"
+    mensaje += f"Incidentes: {resumen.incidentes}\n"
+    if resumen.mttr is not None:
+        mensaje += f"Tiempo medio de resolución: {formatear_duracion(resumen.mttr)}\n"
+    if resumen.horas_pico:
+        horas = ', '.join(f"{hora:02d} h ({cantidad})" for hora, cantidad in resumen.horas_pico)
+        mensaje += f"Horarios con más incidentes: {horas}\n"
+    mensaje += f"\n<i>Sobre {formatear_duracion(resumen.segundos_observados)} observados en {resumen.muestras} muestras</i>"
+    return mensaje
+
+def responder_historial(argumentos):
+    """Resumen de confiabilidad de una línea (por ejemplo '/historial B 7')."""
+    uso = f"Uso: {Config.COMANDO_HISTORIAL} B [días]"
+    partes = [parte for parte in argumentos.split() if parte.lower() not in ('línea', 'linea')]
+    if not partes or len(partes) > 2:
+        return uso
+    linea = normalizar_linea(partes[0])
+    if linea is None:
+        return f"Línea no reconocida: {partes[0]}. Opciones: {', '.join(LINEAS_VALIDAS)}."
+
+    dias = Config.CONFIABILIDAD_DIAS_DEFECTO
+    if len(partes) == 2:
+        if not partes[1].isdigit() or int(partes[1]) < 1:
+            return uso
+        dias = min(int(partes[1]), Config.CONFIABILIDAD_DIAS_RETENCION)
+    return formatear_resumen(registro_confiabilidad.resumen(linea, dias))
+
+def _argumentos(texto, comando):
+    argumentos = texto[len(comando):]
+    # Comandos en grupos llegan como '/suscribir@NombreDelBot A'
+    if argumentos.startswith('@'):
+        argumentos = argumentos.partition(' ')[2]
+    return argumentos.strip()
+
+def responder_comando(texto, chat_id=None):
+    """Devuelve la respuesta a un comando reconocido, o None si el texto no es un comando."""
+    texto = texto.strip()
+    if texto.startswith(Config.COMANDO_DESUSCRIBIR):
+        return responder_desuscripcion(chat_id, _argumentos(texto, Config.COMANDO_DESUSCRIBIR))
+    if texto.startswith(Config.COMANDO_SUSCRIBIR):
+        return responder_suscripcion(chat_id, _argumentos(texto, Config.COMANDO_SUSCRIBIR))
+    if texto.startswith(Config.COMANDO_HISTORIAL):
+        return responder_historial(_argumentos(texto, Config.COMANDO_HISTORIAL))
+    if texto.startswith(Config.COMANDO_ACTUALIZAR):
+        return responder_actualizacion(chat_id)
+    if texto.startswith(Config.COMANDO_ESTADO):
+        with metricas.duracion_estado.medir():
+            return obtener_respuesta_estado()
+    return None
+
+def _extraer_mensaje(update):
+    mensaje = update.get("message", {})
+    return mensaje.get("chat", {}).get("id"), mensaje.get("text", "")
+
 def escuchar_comandos():
     """Escucha comandos del bot sin interrumpir el loop principal."""
     offset = None
@@ -63,19 +194,69 @@ def escuchar_comandos():
             data = obtener_updates(offset)
             for update in data.get("result", []):
                 offset = update["update_id"] + 1
-                mensaje = update.get("message", {})
-                texto = mensaje.get("text", "")
-                chat_id = mensaje.get("chat", {}).get("id")
+                chat_id, texto = _extraer_mensaje(update)
 
                 if not chat_id:
                     continue
 
-                if texto.strip().startswith(Config.COMANDO_ESTADO):
-                    respuesta = obtener_respuesta_estado()
-                    enviar_mensaje_telegram(respuesta, chat_id=chat_id)
+                respuesta = responder_comando(texto, chat_id)
+                if respuesta:
+                    encolar_mensaje_telegram(respuesta, chat_id=chat_id)
         except requests.exceptions.RequestException as e:
-            print(f"Error de red al consultar comandos de Telegram: {e}")
+            metricas.errores_telegram.inc(tipo="polling")
+            logger.warning("Error de red al consultar comandos de Telegram: %s", e)
         except Exception as e:
-            print(f"Error inesperado al escuchar comandos: {e}")
+            logger.exception("Error inesperado al escuchar comandos: %s", e)
 
         time.sleep(Config.POLLING_INTERVALO)
+
+async def _atender_update(chat_id, texto, semaforo, executor):
+    loop = asyncio.get_running_loop()
+    async with semaforo:
+        try:
+            respuesta = await loop.run_in_executor(executor, responder_comando, texto, chat_id)
+            if respuesta:
+                await loop.run_in_executor(executor, encolar_mensaje_telegram, respuesta, chat_id)
+        except Exception as e:
+            logger.exception("Error inesperado al atender comando de %s: %s", chat_id, e)
+
+async def escuchar_comandos_async():
+    """Variante asyncio del listener: cada update se atiende en paralelo, hasta BOT_MAX_CONCURRENCIA a la vez."""
+    loop = asyncio.get_running_loop()
+    semaforo = asyncio.Semaphore(Config.BOT_MAX_CONCURRENCIA)
+    # Un hilo extra queda reservado para el long-polling
+    executor = ThreadPoolExecutor(max_workers=Config.BOT_MAX_CONCURRENCIA + 1, thread_name_prefix="bot")
+    tareas = set()
+    offset = None
+
+    try:
+        while True:
+            try:
+                data = await loop.run_in_executor(executor, obtener_updates, offset)
+                for update in data.get("result", []):
+                    offset = update["update_id"] + 1
+                    chat_id, texto = _extraer_mensaje(update)
+
+                    if not chat_id:
+                        continue
+
+                    tarea = asyncio.create_task(_atender_update(chat_id, texto, semaforo, executor))
+                    tareas.add(tarea)
+                    tarea.add_done_callback(tareas.discard)
+                # El long-polling ya espera del lado de Telegram, solo se pausa ante errores
+                continue
+            except requests.exceptions.RequestException as e:
+                metricas.errores_telegram.inc(tipo="polling")
+                logger.warning("Error de red al consultar comandos de Telegram: %s", e)
+            except Exception as e:
+                logger.exception("Error inesperado al escuchar comandos: %s", e)
+
+            await asyncio.sleep(Config.POLLING_INTERVALO)
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iniciar_escucha_async():
+    """Punto de entrada para correr el listener asyncio en un hilo dedicado."""
+    asyncio.run(escuchar_comandos_async())
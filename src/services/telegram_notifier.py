@@ -1,39 +1,75 @@
+import logging
 import requests
-import sys
-from pathlib import Path
-
-# Se asegura la resolución del path raíz para importar config correctamente
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-if str(BASE_DIR) not in sys.path:
-    sys.path.append(str(BASE_DIR))
 
 from src.config import Config
+from src.services import http_client, metricas
+from src.services.cola_mensajes import ColaMensajes
+from src.services.suscripciones import normalizar_linea, registro_suscriptores
 
-def enviar_mensaje_telegram(mensaje, chat_id=None):
-    """Ejecuta la petición HTTP contra la API de Telegram."""
+logger = logging.getLogger(__name__)
+
+def _enviar_a_telegram(mensaje, chat_id):
+    """Ejecuta la petición HTTP contra la API de Telegram. Propaga los errores."""
     url = f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}/sendMessage"
     data = {
-        "chat_id": chat_id or Config.TELEGRAM_CHAT_ID,
+        "chat_id": chat_id,
         "text": mensaje,
         "parse_mode": "HTML",
         "disable_web_page_preview": True
     }
+    response = http_client.post(url, data=data, timeout=10)
+    response.raise_for_status()
+    return response
+
+def enviar_mensaje_telegram(mensaje, chat_id=None):
+    """Envía un mensaje en el momento, sin reintentos."""
+    chat_id = chat_id or Config.TELEGRAM_CHAT_ID
     try:
-        response = requests.post(url, data=data, timeout=10)
-        response.raise_for_status()
-        print("Notificación enviada exitosamente a Telegram.")
+        response = _enviar_a_telegram(mensaje, chat_id)
+        logger.info("Notificación enviada exitosamente a Telegram.")
         return response
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 403:
+            metricas.errores_telegram.inc(tipo="rechazado")
+            logger.warning("El chat %s bloqueó al bot (403).", chat_id)
+            dar_de_baja_chat(chat_id)
+        else:
+            metricas.errores_telegram.inc(tipo="red")
+            logger.error("Error de red al notificar por Telegram: %s", e)
     except requests.exceptions.RequestException as e:
-        print(f"Error de red al notificar por Telegram: {e}")
+        metricas.errores_telegram.inc(tipo="red")
+        logger.error("Error de red al notificar por Telegram: %s", e)
     except Exception as e:
-        print(f"Error inesperado en notificador de Telegram: {e}")
+        metricas.errores_telegram.inc(tipo="inesperado")
+        logger.exception("Error inesperado en notificador de Telegram: %s", e)
     return None
 
-def enviar_alerta_telegram(cambios_nuevos, obras_programadas, obras_renotificar):
-    """Formatea la estructura de los diccionarios en un mensaje de texto plano/HTML."""
-    if not (cambios_nuevos or obras_programadas or obras_renotificar):
+def dar_de_baja_chat(chat_id):
+    """Quita las suscripciones de un chat que bloqueó al bot, para no gastar cupo de envío en él."""
+    if registro_suscriptores.lineas_de(chat_id):
+        registro_suscriptores.desuscribir(chat_id)
+        logger.info("Chat %s dado de baja de todas sus suscripciones.", chat_id)
+
+cola_salida = ColaMensajes(enviar=_enviar_a_telegram, al_bloquear=dar_de_baja_chat)
+
+def encolar_mensaje_telegram(mensaje, chat_id=None):
+    """Deja el mensaje en la cola de salida. Si el hilo de envío no está corriendo, lo envía en el momento."""
+    chat_id = chat_id or Config.TELEGRAM_CHAT_ID
+    if cola_salida.activa:
+        cola_salida.encolar(mensaje, chat_id)
+        return True
+    return enviar_mensaje_telegram(mensaje, chat_id=chat_id)
+
+def difundir_mensaje_telegram(mensaje, chat_ids):
+    """Encola el mismo mensaje para varios chats; la cola se encarga de repartirlos dentro de los límites."""
+    if cola_salida.activa:
+        cola_salida.encolar_lote(mensaje, chat_ids)
         return
+    for chat_id in chat_ids:
+        enviar_mensaje_telegram(mensaje, chat_id=chat_id)
 
+def formatear_alerta(cambios_nuevos, obras_programadas, obras_renotificar):
+    """Formatea la estructura de los diccionarios en un mensaje de texto plano/HTML."""
     mensaje = "Estado del Subte de Buenos Aires\n\n"
     
     if obras_programadas:
@@ -66,4 +102,28 @@ def enviar_alerta_telegram(cambios_nuevos, obras_programadas, obras_renotificar)
                 mensaje += f"{linea}: {obra}\n"
         mensaje += f"\nPróximo recordatorio en {Config.DIAS_RENOTIFICAR_OBRA} días.\n"
     
-    enviar_mensaje_telegram(mensaje)
\ No newline at end of file
+    return mensaje
+
+def _filtrar_por_lineas(coleccion, lineas):
+    return {linea: valores for linea, valores in coleccion.items() if normalizar_linea(linea) in lineas}
+
+def _difundir_a_suscriptores(cambios_nuevos, obras_programadas, obras_renotificar):
+    colecciones = (cambios_nuevos, obras_programadas, obras_renotificar)
+    afectadas = {normalizar_linea(linea) for coleccion in colecciones for linea in coleccion} - {None}
+    chat_principal = str(Config.TELEGRAM_CHAT_ID)
+
+    # Un mensaje por combinación de líneas, no por suscriptor
+    for lineas, chats in registro_suscriptores.agrupar_por_lineas(afectadas).items():
+        destinatarios = [chat_id for chat_id in chats if str(chat_id) != chat_principal]
+        if not destinatarios:
+            continue
+        mensaje = formatear_alerta(*(_filtrar_por_lineas(c, lineas) for c in colecciones))
+        difundir_mensaje_telegram(mensaje, destinatarios)
+
+def enviar_alerta_telegram(cambios_nuevos, obras_programadas, obras_renotificar):
+    """Envía la alerta completa al chat principal y a cada suscriptor solo lo de sus líneas."""
+    if not (cambios_nuevos or obras_programadas or obras_renotificar):
+        return
+
+    encolar_mensaje_telegram(formatear_alerta(cambios_nuevos, obras_programadas, obras_renotificar))
+    _difundir_a_suscriptores(cambios_nuevos, obras_programadas, obras_renotificar)
\ No newline at end of file
@@ -0,0 +1,211 @@
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+def crear_driver():
+    """Lanza una instancia nueva de Chromium headless."""
+    # Selenium se importa recién acá: solo lo paga el proceso que realmente abre un navegador
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument(f'--user-agent={Config.SCRAPER_USER_AGENT}')
+
+    is_docker = os.path.exists('/.dockerenv') or os.getenv('CHROME_BIN')
+
+    if is_docker:
+        chrome_options.binary_location = '/usr/bin/chromium'
+        service = webdriver.ChromeService(executable_path='/usr/bin/chromedriver')
+        return webdriver.Chrome(service=service, options=chrome_options)
+    return webdriver.Chrome(options=chrome_options)
+
+def _leer_hijos_por_proceso():
+    hijos = {}
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat', 'r') as f:
+                # El nombre del proceso va entre paréntesis y puede contener espacios
+                campos = f.read().rsplit(')', 1)[1].split()
+            hijos.setdefault(int(campos[1]), []).append(int(entrada))
+        except (OSError, IndexError, ValueError):
+            continue
+    return hijos
+
+def _rss_proceso_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+def medir_rss_mb(pid):
+    """Suma el RSS de un proceso y sus descendientes. Devuelve 0 si /proc no está disponible."""
+    if not pid or not os.path.isdir('/proc'):
+        return 0.0
+    try:
+        hijos = _leer_hijos_por_proceso()
+    except OSError:
+        return 0.0
+
+    total_kb = 0
+    pendientes = [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        total_kb += _rss_proceso_kb(actual)
+        pendientes.extend(hijos.get(actual, []))
+    return total_kb / 1024
+
+def _pid_driver(driver):
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+class PoolWebDriver:
+    """Pool acotado y thread-safe de sesiones de Chromium reutilizables."""
+
+    def __init__(self, tamanio=None, max_usos=None, max_rss_mb=None, fabrica=crear_driver, medidor_rss=medir_rss_mb):
+        self.tamanio = tamanio or Config.WEBDRIVER_POOL_TAMANIO
+        self.max_usos = max_usos or Config.WEBDRIVER_MAX_USOS
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else Config.WEBDRIVER_MAX_RSS_MB
+        self._fabrica = fabrica
+        self._medidor_rss = medidor_rss
+        self._condicion = threading.Condition()
+        self._libres = []
+        self._usos = {}
+        # Los drivers creados antes del último reiniciar() se descartan al volver, aunque estuvieran prestados
+        self._generacion = 0
+        self._generaciones = {}
+        self._creados = 0
+        self._cerrado = False
+        self.estadisticas = {"creados": 0, "reutilizados": 0, "reciclados": 0, "descartados": 0}
+
+    def _tomar(self):
+        with self._condicion:
+            while not self._libres and self._creados >= self.tamanio and not self._cerrado:
+                self._condicion.wait()
+            if self._cerrado:
+                raise RuntimeError("El pool de WebDriver está cerrado.")
+            if self._libres:
+                self.estadisticas["reutilizados"] += 1
+                return self._libres.pop()
+            self._creados += 1
+
+        try:
+            driver = self._fabrica()
+        except Exception:
+            with self._condicion:
+                self._creados -= 1
+                self._condicion.notify()
+            raise
+
+        with self._condicion:
+            self._usos[id(driver)] = 0
+            self._generaciones[id(driver)] = self._generacion
+            self.estadisticas["creados"] += 1
+        return driver
+
+    def _debe_reciclar(self, driver, usos):
+        if usos >= self.max_usos:
+            logger.info("Reciclando WebDriver tras %d usos.", self.max_usos)
+            return True
+        if self.max_rss_mb:
+            rss = self._medidor_rss(_pid_driver(driver))
+            if rss > self.max_rss_mb:
+                logger.info("Reciclando WebDriver por consumo de memoria (%.0f MB).", rss)
+                return True
+        return False
+
+    def _cerrar_driver(self, driver):
+        with self._condicion:
+            self._usos.pop(id(driver), None)
+            self._generaciones.pop(id(driver), None)
+            self._creados -= 1
+            self._condicion.notify()
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning("Error al cerrar WebDriver: %s", e)
+
+    def _vigente(self, driver):
+        return self._generaciones.get(id(driver)) == self._generacion and not self._cerrado
+
+    def _devolver(self, driver, descartar):
+        with self._condicion:
+            usos = self._usos[id(driver)] = self._usos.get(id(driver), 0) + 1
+            descartar = descartar or not self._vigente(driver)
+            if descartar:
+                self.estadisticas["descartados"] += 1
+
+        if not descartar and self._debe_reciclar(driver, usos):
+            with self._condicion:
+                self.estadisticas["reciclados"] += 1
+            descartar = True
+
+        if not descartar:
+            with self._condicion:
+                # reiniciar() o cerrar() pudieron ocurrir mientras se medía la memoria
+                if self._vigente(driver):
+                    self._libres.append(driver)
+                    self._condicion.notify()
+                    return
+                self.estadisticas["descartados"] += 1
+        self._cerrar_driver(driver)
+
+    @contextmanager
+    def driver(self):
+        """Presta un driver caliente; si el bloque falla, el driver se descarta en vez de volver al pool."""
+        driver = self._tomar()
+        try:
+            yield driver
+        except BaseException:
+            self._devolver(driver, descartar=True)
+            raise
+        else:
+            self._devolver(driver, descartar=False)
+
+    def cerrar(self):
+        """Cierra todas las sesiones ociosas e impide préstamos nuevos."""
+        with self._condicion:
+            self._cerrado = True
+            libres, self._libres = self._libres, []
+            self._condicion.notify_all()
+        for driver in libres:
+            self._cerrar_driver(driver)
+
+    def reiniciar(self):
+        """Descarta todas las sesiones (por ejemplo tras matar procesos de Chrome): las ociosas ya
+        mismo y las prestadas cuando vuelvan, porque sus procesos también murieron."""
+        with self._condicion:
+            self._generacion += 1
+            libres, self._libres = self._libres, []
+            self.estadisticas["descartados"] += len(libres)
+        for driver in libres:
+            self._cerrar_driver(driver)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def obtener_pool():
+    """Devuelve el pool global, creándolo en el primer uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolWebDriver()
+            atexit.register(_pool.cerrar)
+        return _pool
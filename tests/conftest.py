@@ -11,6 +11,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
 from src.config import Config
+from src.services.cache_estado import cache_estado
+from src.services.confiabilidad import registro_confiabilidad
+from src.services.fuentes import reiniciar_fuentes
+from src.services.suscripciones import registro_suscriptores
 
 
 @pytest.fixture
@@ -20,4 +24,21 @@ def tmp_config(tmp_path, monkeypatch):
     data_dir.mkdir()
     monkeypatch.setattr(Config, "DATA_DIR", data_dir)
     monkeypatch.setattr(Config, "ARCHIVO_ESTADO", data_dir / "estados_persistentes.json")
+    monkeypatch.setattr(Config, "ARCHIVO_SQLITE", data_dir / "estados.db")
+    monkeypatch.setattr(Config, "ARCHIVO_COLA_MENSAJES", data_dir / "cola_mensajes.json")
+    monkeypatch.setattr(Config, "ARCHIVO_SUSCRIPTORES", data_dir / "suscriptores.json")
+    monkeypatch.setattr(Config, "ARCHIVO_CONFIABILIDAD", data_dir / "muestras_lineas.bin")
+    registro_suscriptores.reiniciar()
+    registro_confiabilidad.reiniciar()
     return data_dir
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia():
+    """Evita que el estado cacheado, los suscriptores o la latencia de las fuentes de un test se filtren a otro."""
+    cache_estado.limpiar()
+    reiniciar_fuentes()
+    yield
+    cache_estado.limpiar()
+    registro_suscriptores.reiniciar()
+    registro_confiabilidad.reiniciar()
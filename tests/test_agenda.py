@@ -0,0 +1,91 @@
+import signal
+import threading
+import time
+
+import pytest
+
+from src.services.agenda import Agenda
+
+
+def test_vence_el_intervalo_sin_avisos():
+    agenda = Agenda()
+    inicio = time.monotonic()
+    despertar = agenda.esperar(0.05)
+    assert despertar.motivo == "intervalo"
+    assert despertar.chat_ids == []
+    assert time.monotonic() - inicio >= 0.04
+
+
+def test_pedido_desde_otro_hilo_despierta_enseguida():
+    agenda = Agenda()
+    threading.Timer(0.05, agenda.solicitar_verificacion, args=(7,)).start()
+    inicio = time.monotonic()
+    despertar = agenda.esperar(30)
+    assert time.monotonic() - inicio < 5
+    assert despertar.motivo == "pedido"
+    assert despertar.chat_ids == [7]
+
+
+def test_pedidos_acumulados_se_entregan_juntos_y_sin_repetir():
+    agenda = Agenda()
+    agenda.solicitar_verificacion(7)
+    agenda.solicitar_verificacion(8)
+    agenda.solicitar_verificacion(7)
+    agenda.solicitar_verificacion()
+    assert agenda.esperar(30) == ("pedido", [7, 8])
+    # Ya consumidos: la siguiente espera vuelve a depender del intervalo
+    assert agenda.esperar(0).motivo == "intervalo"
+
+
+def test_recarga_tiene_prioridad_y_no_consume_pedidos():
+    agenda = Agenda()
+    agenda.solicitar_verificacion(7)
+    agenda.solicitar_recarga()
+    assert agenda.esperar(30).motivo == "recarga"
+    assert agenda.esperar(30) == ("pedido", [7])
+
+
+def test_detener_corta_cualquier_espera():
+    agenda = Agenda()
+    threading.Timer(0.05, agenda.detener).start()
+    inicio = time.monotonic()
+    assert agenda.esperar(3600) is None
+    assert time.monotonic() - inicio < 5
+    assert agenda.detenida
+    # Una vez detenida no vuelve a bloquear
+    agenda.solicitar_verificacion(7)
+    assert agenda.esperar(3600) is None
+
+
+def test_reiniciar_descarta_avisos_pendientes():
+    agenda = Agenda()
+    agenda.solicitar_verificacion(7)
+    agenda.detener()
+    agenda.reiniciar()
+    assert not agenda.detenida
+    assert agenda.esperar(0).motivo == "intervalo"
+
+
+def test_tras_una_recarga_se_sigue_esperando_el_mismo_vencimiento():
+    ahora = [1000.0]
+    agenda = Agenda(reloj=lambda: ahora[0])
+    limite = agenda.vencimiento(600)
+    agenda.solicitar_recarga()
+    assert agenda.esperar_hasta(limite).motivo == "recarga"
+    # Pasaron los 600 s del intervalo original: no vuelve a contar desde la recarga
+    ahora[0] = 1600.0
+    assert agenda.esperar_hasta(limite).motivo == "intervalo"
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGALRM"), reason="requiere señales POSIX")
+def test_handler_de_senal_en_el_mismo_hilo_despierta_la_espera():
+    agenda = Agenda()
+    anterior = signal.signal(signal.SIGALRM, lambda signum, frame: agenda.detener())
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 0.05)
+        inicio = time.monotonic()
+        assert agenda.esperar(30) is None
+        assert time.monotonic() - inicio < 5
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
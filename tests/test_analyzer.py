@@ -4,11 +4,18 @@ import pytest
 
 from src.config import Config
 from src.services.analyzer import (
+    analisis_omitible,
     analizar_cambios_con_historial,
+    ciclo_sin_cambios,
+    estadisticas_ultimo_ciclo,
+    reiniciar_huellas,
     limpiar_historial_antiguo,
     normalizar_obra,
     procesar_estado_por_oraciones,
+    usar_reloj,
 )
+from src.services.historial import Historial
+from src.services.scrapper import huella_estados
 
 
 class TestProcesarEstadoPorOraciones:
@@ -35,6 +42,18 @@ class TestProcesarEstadoPorOraciones:
         assert componentes["obras"] == ["Obras de renovación integral"]
         assert componentes["otros"] == ["Normal"]
 
+    def test_varias_abreviaturas_y_saltos_de_linea(self):
+        estado = "Demora entre Gral. Paz y Av. de Mayo.\nObra programada en J. M. Rosas.  Normal."
+        componentes = procesar_estado_por_oraciones(estado)
+        assert componentes["problemas"] == ["Demora entre Gral. Paz y Av. de Mayo"]
+        assert componentes["obras"] == ["Obra programada en J. M. Rosas"]
+        assert componentes["otros"] == ["Normal"]
+
+    def test_grafias_distintas_de_la_misma_abreviatura_se_unifican(self):
+        estado = "Demora en C. de Tucumán. Sin servicio en C. DE TUCUMAN"
+        componentes = procesar_estado_por_oraciones(estado)
+        assert componentes["problemas"] == ["Demora en C. DE TUCUMAN", "Sin servicio en C. DE TUCUMAN"]
+
     def test_estado_normal_solo_otros(self):
         componentes = procesar_estado_por_oraciones("Normal")
         assert componentes["problemas"] == []
@@ -49,6 +68,23 @@ class TestNormalizarObra:
 
 
 class TestAnalizarCambiosConHistorial:
+    @pytest.fixture(autouse=True)
+    def sin_huellas(self):
+        reiniciar_huellas()
+
+    def test_lineas_sin_cambios_se_cuentan_y_notifican_igual(self):
+        estados = {"A": "Demora de 10 minutos", "B": "Normal"}
+        cambios1, _, _, _, historial = analizar_cambios_con_historial(estados, {})
+        assert estadisticas_ultimo_ciclo == {"lineas_analizadas": 2, "lineas_sin_cambios": 0}
+
+        cambios2, _, _, _, historial = analizar_cambios_con_historial(estados, historial)
+        assert estadisticas_ultimo_ciclo == {"lineas_analizadas": 0, "lineas_sin_cambios": 2}
+        assert cambios2 == cambios1
+        assert historial["A_problema"]["contador"] == 2
+
+        analizar_cambios_con_historial({"A": "Demora de 20 minutos", "B": "Normal"}, historial)
+        assert estadisticas_ultimo_ciclo == {"lineas_analizadas": 1, "lineas_sin_cambios": 1}
+
     def test_nuevo_problema_detectado(self):
         cambios, obras, ren, estados, _ = analizar_cambios_con_historial(
             {"A": "Demora de 20 minutos por incidente"}, {}
@@ -131,3 +167,56 @@ class TestAnalizarCambiosConHistorial:
         assert "X_problema" not in historial
         assert "Z_obra_persistente" not in historial
         assert "Y_obra" in historial
+
+
+class TestAnalisisOmitible:
+    def test_problema_activo_impide_omitir(self):
+        _, _, _, _, historial = analizar_cambios_con_historial({"A": "Demora"}, {})
+        assert not analisis_omitible(historial)
+
+    def test_obra_notificada_recientemente_permite_omitir(self):
+        _, _, _, _, historial = analizar_cambios_con_historial({"B": "Cerrada por obras de renovación integral"}, {})
+        assert analisis_omitible(historial)
+
+    def test_obra_con_renotificacion_vencida_impide_omitir(self, monkeypatch):
+        monkeypatch.setattr(Config, "DIAS_RENOTIFICAR_OBRA", 15)
+        _, _, _, _, historial = analizar_cambios_con_historial({"B": "Cerrada por obras de renovación integral"}, {})
+        historial["B_obra"]["ultima_notificacion"] = (datetime.now(Config.TIMEZONE_LOCAL) - timedelta(days=16)).isoformat()
+        assert not analisis_omitible(historial)
+
+
+def _notificaciones(paginas, omitir):
+    """Corre las páginas (fecha, estados) como el loop principal y devuelve lo notificado en cada ciclo.
+    Con 'omitir', las páginas repetidas toman el atajo de main en lugar del análisis completo."""
+    reiniciar_huellas()
+    historial = Historial()
+    huella_previa = None
+    notificadas = []
+    reloj = {}
+    with usar_reloj(lambda: reloj["ahora"]):
+        for fecha, estados in paginas:
+            reloj["ahora"] = fecha
+            huella = huella_estados(estados)
+            if omitir and huella == huella_previa and analisis_omitible(historial):
+                ciclo_sin_cambios(estados, historial)
+                notificadas.append(None)
+                continue
+            huella_previa = huella
+            cambios, obras, renotificar, _, historial = analizar_cambios_con_historial(estados, historial)
+            notificadas.append((cambios, obras, renotificar) if cambios or obras or renotificar else None)
+    return notificadas
+
+
+def test_omitir_paginas_repetidas_notifica_lo_mismo_que_analizar_siempre(monkeypatch):
+    monkeypatch.setattr(Config, "DIAS_LIMPIAR_HISTORIAL", 5)
+    monkeypatch.setattr(Config, "DIAS_RENOTIFICAR_OBRA", 30)
+    obra = "Cerrada por obras de renovación integral"
+    inicio = datetime(2024, 3, 1, 8, 0, tzinfo=Config.TIMEZONE_LOCAL)
+    # Un problema que dura hasta volverse obra programada, desaparece con la línea todavía en obra
+    # durante más de DIAS_LIMPIAR_HISTORIAL días de página idéntica y después vuelve
+    textos = ([f"{obra}. Demora de 5 minutos"] * (Config.UMBRAL_OBRA_PROGRAMADA + 1)
+              + [obra] * 24 * 7
+              + [f"{obra}. Demora de 5 minutos"] * 3)
+    paginas = [(inicio + timedelta(hours=i), {"Línea A": texto}) for i, texto in enumerate(textos)]
+
+    assert _notificaciones(paginas, omitir=True) == _notificaciones(paginas, omitir=False)
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from src.services.cache_estado import CacheEstado
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_sin_snapshot_scrapea_y_guarda():
+    cache = CacheEstado(max_edad=60, max_stale=600, reloj=Reloj())
+    snapshot = cache.obtener(lambda: {"A": "Normal"})
+    assert snapshot.estados == {"A": "Normal"}
+    assert snapshot.edad == 0.0
+    assert cache.actual().estados == {"A": "Normal"}
+
+
+def test_snapshot_fresco_no_scrapea():
+    reloj = Reloj()
+    cache = CacheEstado(max_edad=60, max_stale=600, reloj=reloj)
+    cache.actualizar({"A": "Normal"})
+    reloj.t += 30
+
+    snapshot = cache.obtener(lambda: pytest.fail("no debería scrapear"))
+    assert snapshot.estados == {"A": "Normal"}
+    assert snapshot.edad == 30
+
+
+def test_snapshot_vencido_se_sirve_y_revalida_en_segundo_plano():
+    reloj = Reloj()
+    cache = CacheEstado(max_edad=60, max_stale=600, reloj=reloj)
+    cache.actualizar({"A": "Normal"})
+    reloj.t += 120
+    revalidado = threading.Event()
+
+    def scrapear():
+        revalidado.set()
+        return {"A": "Demora"}
+
+    snapshot = cache.obtener(scrapear)
+    assert snapshot.estados == {"A": "Normal"}
+    assert revalidado.wait(2)
+    for _ in range(100):
+        if cache.actual().estados == {"A": "Demora"}:
+            break
+        threading.Event().wait(0.01)
+    assert cache.actual().estados == {"A": "Demora"}
+
+
+def test_snapshot_demasiado_viejo_scrapea_en_el_momento():
+    reloj = Reloj()
+    cache = CacheEstado(max_edad=60, max_stale=600, reloj=reloj)
+    cache.actualizar({"A": "Normal"})
+    reloj.t += 1000
+    assert cache.obtener(lambda: {"A": "Demora"}).estados == {"A": "Demora"}
+
+
+def test_scrapeo_fallido_devuelve_none():
+    cache = CacheEstado(max_edad=60, max_stale=600, reloj=Reloj())
+    assert cache.obtener(lambda: {}) is None
+    assert cache.actual() is None
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from src.config import Config
+from src.services.cola_mensajes import ColaMensajes
+
+
+class FakeResponse:
+    def __init__(self, status_code, cuerpo=None):
+        self.status_code = status_code
+        self._cuerpo = cuerpo or {}
+
+    def json(self):
+        return self._cuerpo
+
+
+def error_http(status, cuerpo=None):
+    return requests.exceptions.HTTPError(response=FakeResponse(status, cuerpo))
+
+
+@pytest.fixture
+def limites_rapidos(monkeypatch, tmp_config):
+    monkeypatch.setattr(Config, "TELEGRAM_INTERVALO_POR_CHAT", 0.0)
+    monkeypatch.setattr(Config, "TELEGRAM_MENSAJES_POR_SEGUNDO", 1000)
+    monkeypatch.setattr(Config, "TELEGRAM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(Config, "TELEGRAM_MAX_REINTENTOS", 2)
+
+
+def esperar(condicion, timeout=3):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_envia_en_orden(limites_rapidos):
+    enviados = []
+    cola = ColaMensajes(enviar=lambda texto, chat_id: enviados.append((chat_id, texto)))
+    cola.iniciar()
+    for i in range(3):
+        cola.encolar(f"m{i}", 1)
+    assert esperar(lambda: len(enviados) == 3)
+    cola.detener()
+    assert enviados == [(1, "m0"), (1, "m1"), (1, "m2")]
+
+
+def test_respeta_retry_after_en_429(limites_rapidos):
+    intentos = []
+
+    def enviar(texto, chat_id):
+        intentos.append(time.monotonic())
+        if len(intentos) == 1:
+            raise error_http(429, {"parameters": {"retry_after": 0.3}})
+
+    cola = ColaMensajes(enviar=enviar)
+    cola.iniciar()
+    cola.encolar("hola", 1)
+    assert esperar(lambda: cola.estadisticas["enviados"] == 1)
+    cola.detener()
+    assert intentos[1] - intentos[0] >= 0.3
+    assert cola.estadisticas["limitados_429"] == 1
+
+
+def test_reintenta_errores_de_red_y_luego_descarta(limites_rapidos):
+    def enviar(texto, chat_id):
+        raise requests.exceptions.ConnectionError("boom")
+
+    cola = ColaMensajes(enviar=enviar)
+    cola.iniciar()
+    cola.encolar("hola", 1)
+    assert esperar(lambda: cola.estadisticas["descartados"] == 1)
+    cola.detener()
+    assert cola.estadisticas["reintentos"] == 2
+
+
+def test_error_4xx_descarta_sin_reintentar(limites_rapidos):
+    def enviar(texto, chat_id):
+        raise error_http(403)
+
+    cola = ColaMensajes(enviar=enviar)
+    cola.iniciar()
+    cola.encolar("hola", 1)
+    assert esperar(lambda: cola.estadisticas["descartados"] == 1)
+    cola.detener()
+    assert cola.estadisticas["reintentos"] == 0
+
+
+def test_403_descarta_el_chat_y_avisa(limites_rapidos):
+    bloqueados = []
+    enviados = []
+    listo = threading.Event()
+
+    def enviar(texto, chat_id):
+        listo.wait(2)
+        if chat_id == 1:
+            raise error_http(403)
+        enviados.append((chat_id, texto))
+
+    cola = ColaMensajes(enviar=enviar, al_bloquear=bloqueados.append)
+    cola.iniciar()
+    cola.encolar_lote("uno", [1, 2])
+    cola.encolar_lote("dos", [1, 2])
+    listo.set()
+    assert esperar(lambda: len(enviados) == 2)
+    cola.detener()
+    assert bloqueados == [1]
+    assert enviados == [(2, "uno"), (2, "dos")]
+    assert cola.estadisticas["descartados"] == 2
+
+
+def test_limite_por_chat_no_bloquea_otros_chats(limites_rapidos, monkeypatch):
+    monkeypatch.setattr(Config, "TELEGRAM_INTERVALO_POR_CHAT", 0.5)
+    enviados = []
+    cola = ColaMensajes(enviar=lambda texto, chat_id: enviados.append((chat_id, time.monotonic())))
+    cola.iniciar()
+    cola.encolar("a1", 1)
+    cola.encolar("a2", 1)
+    cola.encolar("b1", 2)
+    assert esperar(lambda: len(enviados) == 3)
+    cola.detener()
+    assert [c for c, _ in enviados] == [1, 2, 1]
+    assert enviados[2][1] - enviados[0][1] >= 0.5
+
+
+def test_pendientes_sobreviven_al_reinicio(limites_rapidos):
+    bloqueo = threading.Event()
+    cola = ColaMensajes(enviar=lambda texto, chat_id: bloqueo.wait(5))
+    cola.encolar("pendiente", 7)
+    cola.detener()
+
+    guardado = json.loads(Config.ARCHIVO_COLA_MENSAJES.read_text(encoding="utf-8"))
+    assert guardado == [{"chat_id": 7, "texto": "pendiente", "intentos": 0}]
+
+    enviados = []
+    nueva = ColaMensajes(enviar=lambda texto, chat_id: enviados.append((chat_id, texto)))
+    nueva.iniciar()
+    assert esperar(lambda: enviados == [(7, "pendiente")])
+    nueva.detener()
+    assert json.loads(Config.ARCHIVO_COLA_MENSAJES.read_text(encoding="utf-8")) == []
@@ -0,0 +1,167 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from src.config import Config
+from src.services.analyzer import analizar_cambios_con_historial, reiniciar_huellas
+from src.services.confiabilidad import (
+    INCIDENTE,
+    NORMAL,
+    OBRA,
+    SIN_SERVICIO,
+    RegistroConfiabilidad,
+    clasificar,
+    hueco_maximo,
+)
+
+# Lunes 10:00, hora de Buenos Aires
+INICIO = int(datetime(2024, 5, 6, 10, 0, tzinfo=Config.TIMEZONE_LOCAL).timestamp())
+PASO = 300
+
+INCIDENTE_B = {"B_problema": {"linea_original": "Línea B", "tipo": "problema", "activa": True, "es_obra_programada": False}}
+
+
+class Reloj:
+    def __init__(self, ahora):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+def _registro(ahora=INICIO):
+    return RegistroConfiabilidad(reloj=Reloj(ahora))
+
+
+def test_clasificar_por_linea():
+    estados = {
+        "Línea A": "Normal",
+        "Línea B": "Demora de 10 minutos",
+        "Línea C": "Cerrada por obras en Constitución",
+        "Línea D": "Servicio finalizado",
+        "Otra cosa": "Normal",
+    }
+    assert clasificar(estados, INCIDENTE_B) == {"A": NORMAL, "B": INCIDENTE, "C": OBRA, "D": SIN_SERVICIO}
+
+
+def test_incidente_largo_no_pasa_a_ser_obra():
+    reiniciar_huellas()
+    estados = {"Línea B": "Demora de 10 minutos por un tren averiado"}
+    historial = {}
+    for _ in range(Config.UMBRAL_OBRA_PROGRAMADA + 1):
+        _, _, _, _, historial = analizar_cambios_con_historial(estados, historial)
+    assert any(datos.get("es_obra_programada") for datos in historial.values())
+    assert clasificar(estados, historial) == {"B": INCIDENTE}
+
+
+def test_resumen_con_incidente_resuelto(tmp_config):
+    registro = _registro()
+    # 12 muestras normales, 6 con incidente (30 min) y 12 normales más
+    estados = ["Normal"] * 12 + ["Demora"] * 6 + ["Normal"] * 12
+    for i, estado in enumerate(estados):
+        historial = INCIDENTE_B if estado == "Demora" else {}
+        registro.registrar({"Línea B": estado}, historial, momento=INICIO + i * PASO)
+    registro._reloj.ahora = INICIO + len(estados) * PASO
+
+    resumen = registro.resumen("B", 1)
+    assert resumen.muestras == 30
+    assert resumen.segundos_observados == 30 * PASO
+    assert resumen.incidentes == 1
+    assert resumen.mttr == 6 * PASO
+    assert resumen.disponibilidad == pytest.approx(80.0)
+    assert resumen.normal == pytest.approx(80.0)
+    assert resumen.obras == 0
+    assert resumen.horas_pico == [(11, 1)]
+
+
+def test_incidente_en_curso_no_entra_en_el_tiempo_medio(tmp_config):
+    registro = _registro()
+    registro.registrar({"Línea B": "Normal"}, {}, momento=INICIO)
+    registro.registrar({"Línea B": "Demora"}, INCIDENTE_B, momento=INICIO + PASO)
+    registro._reloj.ahora = INICIO + 2 * PASO
+
+    resumen = registro.resumen("B", 1)
+    assert resumen.incidentes == 1
+    assert resumen.mttr is None
+    assert registro.incidentes("B", INICIO) == [(INICIO + PASO, None)]
+
+
+def test_huecos_largos_y_servicio_finalizado_no_cuentan(tmp_config, monkeypatch):
+    monkeypatch.setattr(Config, "INTERVALO_MAXIMO", 3600)
+    registro = _registro()
+    registro.registrar({"Línea A": "Normal"}, {}, momento=INICIO)
+    registro.registrar({"Línea A": "Servicio finalizado"}, {}, momento=INICIO + PASO)
+    # La noche: ocho horas sin muestras
+    registro.registrar({"Línea A": "Normal"}, {}, momento=INICIO + PASO + 8 * 3600)
+    registro._reloj.ahora = INICIO + 2 * PASO + 8 * 3600
+
+    resumen = registro.resumen("A", 1)
+    assert resumen.segundos_observados == 2 * PASO
+    assert resumen.disponibilidad == 100
+
+
+def test_ventana_por_dias(tmp_config):
+    registro = _registro()
+    registro.registrar({"Línea B": "Demora"}, INCIDENTE_B, momento=INICIO - 10 * 86400)
+    registro.registrar({"Línea B": "Normal"}, {}, momento=INICIO - 10 * 86400 + PASO)
+    registro.registrar({"Línea B": "Normal"}, {}, momento=INICIO)
+    registro._reloj.ahora = INICIO + PASO
+
+    assert registro.resumen("B", 7).incidentes == 0
+    assert registro.resumen("B", 30).incidentes == 1
+
+
+def test_sin_muestras(tmp_config):
+    resumen = _registro().resumen("H", 30)
+    assert resumen.muestras == 0
+    assert resumen.disponibilidad is None
+
+
+def test_persiste_y_descarta_lo_vencido_al_cargar(tmp_config, monkeypatch):
+    monkeypatch.setattr(Config, "CONFIABILIDAD_DIAS_RETENCION", 5)
+    registro = _registro()
+    registro.registrar({"Línea A": "Normal", "Línea B": "Demora"}, INCIDENTE_B, momento=INICIO - 10 * 86400)
+    registro.registrar({"Línea A": "Normal", "Línea B": "Demora"}, INCIDENTE_B, momento=INICIO)
+    tamanio = Config.ARCHIVO_CONFIABILIDAD.stat().st_size
+
+    otro = _registro()
+    assert otro.incidentes("B", 0) == [(INICIO, None)]
+    # Las muestras vencidas se eliminan del archivo
+    assert Config.ARCHIVO_CONFIABILIDAD.stat().st_size == tamanio // 2
+
+
+def test_registro_truncado_se_ignora(tmp_config):
+    registro = _registro()
+    registro.registrar({"Línea A": "Normal"}, {}, momento=INICIO)
+    with open(Config.ARCHIVO_CONFIABILIDAD, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    otro = _registro()
+    assert otro.resumen("A", 1).muestras == 1
+
+
+def test_loguea_inicio_y_fin_de_incidentes(tmp_config, caplog):
+    registro = _registro()
+    with caplog.at_level("INFO", logger="src.services.confiabilidad"):
+        registro.registrar({"Línea B": "Demora"}, INCIDENTE_B, momento=INICIO)
+        registro.registrar({"Línea B": "Demora"}, INCIDENTE_B, momento=INICIO + PASO)
+        registro.registrar({"Línea B": "Normal"}, {}, momento=INICIO + 2 * PASO)
+    mensajes = [r.getMessage() for r in caplog.records]
+    assert mensajes == ["Comienza un incidente en la línea B", "Termina el incidente en la línea B"]
+
+
+def test_un_anio_de_muestras_se_agrega_rapido(tmp_config):
+    registro = _registro()
+    serie = registro._series["B"]
+    muestras = 365 * 24 * 12
+    for i in range(muestras):
+        serie.agregar(INICIO + i * PASO, INCIDENTE if i % 97 < 3 else NORMAL, hueco_maximo())
+    registro._cargado = True
+    registro._reloj.ahora = INICIO + muestras * PASO
+
+    inicio = time.perf_counter()
+    resumen = registro.resumen("B", 365)
+    assert time.perf_counter() - inicio < 1
+    assert resumen.muestras == muestras
+    assert resumen.incidentes == -(-muestras // 97)
@@ -0,0 +1,160 @@
+import threading
+import time
+
+import pytest
+
+from src.config import Config
+from src.services.fuentes import Fuente, obtener_fuentes, primera_valida, urls_configuradas
+
+ESTADOS = {"Línea A": "Normal"}
+
+
+def _consultar(respuestas):
+    """consultar(fuente) que espera y devuelve lo configurado para cada URL."""
+    llamadas = []
+
+    def consultar(fuente):
+        llamadas.append(fuente.url)
+        demora, estados = respuestas[fuente.url]
+        time.sleep(demora)
+        return estados
+    return consultar, llamadas
+
+
+def test_gana_la_primera_respuesta_valida():
+    fuentes = [Fuente("https://lenta/"), Fuente("https://rapida/"), Fuente("https://rota/")]
+    consultar, _ = _consultar({
+        "https://lenta/": (0.5, {"Línea A": "Lenta"}),
+        "https://rapida/": (0.05, ESTADOS),
+        "https://rota/": (0.0, None),
+    })
+    inicio = time.monotonic()
+    fuente, estados = primera_valida(fuentes, consultar)
+    assert fuente.url == "https://rapida/"
+    assert estados == ESTADOS
+    assert time.monotonic() - inicio < 0.4
+
+
+def test_sin_respuestas_validas():
+    fuentes = [Fuente("https://a/"), Fuente("https://b/")]
+    consultar, llamadas = _consultar({"https://a/": (0, None), "https://b/": (0, None)})
+    assert primera_valida(fuentes, consultar) == (None, None)
+    assert sorted(llamadas) == ["https://a/", "https://b/"]
+    assert all(fuente.fallos_seguidos == 1 for fuente in fuentes)
+
+
+def test_excepcion_de_una_fuente_cuenta_como_fallo():
+    fuente = Fuente("https://a/")
+
+    def consultar(_):
+        raise RuntimeError("boom")
+    assert primera_valida([fuente], consultar) == (None, None)
+    assert fuente.fallos_seguidos == 1
+
+
+def test_degradada_espera_a_las_sanas(monkeypatch):
+    monkeypatch.setattr(Config, "FUENTES_DEMORA_DEGRADADAS", 5)
+    sana, degradada = Fuente("https://sana/"), Fuente("https://degradada/")
+    degradada.fallos_seguidos = Config.FUENTES_FALLOS_DEGRADAR
+    consultar, llamadas = _consultar({"https://sana/": (0.05, ESTADOS), "https://degradada/": (0, ESTADOS)})
+
+    fuente, _ = primera_valida([degradada, sana], consultar)
+    assert fuente is sana
+    assert llamadas == ["https://sana/"]
+
+
+def test_degradada_se_sondea_cada_tanto_y_se_recupera(monkeypatch):
+    monkeypatch.setattr(Config, "FUENTES_DEMORA_DEGRADADAS", 5)
+    monkeypatch.setattr(Config, "FUENTES_SONDEO_DEGRADADAS", 3)
+    sana, degradada = Fuente("https://sana/"), Fuente("https://degradada/")
+    degradada.fallos_seguidos = Config.FUENTES_FALLOS_DEGRADAR
+    sondeada = threading.Event()
+    consultar, llamadas = _consultar({"https://sana/": (0, ESTADOS), "https://degradada/": (0, ESTADOS)})
+
+    def consultar_y_avisar(fuente):
+        try:
+            return consultar(fuente)
+        finally:
+            if fuente is degradada:
+                sondeada.set()
+
+    for _ in range(2):
+        assert primera_valida([sana, degradada], consultar_y_avisar)[0] is sana
+    assert "https://degradada/" not in llamadas
+
+    # Tercera ronda: gana la sana igual, pero la degradada se consulta en segundo plano
+    assert primera_valida([sana, degradada], consultar_y_avisar)[0] is sana
+    assert sondeada.wait(5)
+    deadline = time.monotonic() + 5
+    while degradada.degradada and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not degradada.degradada
+
+
+def test_degradada_se_consulta_si_las_sanas_fallan(monkeypatch):
+    monkeypatch.setattr(Config, "FUENTES_DEMORA_DEGRADADAS", 5)
+    sana, degradada = Fuente("https://sana/"), Fuente("https://degradada/")
+    degradada.latencia = Config.FUENTES_LATENCIA_DEGRADADA + 1
+    consultar, _ = _consultar({"https://sana/": (0, None), "https://degradada/": (0, ESTADOS)})
+
+    inicio = time.monotonic()
+    fuente, _ = primera_valida([sana, degradada], consultar)
+    assert fuente is degradada
+    # No espera la demora completa: la sana ya había fallado
+    assert time.monotonic() - inicio < 2
+
+
+def test_degradada_se_suma_si_las_sanas_tardan(monkeypatch):
+    monkeypatch.setattr(Config, "FUENTES_DEMORA_DEGRADADAS", 0.05)
+    sana, degradada = Fuente("https://sana/"), Fuente("https://degradada/")
+    degradada.fallos_seguidos = Config.FUENTES_FALLOS_DEGRADAR
+    liberar = threading.Event()
+
+    def consultar(fuente):
+        if fuente is sana:
+            liberar.wait(5)
+            return None
+        return ESTADOS
+
+    try:
+        assert primera_valida([sana, degradada], consultar)[0] is degradada
+    finally:
+        liberar.set()
+
+
+def test_latencia_promedio_timeout_y_recuperacion(monkeypatch):
+    monkeypatch.setattr(Config, "SCRAPER_HTTP_TIMEOUT", 10)
+    monkeypatch.setattr(Config, "FUENTES_LATENCIA_DEGRADADA", 3)
+    fuente = Fuente("https://a/ruta.html")
+    assert fuente.nombre == "a/ruta.html"
+    assert fuente.timeout == 10
+
+    fuente.registrar(1.0, True)
+    assert fuente.latencia == 1.0
+    assert fuente.timeout == 4.0
+    fuente.registrar(0.1, True)
+    assert fuente.latencia == pytest.approx(0.73)
+    assert fuente.timeout == pytest.approx(2.92)
+
+    for _ in range(5):
+        fuente.registrar(9.0, False)
+    assert fuente.degradada
+    assert fuente.timeout == 10
+
+    for _ in range(10):
+        fuente.registrar(0.2, True)
+    assert not fuente.degradada
+    assert fuente.timeout == 2.0
+
+
+def test_fuentes_configuradas_conservan_su_historial(monkeypatch):
+    monkeypatch.setattr(Config, "URL_ESTADO_SUBTE", "https://principal/")
+    monkeypatch.setattr(Config, "URLS_ESTADO_SUBTE_ALTERNATIVAS", " https://movil/ ,https://principal/,, https://api/estado.json")
+    assert urls_configuradas() == ["https://principal/", "https://movil/", "https://api/estado.json"]
+
+    primera = obtener_fuentes()
+    primera[1].registrar(0.5, True)
+    monkeypatch.setattr(Config, "URLS_ESTADO_SUBTE_ALTERNATIVAS", "https://movil/")
+    segunda = obtener_fuentes()
+    assert [fuente.url for fuente in segunda] == ["https://principal/", "https://movil/"]
+    assert segunda[1].latencia == 0.5
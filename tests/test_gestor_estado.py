@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+from src.config import Config
+from src.services import gestor_estado as modulo
+from src.services import storage_sqlite
+from src.services.analyzer import analizar_cambios_con_historial, reiniciar_huellas
+from src.services.gestor_estado import GestorEstado
+from src.services.historial import Historial
+from src.services.storage import cargar_estados_anteriores, guardar_estados
+
+
+def test_lee_el_disco_una_sola_vez(tmp_config, monkeypatch):
+    guardar_estados({"Línea A": "Demora"}, {"Línea A_problema": {"estado": "Demora", "linea_original": "Línea A", "tipo": "problema"}}, "t0")
+    lecturas = []
+    monkeypatch.setattr(modulo, "cargar_estados_anteriores", lambda: lecturas.append(1) or cargar_estados_anteriores())
+
+    gestor = GestorEstado(demora=0)
+    historial = gestor.obtener_historial()
+    assert isinstance(historial, Historial)
+    assert historial.claves_linea("Línea A") == ["Línea A_problema"]
+    gestor.obtener_historial()
+    gestor.registrar_ciclo({"Línea A": "Demora"}, historial, "t1")
+    gestor.obtener_historial()
+    assert lecturas == [1]
+
+
+def test_escrituras_se_agrupan(tmp_config, monkeypatch):
+    escrituras = []
+    monkeypatch.setattr(modulo, "guardar_estados", lambda e, h, f: escrituras.append(f))
+
+    gestor = GestorEstado(demora=0.2)
+    for i in range(3):
+        gestor.registrar_ciclo({}, {}, f"t{i}")
+    assert escrituras == []
+
+    time.sleep(0.4)
+    assert escrituras == ["t2"]
+
+
+def test_flush_escribe_lo_pendiente_inmediatamente(tmp_config):
+    gestor = GestorEstado(demora=60)
+    gestor.registrar_ciclo({"Línea A": "Normal"}, {}, "t-final")
+    gestor.flush()
+    assert cargar_estados_anteriores()["ultima_actualizacion"] == "t-final"
+    assert gestor.escrituras == 1
+
+    gestor.flush()
+    assert gestor.escrituras == 1
+
+
+def test_transaccion_fallida_no_persiste_el_analisis_a_medias(tmp_config):
+    guardar_estados({"Línea A": "Demora"}, {"Línea A_problema": {"estado": "Demora", "linea_original": "Línea A", "tipo": "problema", "contador": 1}}, "t0")
+    gestor = GestorEstado(demora=0)
+
+    try:
+        with gestor.transaccion() as historial:
+            historial["Línea A_problema"]["contador"] += 1
+            del historial["Línea A_problema"]
+            raise RuntimeError("falla del analyzer")
+    except RuntimeError:
+        pass
+
+    assert gestor.obtener_historial()["Línea A_problema"]["contador"] == 1
+    gestor.registrar_ciclo({"Línea A": "Demora"}, gestor.obtener_historial(), "t1")
+    assert cargar_estados_anteriores()["historial"]["Línea A_problema"]["contador"] == 1
+
+    with gestor.transaccion() as historial:
+        historial["Línea A_problema"]["contador"] += 1
+    assert gestor.obtener_historial()["Línea A_problema"]["contador"] == 2
+
+
+def test_ciclo_sin_cambios_repite_los_estados_en_la_linea_de_tiempo(tmp_config, monkeypatch):
+    monkeypatch.setattr(Config, "STORAGE_BACKEND", "sqlite")
+    try:
+        gestor = GestorEstado(demora=0)
+        gestor.registrar_ciclo({"A": "Demora"}, Historial(), "2026-08-10T10:00:00-03:00")
+        gestor.registrar_sin_cambios("2026-08-10T11:00:00-03:00")
+        assert [estado for _, estado in storage_sqlite.linea_de_tiempo("A", "2026-08-10", "2026-08-11")] == ["Demora", "Demora"]
+    finally:
+        storage_sqlite.cerrar()
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_nombres_de_linea_anteriores_se_canonizan_al_cargar(tmp_config, monkeypatch, backend):
+    monkeypatch.setattr(Config, "STORAGE_BACKEND", backend)
+    try:
+        # Estado guardado cuando las claves eran el alt de la página tal cual
+        guardar_estados({"Linea A": "Demora", "Otra cosa": "Normal"}, {
+            "Linea A_problema": {"estado": "Demora", "linea_original": "Linea A", "tipo": "problema", "activa": True},
+            "Línea B_obra": {"estado": "Obras", "linea_original": "Línea B", "tipo": "obra", "activa": True},
+        }, "t0")
+
+        gestor = GestorEstado(demora=0)
+        historial = gestor.obtener_historial()
+        assert list(historial) == ["Línea A_problema", "Línea B_obra"]
+        assert historial.claves_linea("Línea A") == ["Línea A_problema"]
+        assert gestor.estados_actuales == {"Línea A": "Demora", "Otra cosa": "Normal"}
+
+        # Con la página ya con los nombres nuevos, el problema viejo se resuelve
+        reiniciar_huellas()
+        cambios, _, _, estados, historial = analizar_cambios_con_historial({"Línea A": "Normal"}, historial)
+        assert cambios == {"Línea A": ["Volvió a funcionar normalmente"]}
+        gestor.registrar_ciclo(estados, historial, "t1")
+        assert list(cargar_estados_anteriores()["historial"]) == ["Línea B_obra"]
+    finally:
+        storage_sqlite.cerrar()
@@ -0,0 +1,85 @@
+import json
+
+from src.services.historial import Historial
+
+
+def entrada(linea, tipo, estado, activa=True):
+    return {"linea_original": linea, "tipo": tipo, "estado": estado, "activa": activa}
+
+
+def test_indices_por_linea_y_tipo():
+    historial = Historial({
+        "A_problema": entrada("A", "problema", "Demora"),
+        "A_obra": entrada("A", "obra", "Cerrada por obras"),
+        "B_obra": entrada("B", "obra", "Cerrada por obras"),
+    })
+    assert historial.claves_linea("A") == ["A_problema", "A_obra"]
+    assert historial.claves_tipo("A", "obra") == ["A_obra"]
+    assert historial.claves_linea("C") == []
+
+    del historial["A_problema"]
+    assert historial.claves_linea("A") == ["A_obra"]
+    historial.pop("A_obra")
+    assert historial.claves_linea("A") == []
+
+
+def test_buscar_obra_por_texto_normalizado():
+    historial = Historial({"C_obra": entrada("C", "obra", "La estación Constitución cerrada por obras")})
+    assert historial.buscar_obra("C", "constitución cerrada por obras") == "C_obra"
+    assert historial.buscar_obra("D", "constitución cerrada por obras") is None
+
+    historial["C_obra"]["activa"] = False
+    assert historial.buscar_obra("C", "constitución cerrada por obras") is None
+
+
+def test_reemplazo_reindexa_sin_perder_el_orden():
+    historial = Historial()
+    historial["A_obra"] = entrada("A", "obra", "Obra vieja")
+    historial["A_problema"] = entrada("A", "problema", "Demora")
+    historial["A_obra"] = entrada("A", "obra", "Obra nueva")
+
+    assert historial.claves_linea("A") == ["A_obra", "A_problema"]
+    assert historial.buscar_obra("A", "obra vieja") is None
+    assert historial.buscar_obra("A", "obra nueva") == "A_obra"
+
+
+def test_serializa_como_dict():
+    datos = {"A_problema": entrada("A", "problema", "Demora")}
+    historial = Historial(datos)
+    assert json.loads(json.dumps(historial)) == datos
+    assert historial == datos
+
+
+def test_migra_entradas_sin_texto_normalizado():
+    viejo = {"B_obra": entrada("B", "obra", "Las estaciones Once y Miserere cerradas por obras")}
+    historial = Historial(json.loads(json.dumps(viejo)))
+    assert historial["B_obra"]["estado_normalizado"] == "once y miserere cerradas por obras"
+    assert historial.buscar_obra("B", "once y miserere cerradas por obras") == "B_obra"
+    assert "estado_normalizado" not in Historial({"A_problema": entrada("A", "problema", "Demora")})["A_problema"]
+
+
+def test_deshacer_restaura_entradas_y_orden():
+    historial = Historial({
+        "A_problema": entrada("A", "problema", "Demora"),
+        "A_obra": entrada("A", "obra", "Obras en Perú"),
+        "B_problema": entrada("B", "problema", "Sin servicio"),
+    })
+    historial.iniciar_transaccion()
+    historial["A_problema"]["estado"] = "Otra cosa"
+    del historial["A_obra"]
+    historial["C_problema"] = entrada("C", "problema", "Demora")
+    historial.deshacer()
+
+    assert list(historial) == ["A_problema", "A_obra", "B_problema"]
+    assert historial["A_problema"]["estado"] == "Demora"
+    assert historial.claves_linea("A") == ["A_problema", "A_obra"]
+    assert historial.claves_linea("C") == []
+
+
+def test_confirmar_conserva_los_cambios():
+    historial = Historial({"A_problema": entrada("A", "problema", "Demora")})
+    historial.iniciar_transaccion()
+    historial["A_problema"]["contador"] = 2
+    historial.confirmar()
+    historial.deshacer()
+    assert historial["A_problema"]["contador"] == 2
@@ -0,0 +1,56 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services import http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        cuerpo = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    http_client.cerrar()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    http_client.cerrar()
+    server.shutdown()
+    server.server_close()
+
+
+def test_reutiliza_la_conexion_entre_peticiones(servidor):
+    for _ in range(5):
+        assert http_client.get(servidor).json() == {"ok": True}
+    http_client.post(servidor, data={"a": 1})
+
+    stats = http_client.obtener_estadisticas()
+    assert stats["peticiones"] == 6
+    assert stats["conexiones_abiertas"] == 1
+    assert stats["reutilizadas"] == 5
+
+
+def test_sesion_compartida_entre_hilos(servidor):
+    sesiones = []
+    hilos = [threading.Thread(target=lambda: sesiones.append(http_client.obtener_sesion())) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert all(s is sesiones[0] for s in sesiones)
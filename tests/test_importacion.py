@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.config import Config
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Módulos que cada punto de entrada puede sumar a los que carga el intérprete vacío
+# (python -c pass). Se cuentan módulos y no milisegundos para que no dependa de la máquina; el
+# margen cubre cambios de versión de requests/urllib3, pero no arrastrar selenium (~100 módulos).
+PRESUPUESTO_MODULOS = {
+    "src.config": 40,
+    "src.services": 10,
+    "src.services.telegram_bot": 280,
+    "src.main": 300,
+}
+
+def _importar(modulo, env_extra=None):
+    """Importa el módulo en un intérprete limpio con -X importtime. Devuelve (proceso, módulos cargados)."""
+    env = {"PATH": os.environ.get("PATH", ""), **(env_extra or {})}
+    codigo = f"import {modulo}" if modulo else "pass"
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    modulos = set()
+    for linea in proceso.stderr.splitlines():
+        if linea.startswith("import time:") and "cumulative" not in linea:
+            modulos.add(linea.rsplit("|", 1)[1].strip())
+    return proceso, modulos
+
+
+@pytest.fixture(scope="module")
+def modulos_base():
+    return _importar(None)[1]
+
+
+@pytest.mark.parametrize("modulo", list(PRESUPUESTO_MODULOS))
+def test_presupuesto_de_importacion(modulo, modulos_base):
+    proceso, modulos = _importar(modulo)
+    assert proceso.returncode == 0, proceso.stderr
+    assert modulo in modulos
+    assert not [nombre for nombre in modulos if nombre.split(".")[0] in ("selenium", "dotenv")]
+    assert len(modulos - modulos_base) <= PRESUPUESTO_MODULOS[modulo]
+
+
+def test_paquete_services_no_carga_sus_modulos_hasta_usarlos():
+    _, modulos = _importar("src.services")
+    assert "requests" not in modulos
+    assert not [nombre for nombre in modulos if nombre.startswith("src.services.")]
+
+
+def test_importar_config_sin_token_no_termina_el_proceso():
+    proceso, _ = _importar("src.config")
+    assert proceso.returncode == 0
+    assert "Error crítico" not in proceso.stderr
+
+
+@pytest.fixture
+def config_restaurada():
+    originales = {nombre: valor for nombre, valor in vars(Config).items() if nombre.isupper()}
+    yield
+    for nombre, valor in originales.items():
+        setattr(Config, nombre, valor)
+
+
+def test_inicializar_carga_el_env_y_valida(tmp_path, monkeypatch, config_restaurada):
+    for variable in ("TELEGRAM_TOKEN", "TELEGRAM_CHAT_ID", "INTERVALO_EJECUCION"):
+        monkeypatch.delenv(variable, raising=False)
+    archivo_env = tmp_path / ".env"
+    archivo_env.write_text("TELEGRAM_TOKEN=desde-env\nTELEGRAM_CHAT_ID=42\nINTERVALO_EJECUCION=120\n", encoding="utf-8")
+    monkeypatch.setattr(Config, "DATA_DIR", tmp_path / "data")
+
+    Config.inicializar(archivo_env)
+
+    assert Config.TELEGRAM_TOKEN == "desde-env"
+    assert Config.INTERVALO_EJECUCION == 120
+    assert Config.DATA_DIR.is_dir()
+
+
+def test_inicializar_sin_token_termina(tmp_path, monkeypatch, config_restaurada):
+    monkeypatch.delenv("TELEGRAM_TOKEN", raising=False)
+    archivo_env = tmp_path / ".env"
+    archivo_env.write_text("", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        Config.inicializar(archivo_env)
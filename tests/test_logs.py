@@ -0,0 +1,85 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from src.config import Config
+from src.services import logs
+from src.services.logs import FiltroContexto, FiltroRepeticiones, FormateadorJSON
+
+
+def _registro(mensaje, *args, nivel=logging.ERROR, nombre="src.services.prueba"):
+    return logging.LogRecord(nombre, nivel, __file__, 1, mensaje, args, None)
+
+
+@pytest.fixture
+def logging_aislado(monkeypatch):
+    raiz = logging.getLogger()
+    handlers, nivel = list(raiz.handlers), raiz.level
+    yield
+    logs.detener_logging()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    for handler in handlers:
+        raiz.addHandler(handler)
+    raiz.setLevel(nivel)
+    logging.getLogger("src.services.ruidoso").setLevel(logging.NOTSET)
+
+
+def test_errores_repetidos_se_limitan_por_ventana():
+    ahora = [0.0]
+    filtro = FiltroRepeticiones(ventana=60, reloj=lambda: ahora[0])
+
+    assert filtro.filter(_registro("Error de red: %s", "timeout"))
+    assert not filtro.filter(_registro("Error de red: %s", "reset"))
+    assert not filtro.filter(_registro("Error de red: %s", "timeout"))
+    assert filtro.filter(_registro("Otro error"))
+    assert filtro.filter(_registro("Error de red: %s", "x", nivel=logging.INFO))
+
+    ahora[0] = 61
+    registro = _registro("Error de red: %s", "timeout")
+    assert filtro.filter(registro)
+    assert registro.suprimidos == 2
+
+
+def test_formato_json_con_contexto():
+    registro = _registro("Etapa %s terminada", "analisis", nivel=logging.INFO)
+    registro.duracion = 0.25
+    with logs.contexto(ciclo="abc123", etapa="analisis"):
+        FiltroContexto().filter(registro)
+
+    data = json.loads(FormateadorJSON().format(registro))
+    assert data["mensaje"] == "Etapa analisis terminada"
+    assert data["nivel"] == "INFO"
+    assert data["modulo"] == "src.services.prueba"
+    assert data["ciclo"] == "abc123"
+    assert data["etapa"] == "analisis"
+    assert data["duracion"] == 0.25
+
+
+def test_configurar_logging_escribe_en_segundo_plano(monkeypatch, logging_aislado):
+    monkeypatch.setattr(Config, "LOG_FORMATO", "json")
+    monkeypatch.setattr(Config, "LOG_NIVEL", "INFO")
+    monkeypatch.setattr(Config, "LOG_NIVELES", "src.services.ruidoso=ERROR")
+    destino = io.StringIO()
+    listener = logs.configurar_logging(destino)
+    assert logs.configurar_logging(destino) is listener
+
+    escritor = next(h for h in listener.handlers)
+    hilos_escritura = []
+    original = escritor.emit
+    monkeypatch.setattr(escritor, "emit", lambda r: hilos_escritura.append(threading.current_thread()) or original(r))
+
+    with logs.contexto(ciclo="c1"):
+        logging.getLogger("src.services.prueba").info("Hola %s", "mundo")
+    logging.getLogger("src.services.ruidoso").warning("Se descarta por nivel")
+    logging.getLogger("src.services.ruidoso").error("Pasa")
+    logs.detener_logging()
+
+    lineas = [json.loads(linea) for linea in destino.getvalue().splitlines()]
+    assert [l["mensaje"] for l in lineas] == ["Hola mundo", "Pasa"]
+    assert lineas[0]["ciclo"] == "c1"
+    assert len(hilos_escritura) == 2
+    assert all(hilo is not threading.main_thread() for hilo in hilos_escritura)
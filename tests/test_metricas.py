@@ -0,0 +1,73 @@
+import urllib.request
+
+import pytest
+import requests
+
+from src.services import metricas, scrapper
+from src.services.metricas import Contador, Histograma, Medidor, RegistroMetricas, iniciar_servidor_metricas
+from src.services.telegram_bot import responder_comando
+
+
+def test_histograma_en_formato_prometheus():
+    registro = RegistroMetricas()
+    histograma = registro.registrar(Histograma("etapa_segundos", "Duración.", etiquetas=("etapa",), buckets=(0.1, 1)))
+    histograma.observar(0.05, etapa="analisis")
+    histograma.observar(0.1, etapa="analisis")
+    histograma.observar(3, etapa="analisis")
+
+    texto = registro.exponer()
+    assert "# TYPE etapa_segundos histogram" in texto
+    assert 'etapa_segundos_bucket{etapa="analisis",le="0.1"} 2' in texto
+    assert 'etapa_segundos_bucket{etapa="analisis",le="1.0"} 2' in texto
+    assert 'etapa_segundos_bucket{etapa="analisis",le="+Inf"} 3' in texto
+    assert 'etapa_segundos_sum{etapa="analisis"} 3.15' in texto
+    assert 'etapa_segundos_count{etapa="analisis"} 3' in texto
+
+
+def test_contador_y_medidor():
+    registro = RegistroMetricas()
+    errores = registro.registrar(Contador("errores_total", "Errores.", etiquetas=("tipo",)))
+    entradas = registro.registrar(Medidor("entradas", "Entradas."))
+    errores.inc(tipo="red")
+    errores.inc(2, tipo="red")
+    entradas.set(42)
+
+    texto = registro.exponer()
+    assert 'errores_total{tipo="red"} 3' in texto
+    assert "entradas 42" in texto
+    with pytest.raises(ValueError):
+        errores.inc(via="http")
+
+
+def test_medir_registra_aunque_haya_excepcion():
+    histograma = Histograma("x_segundos", "X.")
+    with pytest.raises(RuntimeError):
+        with histograma.medir():
+            raise RuntimeError("boom")
+    assert histograma.cantidad() == 1
+
+
+def test_endpoint_http_sirve_las_metricas():
+    servidor = iniciar_servidor_metricas("127.0.0.1", 0)
+    try:
+        puerto = servidor.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/metrics", timeout=5) as respuesta:
+            assert respuesta.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "# TYPE subte_verificacion_etapa_segundos histogram" in respuesta.read().decode("utf-8")
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def test_instrumentacion_de_scraping_y_estado(monkeypatch):
+    monkeypatch.setattr(requests, "get", lambda *a, **k: (_ for _ in ()).throw(requests.exceptions.ConnectionError("boom")))
+    monkeypatch.setattr(scrapper, "_obtener_estado_con_selenium", lambda: {})
+    antes_http = metricas.scrapeos_fallidos.valor(via="http")
+    antes_selenium = metricas.scrapeos_fallidos.valor(via="selenium")
+    antes_estado = metricas.duracion_estado.cantidad()
+
+    responder_comando("/estado")
+
+    assert metricas.scrapeos_fallidos.valor(via="http") == antes_http + 1
+    assert metricas.scrapeos_fallidos.valor(via="selenium") == antes_selenium + 1
+    assert metricas.duracion_estado.cantidad() == antes_estado + 1
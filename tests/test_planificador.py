@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from src.config import Config
+from src.services.planificador import PlanificadorAdaptativo, aplicar_jitter, lineas_con_incidente
+
+NORMAL = {"A": "Normal", "B": "Normal"}
+MEDIODIA = datetime(2024, 5, 10, 12, 0, tzinfo=Config.TIMEZONE_LOCAL)
+
+
+def _configurar(monkeypatch):
+    monkeypatch.setattr(Config, "INTERVALO_EJECUCION", 600)
+    monkeypatch.setattr(Config, "INTERVALO_MINIMO", 300)
+    monkeypatch.setattr(Config, "INTERVALO_MAXIMO", 3600)
+    monkeypatch.setattr(Config, "INTERVALO_INCIDENTE", 120)
+    monkeypatch.setattr(Config, "CICLOS_NORMALES_BACKOFF", 2)
+    monkeypatch.setattr(Config, "HORARIO_ANALISIS_INICIO", 6)
+    monkeypatch.setattr(Config, "HORARIO_ANALISIS_FIN", 23)
+
+
+def test_incidente_activo_acorta_el_intervalo(monkeypatch):
+    _configurar(monkeypatch)
+    historial = {
+        "B_problema": {"linea_original": "B", "tipo": "problema", "activa": True, "es_obra_programada": False},
+        "C_problema": {"linea_original": "C", "tipo": "problema", "activa": True, "es_obra_programada": True},
+        "D_obra_x": {"linea_original": "D", "tipo": "obra", "activa": True},
+    }
+    assert lineas_con_incidente(historial) == ["B"]
+
+    segundos, motivo = PlanificadorAdaptativo().proximo_intervalo(historial, MEDIODIA)
+    # INTERVALO_INCIDENTE queda por debajo del mínimo y se acota
+    assert segundos == 300
+    assert "incidente activo en B" in motivo
+
+
+def test_backoff_exponencial_en_rachas_normales(monkeypatch):
+    _configurar(monkeypatch)
+    planificador = PlanificadorAdaptativo()
+    intervalos = []
+    for _ in range(6):
+        planificador.registrar_ciclo(NORMAL)
+        intervalos.append(planificador.proximo_intervalo({}, MEDIODIA)[0])
+    assert intervalos == [600, 1200, 1200, 2400, 2400, 3600]
+
+    planificador.registrar_ciclo(None)
+    assert planificador.ciclos_normales == 6
+    planificador.registrar_ciclo({"A": "Demora", "B": "Normal"})
+    assert planificador.proximo_intervalo({}, MEDIODIA) == (600, "intervalo base")
+
+
+def test_no_saltea_la_apertura_de_la_ventana(monkeypatch):
+    _configurar(monkeypatch)
+    monkeypatch.setattr(Config, "HORARIO_ANALISIS_INICIO", 0)
+    planificador = PlanificadorAdaptativo()
+    planificador.ciclos_normales = 10
+
+    casi_medianoche = datetime(2024, 5, 10, 23, 50, tzinfo=Config.TIMEZONE_LOCAL)
+    segundos, motivo = planificador.proximo_intervalo({}, casi_medianoche)
+    assert segundos == 600
+    assert "apertura de la ventana" in motivo
+
+
+def test_jitter_desplaza_dentro_de_la_fraccion():
+    assert aplicar_jitter(1000, 0.1, azar=lambda: 0.0) == 900
+    assert aplicar_jitter(1000, 0.1, azar=lambda: 1.0) == 1100
+    assert aplicar_jitter(1000, 0, azar=lambda: 0.9) == 1000
+    assert aplicar_jitter(10, 2, azar=lambda: 0.0) == 0
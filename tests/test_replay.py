@@ -0,0 +1,105 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.config import Config
+from src.replay import barrer, combinaciones, leer_snapshots, main, simular
+from src.services import analyzer
+
+INICIO = datetime(2024, 3, 1, 8, 0, tzinfo=Config.TIMEZONE_LOCAL)
+NORMAL = {"Línea A": "Normal", "Línea B": "Normal", "Línea C": "Normal"}
+OBRA_C = "Cerrada por obras de renovación integral en Constitución"
+
+
+def _escribir(ruta, registros):
+    with open(ruta, "w", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    return ruta
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    """Un incidente de seis ciclos en la B y, en paralelo, veinte días de obra en la C."""
+    registros = []
+    for dia in range(20):
+        for hora in range(8):
+            momento = INICIO + timedelta(days=dia, hours=hora)
+            estados = {**NORMAL, "Línea C": OBRA_C}
+            if dia == 0 and 1 <= hora <= 6:
+                estados["Línea B"] = "Demora de 15 minutos por incidente técnico"
+            registros.append({"fecha": momento.isoformat(), "estados_actuales": estados})
+    return _escribir(tmp_path / "snapshots.jsonl", registros)
+
+
+def test_umbral_bajo_convierte_antes_en_obra(snapshots):
+    bajo = simular(snapshots, {"UMBRAL_OBRA_PROGRAMADA": 3, "DIAS_RENOTIFICAR_OBRA": 30})
+    alto = simular(snapshots, {"UMBRAL_OBRA_PROGRAMADA": 10, "DIAS_RENOTIFICAR_OBRA": 30})
+
+    # Nuevo problema, una repetición y la vuelta a la normalidad
+    assert bajo["cambios"] == 3
+    # La obra de la C y el problema convertido en obra
+    assert bajo["obras_programadas"] == 2
+    # Sin conversión, cada repetición del problema se vuelve a notificar
+    assert alto["cambios"] == 7
+    assert alto["obras_programadas"] == 1
+    assert bajo["snapshots"] == alto["snapshots"] == 160
+
+
+def test_renotificaciones_segun_el_reloj_de_los_snapshots(snapshots):
+    resultados = barrer(snapshots, {
+        "UMBRAL_OBRA_PROGRAMADA": [5],
+        "DIAS_RENOTIFICAR_OBRA": [7, 15],
+        "DIAS_LIMPIAR_HISTORIAL": [5],
+    }, procesos=1)
+    assert [r["renotificaciones"] for r in resultados] == [2, 1]
+    # La página casi no cambia: la mayoría de los ciclos se omiten como en el loop principal
+    assert all(r["omitidos"] > 100 for r in resultados)
+
+
+def test_barrido_en_procesos_igual_al_secuencial(snapshots):
+    valores = {"UMBRAL_OBRA_PROGRAMADA": [3, 10], "DIAS_RENOTIFICAR_OBRA": [7], "DIAS_LIMPIAR_HISTORIAL": [5]}
+    secuencial = barrer(snapshots, valores, procesos=1)
+    paralelo = barrer(snapshots, valores, procesos=2)
+    sin_tiempos = lambda resultados: [{k: v for k, v in r.items() if k != "segundos"} for r in resultados]
+    assert sin_tiempos(paralelo) == sin_tiempos(secuencial)
+
+
+def test_simular_restaura_config_y_reloj(snapshots):
+    umbral = Config.UMBRAL_OBRA_PROGRAMADA
+    simular(snapshots, {"UMBRAL_OBRA_PROGRAMADA": umbral + 7})
+    assert Config.UMBRAL_OBRA_PROGRAMADA == umbral
+    assert abs(analyzer.ahora() - datetime.now(Config.TIMEZONE_LOCAL)) < timedelta(seconds=5)
+
+
+def test_formato_journal_repite_estados_y_acepta_fechas_sin_zona(tmp_path):
+    ruta = _escribir(tmp_path / "journal.jsonl", [
+        {"ultima_actualizacion": "2024-03-01T08:00:00", "estados_actuales": NORMAL},
+        {"ultima_actualizacion": "2024-03-01T09:00:00", "set": {}},
+    ])
+    leidos = list(leer_snapshots(ruta))
+    assert [estados for _, estados in leidos] == [NORMAL, NORMAL]
+    assert leidos[0][0].tzinfo == Config.TIMEZONE_LOCAL
+
+
+def test_registro_invalido_informa_la_linea(tmp_path):
+    ruta = tmp_path / "roto.jsonl"
+    ruta.write_text('{"fecha": "2024-03-01T08:00:00", "estados_actuales": {}}\n{"estados_actuales": {}}\n')
+    with pytest.raises(ValueError, match="roto.jsonl:2"):
+        list(leer_snapshots(ruta))
+
+
+def test_combinaciones():
+    assert combinaciones({"a": [1, 2], "b": [3]}) == [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+
+
+def test_cli_json(snapshots, capsys):
+    assert main([str(snapshots), "--umbral-obra", "3", "10", "--procesos", "1", "--json"]) == 0
+    resultados = json.loads(capsys.readouterr().out)
+    assert [r["parametros"]["UMBRAL_OBRA_PROGRAMADA"] for r in resultados] == [3, 10]
+
+
+def test_cli_archivo_inexistente(tmp_path, capsys):
+    assert main([str(tmp_path / "no_existe.jsonl")]) == 1
+    assert "Error" in capsys.readouterr().err
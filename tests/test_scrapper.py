@@ -0,0 +1,201 @@
+import pytest
+import requests
+
+from src.config import Config
+from src.services import scrapper
+from src.services.scrapper import obtener_estado_subte, parsear_estado_html, parsear_estado_json
+from src.services.webdriver_pool import PoolWebDriver
+
+LINEAS = ["A", "B", "C", "D", "E", "H", "Premetro"]
+
+
+def armar_html(estados, sin_servicio_oculto=True, alt=True):
+    columnas = "".join(
+        f'<div class="col"><img src="{l}.png" alt="{"Línea " + l if alt else ""}"><p> {e} </p></div>'
+        for l, e in zip(LINEAS, estados)
+    )
+    hidden = " hidden" if sin_servicio_oculto else ""
+    return (
+        f'<html><body><div id="divSinservicio"{hidden}>Sin servicio</div>'
+        f'<div id="estadoLineasContainer"><div class="row"><div class="col">Encabezado</div></div>'
+        f'<div class="row">{columnas}</div></div></body></html>'
+    )
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200, headers=None, data=None):
+        self.text = text
+        self.encoding = "utf-8"
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeElemento:
+    def __init__(self, text="", atributos=None, hijos=None):
+        self.text = text
+        self.atributos = atributos or {}
+        self.hijos = hijos or {}
+
+    def get_attribute(self, nombre):
+        return self.atributos.get(nombre)
+
+    def find_element(self, by, selector):
+        return self.hijos[selector]
+
+
+class FakeNavegador:
+    """Driver de Selenium con la página ya renderizada: cada <p> expone su .text."""
+
+    def __init__(self, textos):
+        self.current_url = None
+        self.columnas = [
+            FakeElemento(hijos={"img": FakeElemento(atributos={"alt": f"Línea {l}"}), "p": FakeElemento(t)})
+            for l, t in zip(LINEAS, textos)
+        ]
+
+    def get(self, url):
+        self.current_url = url
+
+    def find_elements(self, by, selector):
+        if selector == "divSinservicio":
+            return [FakeElemento(atributos={"hidden": "true"})]
+        return self.columnas
+
+    def quit(self):
+        pass
+
+
+class TestParsearEstadoHtml:
+    def test_extrae_las_siete_lineas(self):
+        estados = ["Normal"] * 6 + ["Demora de 10 minutos"]
+        resultado = parsear_estado_html(armar_html(estados))
+        assert resultado["Línea A"] == "Normal"
+        assert resultado["Línea Premetro"] == "Demora de 10 minutos"
+        assert len(resultado) == 7
+
+    def test_misma_clave_que_el_json(self):
+        alts = ["Linea a", "línea B", "C", "Línea D", "LINEA E", "Línea H", "premetro"]
+        html = "".join(
+            f'<div class="col"><img alt="{alt}"><p>Normal</p></div>' for alt in alts
+        )
+        html = f'<div id="estadoLineasContainer"><div class="row">{html}</div></div>'
+        data = [{"linea": alt, "estado": "Normal"} for alt in alts]
+        assert list(parsear_estado_html(html)) == list(parsear_estado_json(data)) == [f"Línea {l}" for l in LINEAS]
+
+    def test_sin_alt_usa_nombre_por_posicion(self):
+        resultado = parsear_estado_html(armar_html(["Normal"] * 7, alt=False))
+        assert list(resultado) == [f"Línea {l}" for l in LINEAS]
+
+    def test_pagina_sin_renderizar_devuelve_none(self):
+        html = '<div id="estadoLineasContainer"><div class="row"></div></div>'
+        assert parsear_estado_html(html) is None
+
+    def test_columnas_vacias_devuelve_none(self):
+        assert parsear_estado_html(armar_html([""] * 7)) is None
+
+    def test_sin_servicio_visible_devuelve_none(self):
+        assert parsear_estado_html(armar_html(["Normal"] * 7, sin_servicio_oculto=False)) is None
+
+    def test_renglones_iguales_a_selenium(self, monkeypatch):
+        html = armar_html(["Demoras.<br>\n   Servicio   limitado", "Obras en <b>Perú</b><div>Sin combinación</div>"] + ["Normal"] * 5)
+        # Lo que devuelve el .text de Selenium para esos mismos <p>
+        navegador = FakeNavegador(["Demoras.\nServicio limitado", "Obras en Perú\nSin combinación"] + ["Normal"] * 5)
+        monkeypatch.setattr(scrapper, "obtener_pool", lambda: PoolWebDriver(fabrica=lambda: navegador, tamanio=1, max_usos=10, max_rss_mb=0))
+
+        por_http = parsear_estado_html(html)
+        assert por_http["Línea A"] == "Demoras.\nServicio limitado"
+        assert por_http == scrapper._obtener_estado_con_selenium()
+
+
+class TestParsearEstadoJson:
+    def test_objeto_por_linea(self):
+        data = {f"Línea {letra}": "Normal" for letra in reversed(LINEAS)}
+        data["Línea B"] = "  Demora   de 5 minutos "
+        resultado = parsear_estado_json(data)
+        assert list(resultado) == [f"Línea {letra}" for letra in LINEAS]
+        assert resultado["Línea B"] == "Demora de 5 minutos"
+
+    def test_lista_bajo_una_clave(self):
+        data = {"lineas": [{"linea": letra, "estado": "Normal"} for letra in LINEAS]}
+        assert parsear_estado_json(data) == {f"Línea {letra}": "Normal" for letra in LINEAS}
+
+    def test_incompleto_o_inesperado_devuelve_none(self):
+        assert parsear_estado_json({f"Línea {letra}": "Normal" for letra in LINEAS[:5]}) is None
+        assert parsear_estado_json([{"linea": "A"}]) is None
+        assert parsear_estado_json("Normal") is None
+
+
+class TestObtenerEstadoSubte:
+    def test_usa_via_http_sin_abrir_navegador(self, monkeypatch):
+        monkeypatch.setattr(requests, "get", lambda *a, **k: FakeResponse(armar_html(["Normal"] * 7)))
+        monkeypatch.setattr(scrapper, "_obtener_estado_con_selenium", lambda: pytest.fail("no debería abrir el navegador"))
+        antes = scrapper.estadisticas_scraping["http"]
+
+        estados = obtener_estado_subte()
+
+        assert estados["Línea A"] == "Normal"
+        assert scrapper.estadisticas_scraping["http"] == antes + 1
+
+    def test_fallback_a_selenium_si_http_no_parsea(self, monkeypatch):
+        monkeypatch.setattr(requests, "get", lambda *a, **k: FakeResponse("<html></html>"))
+        monkeypatch.setattr(scrapper, "_obtener_estado_con_selenium", lambda: {"Línea A": "Normal"})
+        antes = scrapper.estadisticas_scraping["selenium"]
+
+        assert obtener_estado_subte() == {"Línea A": "Normal"}
+        assert scrapper.estadisticas_scraping["selenium"] == antes + 1
+
+    def test_fallback_si_http_falla_por_red(self, monkeypatch):
+        def fake_get(*a, **k):
+            raise requests.exceptions.ConnectionError("boom")
+
+        monkeypatch.setattr(requests, "get", fake_get)
+        monkeypatch.setattr(scrapper, "_obtener_estado_con_selenium", lambda: {"Línea B": "Normal"})
+        assert obtener_estado_subte() == {"Línea B": "Normal"}
+
+    def test_pide_la_pagina_de_forma_condicional(self, monkeypatch):
+        monkeypatch.setattr(scrapper, "_obtener_estado_con_selenium", lambda: pytest.fail("no debería abrir el navegador"))
+        enviados = []
+
+        def fake_get(url, headers, timeout):
+            enviados.append(headers)
+            if len(enviados) == 1:
+                return FakeResponse(armar_html(["Normal"] * 7), headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+            return FakeResponse("", status_code=304)
+
+        monkeypatch.setattr(requests, "get", fake_get)
+        primero = obtener_estado_subte()
+        segundo = obtener_estado_subte()
+
+        assert "If-None-Match" not in enviados[0]
+        assert enviados[1]["If-None-Match"] == '"v1"'
+        assert enviados[1]["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+        assert segundo == primero
+        assert scrapper.huella_estados(segundo) == scrapper.huella_estados(primero)
+        assert scrapper.huella_estados({**primero, "Línea A": "Demora"}) != scrapper.huella_estados(primero)
+
+    def test_usa_la_primera_fuente_valida(self, monkeypatch):
+        monkeypatch.setattr(Config, "URLS_ESTADO_SUBTE_ALTERNATIVAS", "https://api.example/estado.json")
+        monkeypatch.setattr(scrapper, "_obtener_estado_con_selenium", lambda: pytest.fail("no debería abrir el navegador"))
+        data = [{"nombre": f"Línea {letra}", "descripcion": "Normal"} for letra in LINEAS]
+
+        def fake_get(url, headers, timeout):
+            if url == Config.URL_ESTADO_SUBTE:
+                return FakeResponse("<html></html>")
+            return FakeResponse("", headers={"Content-Type": "application/json; charset=utf-8"}, data=data)
+
+        monkeypatch.setattr(requests, "get", fake_get)
+        assert obtener_estado_subte() == {f"Línea {letra}": "Normal" for letra in LINEAS}
+
+    def test_via_http_deshabilitada(self, monkeypatch):
+        monkeypatch.setattr(Config, "SCRAPER_HTTP_HABILITADO", False)
+        monkeypatch.setattr(requests, "get", lambda *a, **k: pytest.fail("no debería usar HTTP"))
+        monkeypatch.setattr(scrapper, "_obtener_estado_con_selenium", lambda: {})
+        assert obtener_estado_subte() == {}
+
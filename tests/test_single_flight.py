@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from src.services.single_flight import SingleFlight
+
+
+def test_llamadas_concurrentes_comparten_resultado():
+    vuelo = SingleFlight()
+    liberar = threading.Event()
+    ejecuciones = []
+
+    def lenta():
+        ejecuciones.append(1)
+        liberar.wait(2)
+        return {"A": "Normal"}
+
+    resultados = []
+    hilos = [
+        threading.Thread(target=lambda: resultados.append(vuelo.ejecutar("estado", lenta)))
+        for _ in range(5)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    while vuelo.estadisticas["reales"] + vuelo.estadisticas["coalescidas"] < 5:
+        threading.Event().wait(0.01)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(2)
+
+    assert ejecuciones == [1]
+    assert resultados == [{"A": "Normal"}] * 5
+    assert vuelo.estadisticas == {"reales": 1, "coalescidas": 4}
+
+
+def test_llamadas_secuenciales_ejecutan_cada_vez():
+    vuelo = SingleFlight()
+    assert vuelo.ejecutar("estado", lambda: 1) == 1
+    assert vuelo.ejecutar("estado", lambda: 2) == 2
+    assert vuelo.estadisticas == {"reales": 2, "coalescidas": 0}
+
+
+def test_error_se_propaga_y_libera_la_clave():
+    vuelo = SingleFlight()
+
+    def falla():
+        raise RuntimeError("chrome murió")
+
+    with pytest.raises(RuntimeError):
+        vuelo.ejecutar("estado", falla)
+    assert vuelo.ejecutar("estado", lambda: "ok") == "ok"
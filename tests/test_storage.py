@@ -1,4 +1,11 @@
-from src.services.storage import cargar_estados_anteriores, guardar_estados
+import json
+
+import pytest
+
+from src.config import Config
+from src.services import storage
+from src.services.historial import Historial
+from src.services.storage import cargar_estados_anteriores, compactar_estados, guardar_estados
 
 
 def test_guardar_y_cargar_round_trip(tmp_config):
@@ -18,7 +25,126 @@ def test_cargar_sin_archivo_devuelve_vacio(tmp_config):
     assert cargar_estados_anteriores() == {}
 
 
-def test_cargar_json_corrupto_devuelve_vacio(tmp_config, monkeypatch, capsys):
+def test_snapshot_corrupto_se_aparta_en_vez_de_pisarse(tmp_config, caplog):
     tmp_config.joinpath("estados_persistentes.json").write_text("{no valido", encoding="utf-8")
+    _journal(tmp_config).write_text('{"ultima_actualizacion": "t1", "secuencia": 2}\n', encoding="utf-8")
     assert cargar_estados_anteriores() == {}
-    assert "Error de I/O" in capsys.readouterr().out
+    assert "dañado" in caplog.text
+
+    apartados = sorted(p.name for p in tmp_config.glob("*.corrupto-*"))
+    assert [nombre.split(".corrupto-")[0] for nombre in apartados] == ["estados_persistentes.journal.jsonl", "estados_persistentes.json"]
+    assert tmp_config.joinpath(apartados[1]).read_text(encoding="utf-8") == "{no valido"
+
+    guardar_estados({"A": "Normal"}, {}, "t2")
+    assert cargar_estados_anteriores()["ultima_actualizacion"] == "t2"
+
+
+def test_snapshot_ilegible_propaga_el_error(tmp_config, monkeypatch):
+    tmp_config.joinpath("estados_persistentes.json").write_text("{}", encoding="utf-8")
+
+    def fallar(*args, **kwargs):
+        raise PermissionError("sin permiso")
+
+    monkeypatch.setattr("builtins.open", fallar)
+    with pytest.raises(PermissionError):
+        cargar_estados_anteriores()
+
+
+def _journal(tmp_config):
+    return tmp_config / "estados_persistentes.journal.jsonl"
+
+
+def test_ciclos_siguientes_solo_agregan_deltas(tmp_config):
+    historial = {"A_problema": {"estado": "Demora", "contador": 1}, "B_obra": {"estado": "Obras", "contador": 3}}
+    guardar_estados({"A": "Demora"}, historial, "t1")
+    snapshot = tmp_config.joinpath("estados_persistentes.json").read_text(encoding="utf-8")
+
+    historial["A_problema"]["contador"] = 2
+    guardar_estados({"A": "Demora"}, historial, "t2")
+    del historial["B_obra"]
+    guardar_estados({"A": "Demora"}, historial, "t3")
+
+    assert tmp_config.joinpath("estados_persistentes.json").read_text(encoding="utf-8") == snapshot
+    deltas = [json.loads(l) for l in _journal(tmp_config).read_text(encoding="utf-8").splitlines()]
+    assert deltas[0] == {"ultima_actualizacion": "t2", "set": {"A_problema": {"estado": "Demora", "contador": 2}}, "secuencia": 2}
+    assert deltas[1] == {"ultima_actualizacion": "t3", "del": ["B_obra"], "secuencia": 3}
+
+    data = cargar_estados_anteriores()
+    assert data["ultima_actualizacion"] == "t3"
+    assert data["historial"] == {"A_problema": {"estado": "Demora", "contador": 2}}
+
+
+def test_compacta_tras_el_maximo_de_entradas(tmp_config, monkeypatch):
+    monkeypatch.setattr(Config, "JOURNAL_MAX_ENTRADAS", 2)
+    for i in range(4):
+        guardar_estados({"A": f"estado {i}"}, {}, f"t{i}")
+
+    assert _journal(tmp_config).read_text(encoding="utf-8") == ""
+    assert json.loads(tmp_config.joinpath("estados_persistentes.json").read_text(encoding="utf-8"))["ultima_actualizacion"] == "t3"
+    assert not list(tmp_config.glob("*.tmp"))
+
+
+def test_linea_cortada_del_journal_se_ignora_y_fuerza_compactacion(tmp_config):
+    guardar_estados({"A": "Normal"}, {}, "t1")
+    guardar_estados({"A": "Demora"}, {}, "t2")
+    with open(_journal(tmp_config), "a", encoding="utf-8") as f:
+        f.write('{"ultima_actualizacion": "t3", "estad')
+
+    data = cargar_estados_anteriores()
+    assert data["ultima_actualizacion"] == "t2"
+    assert data["estados_actuales"] == {"A": "Demora"}
+
+    guardar_estados({"A": "Normal"}, {}, "t4")
+    assert _journal(tmp_config).read_text(encoding="utf-8") == ""
+    assert cargar_estados_anteriores()["ultima_actualizacion"] == "t4"
+
+
+def test_reordenamiento_del_historial_se_preserva(tmp_config):
+    guardar_estados({}, {"X": {"v": 1}, "Y": {"v": 2}}, "t1")
+    guardar_estados({}, {"Y": {"v": 2}, "X": {"v": 1}}, "t2")
+    assert list(cargar_estados_anteriores()["historial"]) == ["Y", "X"]
+
+
+def test_deltas_previos_al_snapshot_no_se_reaplican(tmp_config):
+    historial = {"A_problema": {"estado": "Demora", "contador": 1}, "B_obra": {"estado": "Obras"}}
+    guardar_estados({"A": "Demora"}, historial, "t1")
+    historial["A_problema"]["contador"] = 2
+    guardar_estados({"A": "Demora"}, historial, "t2")
+    journal = _journal(tmp_config).read_text(encoding="utf-8")
+
+    # Corte entre el renombrado del snapshot nuevo y el vaciado del journal
+    del historial["B_obra"]
+    historial["A_problema"]["contador"] = 3
+    compactar_estados({"A": "Demora"}, historial, "t3")
+    _journal(tmp_config).write_text(journal, encoding="utf-8")
+
+    data = cargar_estados_anteriores()
+    assert data["ultima_actualizacion"] == "t3"
+    assert data["historial"] == {"A_problema": {"estado": "Demora", "contador": 3}}
+
+
+def test_con_el_mismo_historial_solo_serializa_lo_modificado(tmp_config, monkeypatch):
+    historial = Historial({f"A_obra_{i}": {"estado": f"Obra {i}", "linea_original": "A", "tipo": "obra"} for i in range(50)})
+    guardar_estados({}, historial, "t1")
+    guardar_estados({}, historial, "t2")
+
+    serializadas = []
+    original = storage._serializar
+    monkeypatch.setattr(storage, "_serializar", lambda datos: serializadas.append(datos) or original(datos))
+    historial["A_obra_3"]["contador"] = 2
+    historial["A_obra_60"] = {"estado": "Obra nueva", "linea_original": "A", "tipo": "obra"}
+    del historial["A_obra_7"]
+    guardar_estados({}, historial, "t3")
+
+    assert len(serializadas) == 2
+    assert cargar_estados_anteriores()["historial"] == historial
+
+
+def test_orden_tras_borrar_y_reagregar_se_preserva(tmp_config):
+    historial = Historial({"X": {"v": 1}, "Y": {"v": 2}})
+    guardar_estados({}, historial, "t1")
+    guardar_estados({}, historial, "t2")
+    entrada = historial.pop("X")
+    historial["X"] = entrada
+    guardar_estados({}, historial, "t3")
+    assert list(cargar_estados_anteriores()["historial"]) == ["Y", "X"]
@@ -0,0 +1,124 @@
+import pytest
+
+from src.config import Config
+from src.services import storage_sqlite
+from src.services.historial import Historial
+from src.services.storage import cargar_estados_anteriores, guardar_estados, registrar_linea_de_tiempo
+
+
+@pytest.fixture
+def sqlite_backend(tmp_config, monkeypatch):
+    monkeypatch.setattr(Config, "STORAGE_BACKEND", "sqlite")
+    yield tmp_config
+    storage_sqlite.cerrar()
+
+
+def test_round_trip(sqlite_backend):
+    historial = {
+        "B_obra": {"estado": "Cerrada por obras", "linea_original": "B", "tipo": "obra", "activa": True},
+        "A_problema": {"estado": "Demora", "linea_original": "A", "tipo": "problema", "activa": False},
+    }
+    guardar_estados({"A": "Demora", "B": "Cerrada por obras"}, historial, "2026-08-13T10:00:00-03:00")
+    data = cargar_estados_anteriores()
+
+    assert data["ultima_actualizacion"] == "2026-08-13T10:00:00-03:00"
+    assert data["estados_actuales"] == {"A": "Demora", "B": "Cerrada por obras"}
+    assert data["historial"] == historial
+    assert list(data["historial"]) == ["B_obra", "A_problema"]
+
+
+def test_borra_entradas_que_ya_no_estan(sqlite_backend):
+    guardar_estados({}, {"X": {"tipo": "problema"}, "Y": {"tipo": "problema"}}, "t1")
+    guardar_estados({}, {"Y": {"tipo": "problema"}}, "t2")
+    assert list(cargar_estados_anteriores()["historial"]) == ["Y"]
+
+
+def test_sin_datos_devuelve_vacio(sqlite_backend):
+    assert cargar_estados_anteriores() == {}
+
+
+def test_linea_de_tiempo_por_fecha(sqlite_backend):
+    guardar_estados({"C": "Normal"}, {}, "2026-08-10T10:00:00-03:00")
+    guardar_estados({"C": "Demora"}, {}, "2026-08-11T10:00:00-03:00")
+    guardar_estados({"C": "Normal"}, {}, "2026-08-12T10:00:00-03:00")
+
+    assert storage_sqlite.estado_en_fecha("C", "2026-08-11T23:59:59-03:00") == "Demora"
+    assert storage_sqlite.estado_en_fecha("C", "2026-08-09T00:00:00-03:00") is None
+    assert len(storage_sqlite.linea_de_tiempo("C", "2026-08-10", "2026-08-13")) == 3
+
+
+def test_ciclo_sin_cambios_suma_a_la_linea_de_tiempo(sqlite_backend):
+    guardar_estados({"C": "Demora"}, {}, "2026-08-10T10:00:00-03:00")
+    registrar_linea_de_tiempo({"C": "Demora"}, "2026-08-10T11:00:00-03:00")
+
+    assert storage_sqlite.linea_de_tiempo("C", "2026-08-10", "2026-08-11") == [
+        ("2026-08-10T10:00:00-03:00", "Demora"), ("2026-08-10T11:00:00-03:00", "Demora"),
+    ]
+    assert cargar_estados_anteriores()["ultima_actualizacion"] == "2026-08-10T10:00:00-03:00"
+
+
+def test_base_anterior_se_migra_una_vez(sqlite_backend):
+    vieja = storage_sqlite.sqlite3.connect(Config.ARCHIVO_SQLITE)
+    vieja.executescript("""
+        CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+        CREATE TABLE historial (clave TEXT PRIMARY KEY, orden INTEGER NOT NULL, linea TEXT, tipo TEXT,
+                                activa INTEGER NOT NULL, datos TEXT NOT NULL);
+        CREATE INDEX idx_historial_linea_tipo_activa ON historial (linea, tipo, activa);
+        INSERT INTO meta VALUES ('ultima_actualizacion', 't0'), ('estados_actuales', '{}');
+        INSERT INTO historial VALUES ('A_problema', 0, 'A', 'problema', 1, '{"estado": "Demora"}');
+    """)
+    vieja.close()
+
+    conexion = storage_sqlite.conectar()
+    columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(historial)")]
+    indices = [fila[1] for fila in conexion.execute("PRAGMA index_list(historial)")]
+    assert columnas == ["clave", "orden", "datos"]
+    assert "idx_historial_linea_tipo_activa" not in indices
+    assert conexion.execute("PRAGMA user_version").fetchone()[0] == len(storage_sqlite.MIGRACIONES)
+    assert cargar_estados_anteriores()["historial"] == {"A_problema": {"estado": "Demora"}}
+
+    # Una base ya migrada no vuelve a migrarse al reconectar
+    storage_sqlite.cerrar()
+    guardar_estados({}, {"B_obra": {"estado": "Obras"}}, "t1")
+    assert cargar_estados_anteriores()["historial"] == {"B_obra": {"estado": "Obras"}}
+
+
+def test_migra_desde_json(tmp_config, monkeypatch):
+    historial = {"B_obra": {"estado": "Obras", "linea_original": "B", "tipo": "obra", "activa": True}}
+    guardar_estados({"B": "Obras"}, historial, "t-json")
+
+    monkeypatch.setattr(Config, "STORAGE_BACKEND", "sqlite")
+    try:
+        data = cargar_estados_anteriores()
+        assert data["ultima_actualizacion"] == "t-json"
+        assert data["historial"] == historial
+        assert not storage_sqlite.esta_vacia()
+    finally:
+        storage_sqlite.cerrar()
+
+
+def test_mismo_historial_solo_escribe_lo_modificado(sqlite_backend):
+    historial = Historial({f"A_obra_{i}": {"estado": f"Obra {i}", "linea_original": "A", "tipo": "obra"} for i in range(50)})
+    guardar_estados({}, historial, "t1")
+    conexion = storage_sqlite.conectar()
+
+    antes = conexion.total_changes
+    historial["A_obra_3"]["contador"] = 2
+    historial["A_obra_60"] = {"estado": "Obra nueva", "linea_original": "A", "tipo": "obra"}
+    del historial["A_obra_7"]
+    guardar_estados({}, historial, "t2")
+
+    # Dos filas de meta, dos upserts y un borrado
+    assert conexion.total_changes - antes == 5
+    data = cargar_estados_anteriores()
+    assert data["historial"] == historial
+    assert list(data["historial"]) == list(historial)
+
+
+def test_error_al_cargar_no_devuelve_vacio(sqlite_backend, monkeypatch):
+    def fallar():
+        raise storage_sqlite.sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(storage_sqlite, "cargar_estados_anteriores", fallar)
+    with pytest.raises(storage_sqlite.sqlite3.OperationalError):
+        cargar_estados_anteriores()
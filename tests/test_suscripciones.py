@@ -0,0 +1,44 @@
+from src.services.suscripciones import RegistroSuscriptores, normalizar_linea
+
+
+class TestNormalizarLinea:
+    def test_variantes(self):
+        assert normalizar_linea("Línea A") == "A"
+        assert normalizar_linea("linea c") == "C"
+        assert normalizar_linea("h") == "H"
+        assert normalizar_linea("Línea Premetro") == "Premetro"
+        assert normalizar_linea("PREMETRO") == "Premetro"
+
+    def test_linea_inexistente(self):
+        assert normalizar_linea("Z") is None
+        assert normalizar_linea("Línea 9") is None
+
+
+class TestRegistroSuscriptores:
+    def test_suscribir_y_desuscribir(self, tmp_config):
+        registro = RegistroSuscriptores()
+        assert registro.suscribir(1, ["A", "C"]) == {"A", "C"}
+        assert registro.suscriptores_de("A") == {1}
+        assert registro.desuscribir(1, ["A"]) == {"C"}
+        assert registro.suscriptores_de("A") == set()
+        assert registro.desuscribir(1) == set()
+        assert registro.lineas_de(1) == set()
+
+    def test_persiste_entre_instancias(self, tmp_config):
+        RegistroSuscriptores().suscribir(-100123, ["B", "Premetro"])
+        nuevo = RegistroSuscriptores()
+        assert nuevo.lineas_de(-100123) == {"B", "Premetro"}
+        assert nuevo.suscriptores_de("Premetro") == {-100123}
+
+    def test_agrupar_por_lineas(self, tmp_config):
+        registro = RegistroSuscriptores()
+        registro.suscribir(1, ["A"])
+        registro.suscribir(2, ["A", "B"])
+        registro.suscribir(3, ["A", "B", "C"])
+        registro.suscribir(4, ["D"])
+
+        grupos = registro.agrupar_por_lineas({"A", "B"})
+
+        assert sorted(grupos[frozenset({"A"})]) == [1]
+        assert sorted(grupos[frozenset({"A", "B"})]) == [2, 3]
+        assert all(4 not in chats for chats in grupos.values())
@@ -1,10 +1,21 @@
+import asyncio
+import threading
+import time
+
 import pytest
 import requests
+from src.config import Config
 from src.services.telegram_bot import (
     escuchar_comandos,
+    escuchar_comandos_async,
     formatear_estado_actual,
     obtener_respuesta_estado,
+    responder_comando,
 )
+from src.services.agenda import agenda
+from src.services.cache_estado import cache_estado
+from src.services.confiabilidad import registro_confiabilidad
+from src.services.suscripciones import registro_suscriptores
 
 
 class TestFormatearEstadoActual:
@@ -39,6 +50,19 @@ class TestObtenerRespuestaEstado:
         assert "<b>A:</b> Normal" in texto
         assert "<b>B:</b> Cerrada por obras" in texto
 
+    def test_responde_desde_cache_con_antiguedad(self, monkeypatch):
+        llamadas = []
+
+        def fake_scrape():
+            llamadas.append(1)
+            return {"A": "Normal"}
+
+        monkeypatch.setattr("src.services.telegram_bot.obtener_estado_subte", fake_scrape)
+        obtener_respuesta_estado()
+        texto = obtener_respuesta_estado()
+        assert llamadas == [1]
+        assert "Actualizado hace menos de un minuto" in texto
+
     def test_sin_scrapeo_exitoso_no_usa_estado_persistido(self, monkeypatch, tmp_config):
         monkeypatch.setattr("src.services.telegram_bot.obtener_estado_subte", lambda: {})
         texto = obtener_respuesta_estado()
@@ -50,6 +74,76 @@ class TestObtenerRespuestaEstado:
         assert "No se pudo obtener el estado del subte" in texto
 
 
+class TestComandosDeSuscripcion:
+    def test_suscribir_lineas(self, tmp_config):
+        texto = responder_comando("/suscribir a, Línea C", chat_id=7)
+        assert "A, C" in texto
+        assert registro_suscriptores.lineas_de(7) == {"A", "C"}
+
+    def test_suscribir_con_nombre_de_bot(self, tmp_config):
+        responder_comando("/suscribir@SubteBot premetro", chat_id=7)
+        assert registro_suscriptores.lineas_de(7) == {"Premetro"}
+
+    def test_linea_invalida_no_suscribe(self, tmp_config):
+        texto = responder_comando("/suscribir A Z", chat_id=7)
+        assert "no reconocidas: Z" in texto
+        assert registro_suscriptores.lineas_de(7) == set()
+
+    def test_desuscribir(self, tmp_config):
+        responder_comando("/suscribir A B", chat_id=7)
+        assert "B" in responder_comando("/desuscribir A", chat_id=7)
+        assert "Ya no vas a recibir" in responder_comando("/desuscribir", chat_id=7)
+        assert registro_suscriptores.lineas_de(7) == set()
+
+
+class TestComandoActualizar:
+    @pytest.fixture(autouse=True)
+    def agenda_limpia(self):
+        agenda.reiniciar()
+        yield
+        agenda.reiniciar()
+
+    def test_sin_dato_reciente_pide_verificacion(self):
+        texto = responder_comando("/actualizar", chat_id=7)
+        assert "Verificando" in texto
+        assert agenda.esperar(0) == ("pedido", [7])
+
+    def test_dato_reciente_responde_sin_pedir_verificacion(self):
+        cache_estado.actualizar({"A": "Normal"})
+        texto = responder_comando("/actualizar", chat_id=7)
+        assert "<b>A:</b> Normal" in texto
+        assert agenda.esperar(0).motivo == "intervalo"
+
+    def test_dato_viejo_pide_verificacion(self, monkeypatch):
+        cache_estado.actualizar({"A": "Normal"})
+        monkeypatch.setattr(Config, "ACTUALIZAR_EDAD_MINIMA", 0)
+        assert "Verificando" in responder_comando("/actualizar", chat_id=7)
+        assert agenda.esperar(0) == ("pedido", [7])
+
+
+class TestComandoHistorial:
+    def test_resumen_de_la_linea(self, tmp_config):
+        ahora = int(time.time())
+        incidente = {"B_problema": {"linea_original": "B", "tipo": "problema", "activa": True, "es_obra_programada": False}}
+        registro_confiabilidad.registrar({"B": "Normal"}, {}, momento=ahora - 3600)
+        registro_confiabilidad.registrar({"B": "Demora"}, incidente, momento=ahora - 1800)
+        registro_confiabilidad.registrar({"B": "Normal"}, {}, momento=ahora - 900)
+
+        texto = responder_comando("/historial línea b 7", chat_id=7)
+        assert "<b>Línea B</b>, los últimos 7 días" in texto
+        assert "Disponibilidad (sin incidentes): 75.0%" in texto
+        assert "Incidentes: 1" in texto
+        assert "Tiempo medio de resolución: 15 min" in texto
+
+    def test_sin_datos(self, tmp_config):
+        assert "Todavía no hay datos de la línea H en el último día" in responder_comando("/historial H 1", chat_id=7)
+
+    def test_argumentos_invalidos(self, tmp_config):
+        assert responder_comando("/historial", chat_id=7).startswith("Uso:")
+        assert responder_comando("/historial A cero", chat_id=7).startswith("Uso:")
+        assert "Línea no reconocida: Z" in responder_comando("/historial Z", chat_id=7)
+
+
 class TestEscucharComandos:
     def test_responde_al_comando_estado(self, monkeypatch):
         capturados = []
@@ -74,7 +168,7 @@ class TestEscucharComandos:
             "src.services.telegram_bot.obtener_respuesta_estado", lambda: "Estado actual"
         )
         monkeypatch.setattr(
-            "src.services.telegram_bot.enviar_mensaje_telegram",
+            "src.services.telegram_bot.encolar_mensaje_telegram",
             lambda mensaje, chat_id=None: capturados.append((mensaje, chat_id)),
         )
 
@@ -103,7 +197,7 @@ class TestEscucharComandos:
 
         monkeypatch.setattr("src.services.telegram_bot.obtener_updates", fake_updates)
         monkeypatch.setattr(
-            "src.services.telegram_bot.enviar_mensaje_telegram",
+            "src.services.telegram_bot.encolar_mensaje_telegram",
             lambda mensaje, chat_id=None: capturados.append((mensaje, chat_id)),
         )
 
@@ -129,3 +223,78 @@ class TestEscucharComandos:
 
         with pytest.raises(KeyboardInterrupt):
             escuchar_comandos()
+
+
+class TestEscucharComandosAsync:
+    def test_atiende_updates_en_paralelo(self, monkeypatch):
+        capturados = []
+        lock = threading.Lock()
+        entregados = {"listo": False}
+
+        def fake_updates(offset):
+            if not entregados["listo"]:
+                entregados["listo"] = True
+                return {
+                    "ok": True,
+                    "result": [
+                        {"update_id": i, "message": {"text": "/estado", "chat": {"id": 100 + i}}}
+                        for i in range(4)
+                    ],
+                }
+            time.sleep(0.05)
+            return {"ok": True, "result": []}
+
+        def respuesta_lenta():
+            time.sleep(0.3)
+            return "Estado actual"
+
+        def fake_enviar(mensaje, chat_id=None):
+            with lock:
+                capturados.append(chat_id)
+
+        monkeypatch.setattr("src.services.telegram_bot.obtener_updates", fake_updates)
+        monkeypatch.setattr("src.services.telegram_bot.obtener_respuesta_estado", respuesta_lenta)
+        monkeypatch.setattr("src.services.telegram_bot.encolar_mensaje_telegram", fake_enviar)
+
+        async def correr():
+            tarea = asyncio.create_task(escuchar_comandos_async())
+            inicio = time.monotonic()
+            while len(capturados) < 4 and time.monotonic() - inicio < 3:
+                await asyncio.sleep(0.01)
+            tarea.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await tarea
+            return time.monotonic() - inicio
+
+        duracion = asyncio.run(correr())
+
+        assert sorted(capturados) == [100, 101, 102, 103]
+        assert duracion < 1.0
+
+    def test_ignora_mensajes_que_no_son_comando(self, monkeypatch):
+        capturados = []
+        llamadas = {"n": 0}
+
+        def fake_updates(offset):
+            llamadas["n"] += 1
+            if llamadas["n"] == 1:
+                return {"ok": True, "result": [{"update_id": 1, "message": {"text": "hola", "chat": {"id": 1}}}]}
+            time.sleep(0.05)
+            return {"ok": True, "result": []}
+
+        monkeypatch.setattr("src.services.telegram_bot.obtener_updates", fake_updates)
+        monkeypatch.setattr(
+            "src.services.telegram_bot.encolar_mensaje_telegram",
+            lambda mensaje, chat_id=None: capturados.append(chat_id),
+        )
+
+        async def correr():
+            tarea = asyncio.create_task(escuchar_comandos_async())
+            while llamadas["n"] < 3:
+                await asyncio.sleep(0.01)
+            tarea.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await tarea
+
+        asyncio.run(correr())
+        assert capturados == []
@@ -1,12 +1,24 @@
+import pytest
 import requests
 
 from src.config import Config
-from src.services.telegram_notifier import enviar_alerta_telegram, enviar_mensaje_telegram
+from src.services import http_client
+from src.services.suscripciones import registro_suscriptores
+from src.services.telegram_notifier import (
+    cola_salida,
+    encolar_mensaje_telegram,
+    enviar_alerta_telegram,
+    enviar_mensaje_telegram,
+)
 
 
 class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
     def raise_for_status(self):
-        pass
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
 
 
 def test_enviar_alerta_formatea_mensaje_completo(monkeypatch):
@@ -17,7 +29,7 @@ def test_enviar_alerta_formatea_mensaje_completo(monkeypatch):
         capturado["data"] = data
         return FakeResponse()
 
-    monkeypatch.setattr(requests, "post", fake_post)
+    monkeypatch.setattr(http_client, "post", fake_post)
 
     cambios = {"A": ["Demora de 20 minutos"]}
     obras = {"B": ["Cerrada por obras de renovación integral"]}
@@ -51,7 +63,7 @@ def test_enviar_mensaje_usa_chat_id_personalizado(monkeypatch):
         capturado["data"] = data
         return FakeResponse()
 
-    monkeypatch.setattr(requests, "post", fake_post)
+    monkeypatch.setattr(http_client, "post", fake_post)
     enviar_mensaje_telegram("Hola", chat_id=42)
     assert capturado["data"]["chat_id"] == 42
 
@@ -63,15 +75,70 @@ def test_enviar_mensaje_default_chat_id(monkeypatch):
         capturado["data"] = data
         return FakeResponse()
 
-    monkeypatch.setattr(requests, "post", fake_post)
+    monkeypatch.setattr(http_client, "post", fake_post)
     enviar_mensaje_telegram("Hola")
     assert capturado["data"]["chat_id"] == Config.TELEGRAM_CHAT_ID
 
 
-def test_enviar_mensaje_error_de_red_no_rompe(monkeypatch, capsys):
+def test_enviar_mensaje_error_de_red_no_rompe(monkeypatch, caplog):
     def fake_post(url, data, timeout):
         raise requests.exceptions.ConnectionError("boom")
 
-    monkeypatch.setattr(requests, "post", fake_post)
+    monkeypatch.setattr(http_client, "post", fake_post)
     assert enviar_mensaje_telegram("Hola") is None
-    assert "Error de red" in capsys.readouterr().out
+    assert "Error de red" in caplog.text
+
+
+def test_encolar_sin_cola_activa_envia_directo(monkeypatch):
+    capturado = {}
+
+    def fake_post(url, data, timeout):
+        capturado["data"] = data
+        return FakeResponse()
+
+    monkeypatch.setattr(http_client, "post", fake_post)
+    assert encolar_mensaje_telegram("Hola", chat_id=5) is not None
+    assert capturado["data"]["chat_id"] == 5
+
+
+def test_encolar_con_cola_activa_no_bloquea(monkeypatch):
+    encolados = []
+    monkeypatch.setattr(type(cola_salida), "activa", property(lambda self: True))
+    monkeypatch.setattr(cola_salida, "encolar", lambda mensaje, chat_id: encolados.append((mensaje, chat_id)))
+    monkeypatch.setattr(http_client, "post", lambda *a, **k: pytest.fail("no debería enviar en el momento"))
+
+    enviar_alerta_telegram({"A": ["Demora"]}, {}, {})
+    assert len(encolados) == 1
+    assert encolados[0][1] == Config.TELEGRAM_CHAT_ID
+
+
+def test_alerta_se_reparte_por_lineas_suscriptas(monkeypatch, tmp_config):
+    registro_suscriptores.suscribir(10, ["A"])
+    registro_suscriptores.suscribir(11, ["A"])
+    registro_suscriptores.suscribir(20, ["Premetro"])
+    registro_suscriptores.suscribir(30, ["E"])
+    enviados = []
+    monkeypatch.setattr(
+        "src.services.telegram_notifier.enviar_mensaje_telegram",
+        lambda mensaje, chat_id=None: enviados.append((chat_id, mensaje)),
+    )
+
+    enviar_alerta_telegram({"Línea A": ["Demora"]}, {"Línea Premetro": ["Cerrada por obras"]}, {})
+
+    por_chat = dict(enviados)
+    assert "Demora" in por_chat[Config.TELEGRAM_CHAT_ID]
+    assert "Cerrada por obras" in por_chat[Config.TELEGRAM_CHAT_ID]
+    assert "Demora" in por_chat[10] and "Cerrada por obras" not in por_chat[10]
+    assert por_chat[11] == por_chat[10]
+    assert "Cerrada por obras" in por_chat[20] and "Demora" not in por_chat[20]
+    assert 30 not in por_chat
+
+
+def test_chat_que_bloqueo_al_bot_se_da_de_baja(monkeypatch, tmp_config):
+    registro_suscriptores.suscribir(10, ["A", "B"])
+    registro_suscriptores.suscribir(11, ["A"])
+    monkeypatch.setattr(http_client, "post", lambda url, data, timeout: FakeResponse(403 if data["chat_id"] == 10 else 200))
+
+    enviar_alerta_telegram({"Línea A": ["Demora"]}, {}, {})
+    assert registro_suscriptores.lineas_de(10) == set()
+    assert registro_suscriptores.lineas_de(11) == {"A"}
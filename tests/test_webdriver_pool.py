@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from src.services.webdriver_pool import PoolWebDriver
+
+
+class FakeDriver:
+    def __init__(self):
+        self.cerrado = False
+
+    def quit(self):
+        self.cerrado = True
+
+
+def crear_pool(**kwargs):
+    creados = []
+
+    def fabrica():
+        driver = FakeDriver()
+        creados.append(driver)
+        return driver
+
+    kwargs.setdefault("tamanio", 1)
+    kwargs.setdefault("max_usos", 10)
+    kwargs.setdefault("max_rss_mb", 0)
+    return PoolWebDriver(fabrica=fabrica, **kwargs), creados
+
+
+def test_reutiliza_la_misma_sesion():
+    pool, creados = crear_pool()
+    with pool.driver() as d1:
+        pass
+    with pool.driver() as d2:
+        pass
+    assert d1 is d2
+    assert len(creados) == 1
+    assert pool.estadisticas["reutilizados"] == 1
+
+
+def test_recicla_tras_max_usos():
+    pool, creados = crear_pool(max_usos=2)
+    for _ in range(3):
+        with pool.driver():
+            pass
+    assert len(creados) == 2
+    assert creados[0].cerrado
+    assert pool.estadisticas["reciclados"] == 1
+
+
+def test_recicla_por_rss():
+    pool, creados = crear_pool(max_rss_mb=100)
+    pool._medidor_rss = lambda pid: 500
+    with pool.driver():
+        pass
+    assert creados[0].cerrado
+    assert pool.estadisticas["reciclados"] == 1
+
+
+def test_error_descarta_el_driver():
+    pool, creados = crear_pool()
+    with pytest.raises(ValueError):
+        with pool.driver():
+            raise ValueError("timeout")
+    assert creados[0].cerrado
+    with pool.driver() as d:
+        assert d is creados[1]
+
+
+def test_respeta_el_tamanio_maximo():
+    pool, creados = crear_pool(tamanio=1)
+    liberar = threading.Event()
+    tomado = threading.Event()
+
+    def ocupar():
+        with pool.driver():
+            tomado.set()
+            liberar.wait(2)
+
+    hilo = threading.Thread(target=ocupar)
+    hilo.start()
+    tomado.wait(2)
+
+    resultado = {}
+
+    def esperar():
+        with pool.driver() as d:
+            resultado["driver"] = d
+
+    segundo = threading.Thread(target=esperar)
+    segundo.start()
+    segundo.join(0.1)
+    assert "driver" not in resultado
+
+    liberar.set()
+    hilo.join(2)
+    segundo.join(2)
+    assert resultado["driver"] is creados[0]
+    assert len(creados) == 1
+
+
+def test_cerrar_cierra_sesiones_ociosas():
+    pool, creados = crear_pool()
+    with pool.driver():
+        pass
+    pool.cerrar()
+    assert creados[0].cerrado
+    with pytest.raises(RuntimeError):
+        with pool.driver():
+            pass
+
+
+def test_reiniciar_descarta_tambien_las_sesiones_prestadas():
+    pool, creados = crear_pool(tamanio=2)
+    with pool.driver() as prestado:
+        with pool.driver() as ocioso:
+            pass
+        pool.reiniciar()
+        # La ociosa se cierra ya; la prestada sigue en uso hasta que vuelva
+        assert ocioso.cerrado
+        assert not prestado.cerrado
+    assert prestado.cerrado
+
+    with pool.driver() as nuevo:
+        assert nuevo not in (prestado, ocioso)
+    assert len(creados) == 3
+    assert pool.estadisticas["descartados"] == 2